@@ -17,6 +17,15 @@ options:
         description: marks this as an instance of the 'azure_rm' plugin
         required: true
         choices: ['azure_rm']
+    include_subscriptions:
+        description:
+        - A list of subscription IDs to search for virtual machines and virtual machine scale sets instead of only
+            the authenticated subscription. '\*' will include every subscription visible to the credentials.
+        - All subscriptions are crawled in the same run, sharing the credentials and HTTP sessions.
+        - When empty, only the subscription selected by the authentication options is searched.
+        - Every host has a C(subscription_id) variable identifying its subscription.
+        type: list
+        default: []
     include_vm_resource_groups:
         description: A list of resource group names to search for virtual machines. '\*' will include all resource
             groups in the subscription.
@@ -25,6 +34,32 @@ options:
         description: A list of resource group names to search for virtual machine scale sets (VMSSs). '\*' will
             include all resource groups in the subscription.
         default: []
+    include_vm_locations:
+        description:
+        - A list of locations to search for virtual machines and virtual machine scale sets, eg C(eastus).
+        - Like the other C(include_vm_*) options, this is applied to the VM list results before the instance view,
+            NICs and public IPs of a VM are fetched, so excluded VMs cost no further requests. Use
+            C(exclude_host_filters) for conditions that need the fetched details, such as C(powerstate).
+        - An empty list includes all locations.
+        type: list
+        default: []
+    include_vm_tags:
+        description:
+        - A list of tags a virtual machine must have to be included. Each entry is either C(key), requiring a
+            non-empty value for the tag, or C(key:value), requiring that exact value.
+        - For VMSS instances the tags of the scale set are checked.
+        type: list
+        default: []
+    include_vm_name_regex:
+        description:
+        - A regular expression that the virtual machine (or VMSS instance) name must match to be included.
+        type: str
+    include_vm_sizes:
+        description:
+        - A list of VM sizes to include, eg C(Standard_D2s_v3). For VMSS instances the SKU of the scale set is checked.
+        - An empty list includes all sizes.
+        type: list
+        default: []
     fail_on_template_errors:
         description: When false, template failures during group and filter processing are silently ignored (eg,
             if a filter or group expression refers to an undefined host variable)
@@ -51,6 +86,90 @@ options:
             C(batch_fetch) uses a much slower serial fetch, resulting in many more round-trips. Generally only
             useful for troubleshooting.
         default: true
+    batch_concurrency:
+        description:
+        - Maximum number of batch requests in flight at the same time when C(batch_fetch) is enabled.
+        - Requests queued by earlier responses (NICs, public IPs, further result pages) are sent as soon as a slot is
+            free instead of after the current batches complete.
+        - Set to C(1) to send batches one at a time.
+        type: int
+        default: 4
+    max_fetch_retries:
+        description:
+        - Number of times a throttled (429) or transiently failing (408, 5xx) request is retried before it counts as
+            failed.
+        - Retries wait for the C(Retry-After) interval returned by Azure, or back off exponentially when none is given.
+        type: int
+        default: 5
+    fail_on_fetch_errors:
+        description:
+        - When true, any request that still fails after retries aborts the inventory run.
+        - When false, hosts whose instance view, network interfaces or public IPs could not be fetched (eg, due to
+            missing permissions) are skipped with a warning, and the rest of the inventory is returned.
+        - A failed VM or scale set list page drops every host on it; the warning names the affected subscriptions,
+            resource groups or scale sets, and such a partial inventory is not written to the cache.
+        type: bool
+        default: true
+    compute_api_version:
+        description:
+        - Compute API version used to list VMs, scale sets and instance views.
+        - Defaults to the version for the selected C(api_profile), C(2017-03-30) for C(latest) and C(2018-03-01-hybrid),
+            C(2017-12-01) for C(2019-03-01-hybrid) and C(2016-03-30) for C(2017-03-09-profile).
+        type: str
+    network_api_version:
+        description:
+        - Network API version used to fetch network interfaces and public IP addresses of regular VMs.
+        - Defaults to the version for the selected C(api_profile), C(2015-06-15) for C(latest) and C(2017-03-09-profile),
+            and C(2017-10-01) for the hybrid profiles.
+        - Network interfaces and public IP addresses of scale set instances are served by the compute provider, which
+            only accepts older network versions, so they always use the profile's own version (C(2015-06-15) for
+            C(latest) and C(2017-03-09-profile), C(2017-03-30) for the hybrid profiles).
+        type: str
+    expand_instance_view:
+        description:
+        - List VMs and scale set instances with C($expand=instanceView), so power state is returned with each page
+            instead of costing a separate request per host.
+        - Regular VMs are only listed with their instance view when C(compute_api_version) is set to C(2023-03-01) or
+            later; with an older version only scale set instances are, and a warning is shown. Hosts listed without an
+            instance view still have it fetched separately.
+        type: bool
+        default: false
+    network_fetch_mode:
+        description:
+        - How network interfaces and public IP addresses of regular (non-VMSS) VMs are fetched.
+        - C(per_id) fetches each of them with its own request, as soon as the VM referencing it is listed.
+        - C(bulk) lists all of them once per resource group holding any referenced one, and joins them locally.
+        - C(auto) lists a resource group in bulk when it holds at least C(network_fetch_threshold) references, and
+            fetches the rest per id.
+        - Anything missing from a bulk listing is still fetched per id.
+        - Except with C(per_id), network interfaces and public IP addresses of uniform scale set instances are listed
+            once per scale set.
+        choices:
+        - per_id
+        - bulk
+        - auto
+        default: auto
+    network_fetch_threshold:
+        description:
+        - Minimum number of referenced network interfaces (or public IP addresses) in a resource group for
+            C(network_fetch_mode=auto) to list that resource group in bulk.
+        type: int
+        default: 5
+    fetch_engine:
+        description:
+        - Selects how VMs and their power state, NICs and public IPs are fetched.
+        - C(arm) lists VMs from Azure Resource Manager and fetches the instance view, each NIC and each public IP of
+            every VM with a separate request (batched according to C(batch_fetch)).
+        - C(resource_graph) fetches VMs, power state, NICs and public IPs with a few paged Azure Resource Graph
+            queries and joins them locally, so the number of requests depends on the number of result pages rather
+            than the number of hosts. Resource Graph data can lag behind ARM by a short time; NICs and public IPs not
+            yet visible there are fetched from ARM. VMSS instances are always fetched from ARM.
+        - With C(resource_graph), when C(include_vm_resource_groups) or any C(include_vm_*) option narrows the VMs,
+            only the NICs and public IPs of the VMs returned are queried. Throttled queries are retried up to
+            C(max_fetch_retries) times, honoring C(Retry-After).
+        type: str
+        choices: [arm, resource_graph]
+        default: arm
     default_host_filters:
         description: A default set of filters that is applied in addition to the conditions in
             C(exclude_host_filters) to exclude powered-off and not-fully-provisioned hosts. Set this to a different
@@ -90,4 +209,15 @@ options:
         - Use ``default_inventory_hostname`` to access the default hostname generator's value in any of the Jinja2 expressions.
         type: list
         default: [default]
+    incremental_refresh:
+        description:
+        - Only used when C(cache) is enabled.
+        - When the inventory is refreshed (eg, with C(--flush-cache) or C(meta: refresh_inventory)) and a previous
+            snapshot is still present in the cache, VMs whose resource ID and etag (or model contents, for API
+            versions that do not return an etag) are unchanged reuse the NIC and public IP details from the
+            snapshot; only their power state is re-fetched.
+        - Changes to NICs or public IPs that do not modify the VM model itself are not picked up until the VM
+            changes or the cache expires.
+        type: bool
+        default: False
 '''
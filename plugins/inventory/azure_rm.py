@@ -11,6 +11,7 @@ DOCUMENTATION = r'''
     extends_documentation_fragment:
       - azure.azcollection.azure
       - azure.azcollection.azure_rm
+      - inventory_cache
     description:
         - Query VM details from Azure Resource Manager
         - Requires a YAML configuration file whose name ends with 'azure_rm.(yml|yaml)'
@@ -35,6 +36,7 @@ EXAMPLES = '''
 # vmid: the VM's internal SMBIOS ID, eg: '36bca69d-c365-4584-8c06-a62f4a1dc5d2'
 # vmss: if the VM is a member of a scaleset (vmss), a dictionary including the id and name of the parent scaleset
 # availability_zone: availability zone in which VM is deployed, eg '1','2','3'
+# subscription_id: the ID of the subscription containing the VM
 
 
 # sample 'myazuresub.azure_rm.yaml'
@@ -46,15 +48,46 @@ plugin: azure.azcollection.azure_rm
 # presence of 'ANSIBLE_AZURE_RM_X' environment variables from overriding CLI auth)
 auth_source: cli
 
+# fetches VMs from these subscriptions (or every subscription visible to the credentials with - '*') instead of
+# only the authenticated subscription; each host gets a subscription_id hostvar
+include_subscriptions:
+- 00000000-0000-0000-0000-000000000000
+- 11111111-0000-0000-0000-000000000000
+
 # fetches VMs from an explicit list of resource groups instead of default all (- '*')
 include_vm_resource_groups:
 - myrg1
 - myrg2
 
+# fetches VMs, power state, NICs and public IPs with a few paged Azure Resource Graph queries instead of several
+# requests per VM (VMSS instances are still fetched from ARM)
+fetch_engine: resource_graph
+
+# returns power state with each page of the VM list instead of one instance view request per VM (VM lists need a
+# compute API version of 2023-03-01 or later for this)
+expand_instance_view: yes
+compute_api_version: '2023-03-01'
+
+# lists all NICs and public IPs of every resource group with referenced ones, instead of fetching each by id (the
+# default, auto, does this only for resource groups with at least network_fetch_threshold references)
+network_fetch_mode: bulk
+
 # fetches VMs from VMSSs in all resource groups (defaults to no VMSS fetch)
 include_vmss_resource_groups:
 - '*'
 
+# only considers VMs matching all of these before any instance view, NIC or public IP is fetched for them, which is
+# much cheaper than excluding them later with exclude_host_filters
+include_vm_locations:
+- eastus
+- westus2
+include_vm_tags:
+- environment:production
+- owner
+include_vm_name_regex: '^web'
+include_vm_sizes:
+- Standard_D2s_v3
+
 # places a host in the named group if the associated condition evaluates to true
 conditional_groups:
   # since this will be true for every host, every host sourced from this inventory plugin config will be in the
@@ -98,15 +131,28 @@ exclude_host_filters:
 - location in ['eastus']
 # excludes hosts that are powered off
 - powerstate != 'running'
+
+# caches the fetched hosts with the configured cache plugin for cache_timeout seconds
+cache: yes
+cache_plugin: jsonfile
+cache_connection: ~/.ansible/azure_rm_inventory_cache
+cache_timeout: 3600
+# on refresh (eg, --flush-cache or meta: refresh_inventory), only re-fetch network details for VMs that changed
+incremental_refresh: yes
 '''
 
 # FUTURE: do we need a set of sane default filters, separate from the user-defineable ones?
 # eg, powerstate==running, provisioning_state==succeeded
 
 
+import ast
 import hashlib
+import heapq
 import json
+import random
 import re
+import threading
+import time
 import uuid
 
 try:
@@ -116,15 +162,20 @@ except ImportError:
 
 from collections import namedtuple
 from ansible import release
-from ansible.plugins.inventory import BaseInventoryPlugin, Constructable
-from ansible.module_utils.six import iteritems
-from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMAuth
+from ansible.plugins.inventory import BaseInventoryPlugin, Constructable, Cacheable
+from ansible.module_utils.six import iteritems, string_types
+from ansible.module_utils.six.moves.urllib.parse import quote
+from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMAuth, AzureRMSessionPool
 from ansible.errors import AnsibleParserError, AnsibleError
 from ansible.module_utils.parsing.convert_bool import boolean
 from ansible.module_utils._text import to_native, to_bytes, to_text
+from ansible.utils.vars import combine_vars
 from itertools import chain
+from jinja2.runtime import Undefined
 from msrest import ServiceClient, Serializer, Deserializer
+from requests.exceptions import HTTPError
 from msrestazure import AzureConfiguration
+from msrestazure.azure_exceptions import CloudError
 from msrestazure.polling.arm_polling import ARMPolling
 from msrestazure.tools import parse_resource_id
 
@@ -147,29 +198,120 @@ class AzureRMRestConfiguration(AzureConfiguration):
         self.subscription_id = subscription_id
 
 
-UrlAction = namedtuple('UrlAction', ['url', 'api_version', 'handler', 'handler_args'])
-
-
-# FUTURE: add Cacheable support once we have a sane serialization format
-class InventoryModule(BaseInventoryPlugin, Constructable):
+UrlAction = namedtuple('UrlAction', ['url', 'api_version', 'handler', 'handler_args', 'error_handler', 'attempt'])
+
+# throttled or transient failures, retried with backoff (honouring Retry-After) before a request counts as failed
+RETRYABLE_STATUS_CODES = frozenset([408, 429, 500, 502, 503, 504])
+
+# resources asked for by id in a single Resource Graph query
+RESOURCE_GRAPH_IDS_PER_QUERY = 200
+
+# ARM refills a subscription's read quota at roughly this many requests per second
+ARM_READ_REFILL_PER_SECOND = 25.0
+
+# bump whenever the layout of AzureHost.to_snapshot() changes so stale caches are ignored
+SNAPSHOT_VERSION = 2
+
+# compute/network API versions used for each value of the api_profile option; latest keeps the versions this plugin
+# has always used, newer ones (eg, for expand_instance_view) are opted into with compute_api_version/network_api_version
+INVENTORY_API_PROFILES = {
+    # scale set NICs and public IPs are served by the compute RP, which only accepts its own older network versions
+    'latest': dict(compute='2017-03-30', network='2015-06-15', vmss_network='2015-06-15'),
+    '2019-03-01-hybrid': dict(compute='2017-12-01', network='2017-10-01', vmss_network='2017-03-30'),
+    '2018-03-01-hybrid': dict(compute='2017-03-30', network='2017-10-01', vmss_network='2017-03-30'),
+    '2017-03-09-profile': dict(compute='2016-03-30', network='2015-06-15', vmss_network='2015-06-15'),
+}
+
+# first compute API version whose VM list accepts $expand=instanceView
+EXPAND_VM_LIST_MIN_COMPUTE_API_VERSION = '2023-03-01'
+
+# the parts of each resource model that hostvars (and the snapshot) need; None keeps the value as-is, a dict keeps only
+# the listed keys (of each item, for lists)
+VM_MODEL_FIELDS = dict(
+    id=None, name=None, type=None, location=None, zones=None, tags=None, etag=None,
+    properties=dict(
+        vmId=None, provisioningState=None, plan=None,
+        hardwareProfile=dict(vmSize=None),
+        osProfile=dict(linuxConfiguration=dict(), windowsConfiguration=dict()),
+        storageProfile=dict(
+            imageReference=dict(id=None, publisher=None, offer=None, sku=None, version=None),
+            osDisk=dict(name=None, osType=None),
+        ),
+        networkProfile=dict(networkInterfaces=dict(id=None, properties=dict(primary=None))),
+        instanceView=dict(statuses=None),
+    ),
+)
+NIC_MODEL_FIELDS = dict(
+    id=None, name=None,
+    properties=dict(
+        macAddress=None, primary=None,
+        virtualMachine=dict(id=None),
+        networkSecurityGroup=dict(id=None),
+        ipConfigurations=dict(properties=dict(primary=None, privateIPAddress=None, publicIPAddress=dict(id=None))),
+    ),
+)
+PIP_MODEL_FIELDS = dict(
+    id=None, name=None,
+    properties=dict(ipAddress=None, dnsSettings=dict(fqdn=None), ipConfiguration=dict(id=None)),
+)
+
+
+def trim_model(model, fields):
+    if fields is None:
+        return model
+    if isinstance(model, list):
+        return [trim_model(item, fields) for item in model]
+    if not isinstance(model, dict):
+        return model
+    return dict((k, trim_model(v, fields[k])) for k, v in iteritems(model) if k in fields)
+
+
+class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
 
     NAME = 'azure.azcollection.azure_rm'
 
+    _list_scope_regex = re.compile(r'/subscriptions/[^/?]+(/resourceGroups/[^/?]+)?(/providers/Microsoft\.Compute/virtualMachineScaleSets/[^/?]+)?',
+                                   re.IGNORECASE)
+
     def __init__(self):
         super(InventoryModule, self).__init__()
 
         self._serializer = Serializer()
         self._deserializer = Deserializer()
         self._hosts = []
+        self._subscriptions = []
         self._filters = None
-
-        # FUTURE: use API profiles with defaults
-        self._compute_api_version = '2017-03-30'
-        self._network_api_version = '2015-06-15'
+        self._compiled_expressions = {}
+        self._can_compile_expressions = None
+        self._previous_hosts = {}
+        # hosts whose NICs are resolved after all VM pages are in, see _resolve_pending_networks
+        self._pending_network_hosts = []
+        # (host, dict(nics=index, pips=index)) for uniform scale set instances, joined with their scale set's lists
+        self._pending_vmss_hosts = []
+        # flexible scale set instances can be listed twice (with their scale set and as regular VMs)
+        self._seen_vm_ids = set()
+
+        # replaced from the api_profile option (or explicit overrides) in parse()
+        self._compute_api_version = INVENTORY_API_PROFILES['latest']['compute']
+        self._network_api_version = INVENTORY_API_PROFILES['latest']['network']
+        self._vmss_network_api_version = INVENTORY_API_PROFILES['latest']['vmss_network']
+        self._resource_graph_api_version = '2021-03-01'
+        self._subscription_api_version = '2019-11-01'
 
         self._default_header_parameters = {'Content-Type': 'application/json; charset=utf-8'}
 
         self._request_queue = Queue()
+        # guards the queue-empty/batches-in-flight check that decides when concurrent batch workers are done
+        self._queue_cv = threading.Condition()
+        self._batches_in_flight = 0
+        self._batch_error = None
+        # (ready time, sequence, UrlAction) for requests waiting out a retry backoff
+        self._retry_heap = []
+        self._retry_sequence = 0
+        self._throttle_until = 0
+        self._fetch_errors = []
+        # VM and scale set list pages that failed; every host they would have returned is missing from the inventory
+        self._failed_list_urls = []
 
         self.azure_auth = None
 
@@ -196,17 +338,70 @@ class InventoryModule(BaseInventoryPlugin, Constructable):
             self._sanitize_group_name = self._legacy_script_compatible_group_sanitization
 
         self._batch_fetch = self.get_option('batch_fetch')
+        self._batch_concurrency = max(1, self.get_option('batch_concurrency'))
+        self._max_fetch_retries = self.get_option('max_fetch_retries')
+        self._fail_on_fetch_errors = boolean(self.get_option('fail_on_fetch_errors'))
+
+        self._fetch_engine = self.get_option('fetch_engine')
+
+        api_profile = INVENTORY_API_PROFILES.get(self.get_option('api_profile'))
+        if api_profile is None:
+            self.display.warning("unknown Azure API profile {0}, using the API versions of latest (known profiles: {1})".format(
+                self.get_option('api_profile'), ', '.join(sorted(INVENTORY_API_PROFILES))))
+            api_profile = INVENTORY_API_PROFILES['latest']
+        self._compute_api_version = self.get_option('compute_api_version') or api_profile['compute']
+        self._network_api_version = self.get_option('network_api_version') or api_profile['network']
+        self._vmss_network_api_version = api_profile['vmss_network']
+        self._expand_instance_view = boolean(self.get_option('expand_instance_view'))
+        if self._expand_instance_view and self._compute_api_version < EXPAND_VM_LIST_MIN_COMPUTE_API_VERSION:
+            self.display.warning("expand_instance_view needs a compute_api_version of {0} or later to list VMs with their instance "
+                                 "view; compute API version {1} only expands scale set instances".format(
+                                     EXPAND_VM_LIST_MIN_COMPUTE_API_VERSION, self._compute_api_version))
+        self._network_fetch_mode = self.get_option('network_fetch_mode')
+        self._network_fetch_threshold = self.get_option('network_fetch_threshold')
 
         self._legacy_hostnames = self.get_option('plain_host_names')
 
+        self._include_vm_locations = [self._normalize_location(loc) for loc in self.get_option('include_vm_locations')]
+        self._include_vm_tags = [tag.split(':', 1) if ':' in tag else [tag, None] for tag in self.get_option('include_vm_tags')]
+        self._include_vm_name_regex = re.compile(self.get_option('include_vm_name_regex')) if self.get_option('include_vm_name_regex') else None
+        self._include_vm_sizes = [size.lower() for size in self.get_option('include_vm_sizes')]
+
         self._filters = self.get_option('exclude_host_filters') + self.get_option('default_host_filters')
 
+        cache_key = self.get_cache_key(path)
+        user_cache_setting = self.get_option('cache')
+        attempt_to_read_cache = user_cache_setting and cache
+        cache_needs_update = user_cache_setting and not cache
+
+        snapshot = None
+        if user_cache_setting:
+            try:
+                snapshot = self._cache[cache_key]
+                if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+                    snapshot = None
+            except KeyError:
+                pass
+            if snapshot is None:
+                cache_needs_update = True
+
         try:
-            self._credential_setup()
-            self._get_hosts()
+            if attempt_to_read_cache and not cache_needs_update:
+                self._load_snapshot(snapshot)
+            else:
+                if snapshot and self.get_option('incremental_refresh'):
+                    self._previous_hosts = dict((h['id'], h) for h in snapshot['hosts'])
+                self._credential_setup()
+                self._get_hosts()
         except Exception:
             raise
 
+        # a partial host list would otherwise be served from the cache as if it were complete
+        if cache_needs_update and not self._failed_list_urls:
+            self._cache[cache_key] = self._make_snapshot()
+
+        self._add_hosts()
+
     def _credential_setup(self):
         auth_options = dict(
             auth_source=self.get_option('auth_source'),
@@ -220,7 +415,10 @@ class InventoryModule(BaseInventoryPlugin, Constructable):
             cloud_environment=self.get_option('cloud_environment'),
             cert_validation_mode=self.get_option('cert_validation_mode'),
             api_profile=self.get_option('api_profile'),
-            adfs_authority_url=self.get_option('adfs_authority_url')
+            adfs_authority_url=self.get_option('adfs_authority_url'),
+            token_cache=self.get_option('token_cache'),
+            auth_cache_path=self.get_option('auth_cache_path'),
+            metadata_cache_ttl=self.get_option('metadata_cache_ttl')
         )
 
         self.azure_auth = AzureRMAuth(**auth_options)
@@ -228,42 +426,263 @@ class InventoryModule(BaseInventoryPlugin, Constructable):
         self._clientconfig = AzureRMRestConfiguration(self.azure_auth.azure_credentials, self.azure_auth.subscription_id,
                                                       self.azure_auth._cloud_environment.endpoints.resource_manager)
         self._client = ServiceClient(self._clientconfig.credentials, self._clientconfig)
-
-    def _enqueue_get(self, url, api_version, handler, handler_args=None):
+        # with keep alive, msrest keeps the session of each batch worker thread open instead of reconnecting for every
+        # request; the pooled session itself is only installed for this thread
+        session_pool = AzureRMSessionPool(keep_alive=self.get_option('http_keep_alive'),
+                                          pool_size=self.get_option('http_pool_size'),
+                                          connect_timeout=self.get_option('http_connect_timeout'),
+                                          read_timeout=self.get_option('http_read_timeout'),
+                                          proxy=self.get_option('http_proxy'))
+        self._clientconfig = session_pool.apply(self._clientconfig)
+
+    def _enqueue_get(self, url, api_version, handler, handler_args=None, error_handler=None):
         if not handler_args:
             handler_args = {}
-        self._request_queue.put_nowait(UrlAction(url=url, api_version=api_version, handler=handler, handler_args=handler_args))
+        self._enqueue(UrlAction(url=url, api_version=api_version, handler=handler, handler_args=handler_args,
+                                error_handler=error_handler, attempt=0))
+
+    def _enqueue(self, item):
+        with self._queue_cv:
+            self._request_queue.put_nowait(item)
+            self._queue_cv.notify()
+
+    def _enqueue_retry(self, item, delay):
+        with self._queue_cv:
+            self._retry_sequence += 1
+            heapq.heappush(self._retry_heap, (time.time() + delay, self._retry_sequence, item._replace(attempt=item.attempt + 1)))
+            self._queue_cv.notify_all()
+
+    def _release_due_retries(self):
+        # caller holds _queue_cv; returns seconds until the next pending retry is due, or None if there are none
+        now = time.time()
+        while self._retry_heap and self._retry_heap[0][0] <= now:
+            self._request_queue.put_nowait(heapq.heappop(self._retry_heap)[2])
+        return self._retry_heap[0][0] - now if self._retry_heap else None
 
-    def _enqueue_vm_list(self, rg='*'):
+    @staticmethod
+    def _get_header(headers, name):
+        for key, value in iteritems(headers or {}):
+            if key.lower() == name:
+                return value
+        return None
+
+    def _get_retry_delay(self, item, headers):
+        retry_after = self._get_header(headers, 'retry-after')
+        try:
+            if retry_after is not None:
+                return max(0, float(retry_after))
+        except ValueError:
+            pass
+        # exponential backoff with jitter so concurrent workers don't retry in lockstep
+        return min(60, 2 ** item.attempt) * (0.5 + random.random() / 2)
+
+    def _observe_rate_limit(self, headers):
+        remaining = self._get_header(headers, 'x-ms-ratelimit-remaining-subscription-reads')
+        try:
+            remaining = int(remaining)
+        except (TypeError, ValueError):
+            return
+        # hold off new batches while less than a full batch worth of reads is left, until the quota has refilled
+        if remaining < 100:
+            with self._queue_cv:
+                self._throttle_until = max(self._throttle_until, time.time() + (100 - remaining) / ARM_READ_REFILL_PER_SECOND)
+
+    def _on_request_failure(self, item, status_code, headers=None):
+        '''
+        Re-queues a throttled or transiently failed request with backoff. Once it is out of retries, or for any other
+        failure, notifies the owner; unless it recovers (its error handler returns True), either raises or (with
+        fail_on_fetch_errors disabled) records the failure.
+        '''
+        if status_code in RETRYABLE_STATUS_CODES and item.attempt < self._max_fetch_retries:
+            self._enqueue_retry(item, self._get_retry_delay(item, headers))
+            return
+
+        if item.error_handler and item.error_handler(item.url, status_code):
+            return
+
+        if self._fail_on_fetch_errors:
+            raise AnsibleError("a request failed with status code {0} after {1} attempt(s), url {2}".format(status_code, item.attempt + 1, item.url))
+
+        with self._queue_cv:
+            self._fetch_errors.append((item.url, status_code))
+            if item.handler in (self._on_vm_page_response, self._on_vmss_page_response):
+                self._failed_list_urls.append(item.url)
+
+    def _expand_vm_list(self):
+        # older compute API versions don't accept $expand on VM lists (scale set instance lists always do)
+        return self._expand_instance_view and self._compute_api_version >= EXPAND_VM_LIST_MIN_COMPUTE_API_VERSION
+
+    def _enqueue_vm_list(self, rg='*', subscription_id=None):
         if not rg or rg == '*':
             url = '/subscriptions/{subscriptionId}/providers/Microsoft.Compute/virtualMachines'
         else:
             url = '/subscriptions/{subscriptionId}/resourceGroups/{rg}/providers/Microsoft.Compute/virtualMachines'
 
-        url = url.format(subscriptionId=self._clientconfig.subscription_id, rg=rg)
+        url = url.format(subscriptionId=subscription_id or self._clientconfig.subscription_id, rg=rg)
+        if self._expand_vm_list():
+            # saves a request per VM; hosts fall back to fetching the instanceview if a page comes back without it
+            url += '?$expand=instanceView'
         self._enqueue_get(url=url, api_version=self._compute_api_version, handler=self._on_vm_page_response)
 
-    def _enqueue_vmss_list(self, rg=None):
+    def _enqueue_vmss_list(self, rg=None, subscription_id=None):
         if not rg or rg == '*':
             url = '/subscriptions/{subscriptionId}/providers/Microsoft.Compute/virtualMachineScaleSets'
         else:
             url = '/subscriptions/{subscriptionId}/resourceGroups/{rg}/providers/Microsoft.Compute/virtualMachineScaleSets'
 
-        url = url.format(subscriptionId=self._clientconfig.subscription_id, rg=rg)
+        url = url.format(subscriptionId=subscription_id or self._clientconfig.subscription_id, rg=rg)
         self._enqueue_get(url=url, api_version=self._compute_api_version, handler=self._on_vmss_page_response)
 
-    def _get_hosts(self):
-        for vm_rg in self.get_option('include_vm_resource_groups'):
-            self._enqueue_vm_list(vm_rg)
+    def _get_subscriptions(self):
+        include_subscriptions = self.get_option('include_subscriptions')
+        if not include_subscriptions:
+            return [self._clientconfig.subscription_id]
+
+        subscriptions = []
+        if '*' in include_subscriptions:
+            url = '/subscriptions'
+            while url:
+                response = self.send_request(url, self._subscription_api_version)
+                for sub in response.get('value', []):
+                    # disabled subscriptions are read-only at best and usually refuse the list calls outright
+                    if sub.get('state') not in ('Disabled', 'Deleted'):
+                        subscriptions.append(sub['subscriptionId'])
+                url = response.get('nextLink')
 
-        for vmss_rg in self.get_option('include_vmss_resource_groups'):
-            self._enqueue_vmss_list(vmss_rg)
+        for sub in include_subscriptions:
+            if sub != '*' and sub not in subscriptions:
+                subscriptions.append(sub)
 
+        return subscriptions
+
+    def _get_hosts(self):
+        self._subscriptions = self._get_subscriptions()
+
+        if self._fetch_engine == 'resource_graph':
+            self._get_vms_from_resource_graph(self.get_option('include_vm_resource_groups'))
+        else:
+            for subscription_id in self._subscriptions:
+                for vm_rg in self.get_option('include_vm_resource_groups'):
+                    self._enqueue_vm_list(vm_rg, subscription_id=subscription_id)
+
+        # every subscription's lists share the queue, so they are crawled in parallel by the batch workers
+        for subscription_id in self._subscriptions:
+            for vmss_rg in self.get_option('include_vmss_resource_groups'):
+                self._enqueue_vmss_list(vmss_rg, subscription_id=subscription_id)
+
+        self._process_queue()
+
+        # scale set NIC and public IP lists are in by now; anything they missed is fetched by id with the next round
+        for host, vmss_network in self._pending_vmss_hosts:
+            host.resolve_nics(vmss_network['nics'], vmss_network['pips'])
+        self._pending_vmss_hosts = []
+
+        self._resolve_pending_networks()
+
+        if self._fetch_errors:
+            failed_hosts = [h for h in self._hosts if h.fetch_failed]
+            self._hosts = [h for h in self._hosts if not h.fetch_failed]
+            self.display.warning("{0} request(s) failed; skipped {1} host(s) with incomplete details: {2}".format(
+                len(self._fetch_errors), len(failed_hosts), ', '.join(h.default_inventory_hostname for h in failed_hosts)))
+            if self._failed_list_urls:
+                self.display.warning("{0} VM or scale set list request(s) failed; the inventory is missing any hosts from: {1}".format(
+                    len(self._failed_list_urls), ', '.join(self._get_list_scopes(self._failed_list_urls))))
+            for url, status_code in self._fetch_errors:
+                self.display.vvv("failed request: status code {0}, url {1}".format(status_code, url))
+
+    @classmethod
+    def _get_list_scopes(cls, urls):
+        '''
+        Returns the subscriptions, resource groups or scale sets the given list (or next page) urls were listing.
+        '''
+        scopes = []
+        for url in urls:
+            match = cls._list_scope_regex.search(url)
+            scope = match.group(0) if match else url
+            if scope not in scopes:
+                scopes.append(scope)
+        return scopes
+
+    def _process_queue(self):
         if self._batch_fetch:
             self._process_queue_batch()
         else:
             self._process_queue_serial()
 
+    def _resolve_pending_networks(self):
+        '''
+        Resolves NICs and public IPs of the hosts listed so far. Resource groups with enough references are listed
+        once and joined locally; anything else (or missing from the lists) is fetched by id as usual.
+        '''
+        hosts, self._pending_network_hosts = self._pending_network_hosts, []
+        if not hosts:
+            self._process_queue()
+            return
+
+        nic_index = {}
+        pip_index = {}
+
+        nic_ids = [nic_ref['id'] for h in hosts for nic_ref, is_primary in h._nic_refs()]
+        for scope in self._get_bulk_fetch_scopes(nic_ids):
+            self._enqueue_index_list('{0}/providers/Microsoft.Network/networkInterfaces'.format(scope), nic_index)
+        self._process_queue()
+
+        # public IPs are only known once the NICs referencing them are, so they are a second round
+        pip_ids = [pip_ref['id'] for nic_id in nic_ids if nic_id.lower() in nic_index
+                   for pip_ref in AzureNic.public_ip_refs(nic_index[nic_id.lower()])]
+        for scope in self._get_bulk_fetch_scopes(pip_ids):
+            self._enqueue_index_list('{0}/providers/Microsoft.Network/publicIPAddresses'.format(scope), pip_index)
+        self._process_queue()
+
+        for h in hosts:
+            h.resolve_nics(nic_index, pip_index)
+        self._process_queue()
+
+    def _get_bulk_fetch_scopes(self, resource_ids):
+        '''
+        Returns the resource groups worth listing in full for these ids: all of them in bulk mode, or those holding at
+        least network_fetch_threshold of them in auto mode.
+        '''
+        scopes = {}
+        for resource_id in resource_ids:
+            parsed = parse_resource_id(resource_id)
+            scope = '/subscriptions/{0}/resourceGroups/{1}'.format(parsed['subscription'], parsed['resource_group'])
+            scopes.setdefault(scope.lower(), [scope, 0])[1] += 1
+
+        if self._network_fetch_mode == 'bulk':
+            return [scope for scope, count in scopes.values()]
+        return [scope for scope, count in scopes.values() if count >= self._network_fetch_threshold]
+
+    def _enqueue_index_list(self, url, index):
+        self._enqueue_get(url=url, api_version=self._get_network_api_version(url), handler=self._on_index_page_response,
+                          handler_args=dict(index=index), error_handler=self._on_index_list_error)
+
+    def _on_index_list_error(self, url, status_code):
+        # whatever the list would have returned is fetched by id instead, which fails the affected hosts if need be
+        self.display.vvv("bulk network list failed with status code {0}, falling back to per-id requests: {1}".format(status_code, url))
+        return True
+
+    def _on_index_page_response(self, response, index):
+        next_link = response.get('nextLink')
+
+        if next_link:
+            self._enqueue_index_list(next_link, index)
+
+        for model in response.get('value', []):
+            index[model['id'].lower()] = model
+
+    def _get_network_api_version(self, resource_id):
+        if '/virtualmachinescalesets/' in resource_id.lower():
+            return self._vmss_network_api_version
+        return self._network_api_version
+
+    def _make_snapshot(self):
+        return dict(version=SNAPSHOT_VERSION, hosts=[h.to_snapshot() for h in self._hosts])
+
+    def _load_snapshot(self, snapshot):
+        self._hosts = [AzureHost.from_snapshot(h, self, legacy_name=self._legacy_hostnames) for h in snapshot['hosts']]
+
+    def _add_hosts(self):
         constructable_config_strict = boolean(self.get_option('fail_on_template_errors'))
         constructable_config_compose = self.get_option('hostvar_expressions')
         constructable_config_groups = self.get_option('conditional_groups')
@@ -289,15 +708,82 @@ class InventoryModule(BaseInventoryPlugin, Constructable):
             self._add_host_to_composed_groups(constructable_config_groups, h.hostvars, inventory_hostname, strict=constructable_config_strict)
             self._add_host_to_keyed_groups(constructable_config_keyed_groups, h.hostvars, inventory_hostname, strict=constructable_config_strict)
 
+    def _get_compiled_expression(self, expression):
+        '''
+        Returns the CompiledExpression for a Jinja2 expression, compiling it on first use, or None when it has to go
+        through the templar (lookups, non-string conditions such as C(true), or a templar that cannot evaluate
+        compiled expressions).
+        '''
+        if not isinstance(expression, string_types) or not self._compiled_expressions_supported():
+            return None
+        if expression not in self._compiled_expressions:
+            compiled = None
+            # _compose disables lookups; keep that by leaving expressions that use them to the templar
+            if not CompiledExpression.uses_lookup(expression):
+                try:
+                    compiled = CompiledExpression(expression, self.templar.environment)
+                except Exception:
+                    compiled = None
+            self._compiled_expressions[expression] = compiled
+        return self._compiled_expressions[expression]
+
+    def _compiled_expressions_supported(self):
+        '''
+        Whether expressions compiled from the templar's Jinja2 environment can be evaluated outside of the templar.
+        Newer ansible-core templating needs a template context only the templar sets up (and only offers its
+        environment through a deprecated property), so try a probe expression once and otherwise leave everything to
+        the templar.
+        '''
+        if self._can_compile_expressions is None:
+            if isinstance(getattr(type(self.templar), 'environment', None), property):
+                self._can_compile_expressions = False
+                return False
+            try:
+                probe = CompiledExpression('probe | bool', self.templar.environment)
+                self._can_compile_expressions = probe.evaluate(dict(probe='yes')) is True
+            except Exception:
+                self._can_compile_expressions = False
+        return self._can_compile_expressions
+
+    def _evaluate_condition(self, condition, variables):
+        compiled = self._get_compiled_expression(condition)
+        if compiled is None:
+            self.templar.available_variables = variables
+            conditional = "{{% if {0} %}} True {{% else %}} False {{% endif %}}".format(condition)
+            return boolean(self.templar.template(conditional))
+        return bool(compiled.evaluate(variables))
+
+    def _compose(self, template, variables, **kwargs):
+        compiled = self._get_compiled_expression(template)
+        if compiled is None:
+            return super(InventoryModule, self)._compose(template, variables, **kwargs)
+        return compiled.evaluate(variables, as_template=True)
+
+    def _add_host_to_composed_groups(self, groups, variables, host, strict=False, **kwargs):
+        if not groups or not isinstance(groups, dict) or \
+                any(self._get_compiled_expression(condition) is None for condition in groups.values()):
+            return super(InventoryModule, self)._add_host_to_composed_groups(groups, variables, host, strict=strict, **kwargs)
+
+        variables = combine_vars(variables, self.inventory.get_host(host).get_vars())
+        for group_name, condition in iteritems(groups):
+            group_name = self._sanitize_group_name(group_name)
+            try:
+                result = self._evaluate_condition(condition, variables)
+            except Exception as e:
+                if strict:
+                    raise AnsibleParserError("Could not add host %s to group %s: %s" % (host, group_name, to_native(e)))
+                continue
+
+            if result:
+                group_name = self.inventory.add_group(group_name) or group_name
+                self.inventory.add_child(group_name, host)
+
     # FUTURE: fix underlying inventory stuff to allow us to quickly access known groupvars from reconciled host
     def _filter_host(self, inventory_hostname, hostvars):
-        self.templar.available_variables = hostvars
-
         for condition in self._filters:
             # FUTURE: should warn/fail if conditional doesn't return True or False
-            conditional = "{{% if {0} %}} True {{% else %}} False {{% endif %}}".format(condition)
             try:
-                if boolean(self.templar.template(conditional)):
+                if self._evaluate_condition(condition, hostvars):
                     return True
             except Exception as e:
                 if boolean(self.get_option('fail_on_template_errors')):
@@ -332,24 +818,112 @@ class InventoryModule(BaseInventoryPlugin, Constructable):
         )
 
     def _process_queue_serial(self):
-        try:
-            while True:
+        while True:
+            with self._queue_cv:
+                next_retry = self._release_due_retries()
+            try:
                 item = self._request_queue.get_nowait()
+            except Empty:
+                if next_retry is None:
+                    break
+                time.sleep(next_retry)
+                continue
+
+            try:
                 resp = self.send_request(item.url, item.api_version)
-                item.handler(resp, **item.handler_args)
-        except Empty:
-            pass
+            except HTTPError as e:
+                self._on_request_failure(item, e.response.status_code, e.response.headers)
+                continue
+            item.handler(resp, **item.handler_args)
 
-    def _on_vm_page_response(self, response, vmss=None):
+    def _on_vm_page_response(self, response, vmss=None, vmss_network=None):
         next_link = response.get('nextLink')
 
         if next_link:
-            self._enqueue_get(url=next_link, api_version=self._compute_api_version, handler=self._on_vm_page_response)
+            self._enqueue_get(url=next_link, api_version=self._compute_api_version, handler=self._on_vm_page_response,
+                              handler_args=dict(vmss=vmss, vmss_network=vmss_network))
 
         if 'value' in response:
             for h in response['value']:
-                # FUTURE: add direct VM filtering by tag here (performance optimization)?
-                self._hosts.append(AzureHost(h, self, vmss=vmss, legacy_name=self._legacy_hostnames))
+                if not self._prefilter_vm(h, vmss=vmss):
+                    continue
+                with self._queue_cv:
+                    if h['id'].lower() in self._seen_vm_ids:
+                        continue
+                    self._seen_vm_ids.add(h['id'].lower())
+                self._hosts.append(self._get_or_create_host(h, vmss=vmss or self._get_flexible_vmss(h), vmss_network=vmss_network))
+
+    @staticmethod
+    def _get_flexible_vmss(vm_model):
+        vmss_ref = vm_model.get('properties', {}).get('virtualMachineScaleSet')
+        if not vmss_ref:
+            return None
+        return dict(id=vmss_ref['id'], name=parse_resource_id(vmss_ref['id'])['name'])
+
+    @staticmethod
+    def _normalize_location(location):
+        return (location or '').replace(' ', '').lower()
+
+    def _prefilter_tags(self, tags):
+        tags = tags or {}
+        for key, value in self._include_vm_tags:
+            if value is None and not tags.get(key):
+                return False
+            if value is not None and tags.get(key) != value:
+                return False
+        return True
+
+    def _prefilter_vm(self, vm_model, vmss=None):
+        '''
+        Checks the include_vm_* options against a raw VM list entry, before any per-host request is queued for it.
+        Size and tags of VMSS instances are checked on the scale set instead, see _prefilter_vmss.
+        '''
+        if self._include_vm_locations and self._normalize_location(vm_model.get('location')) not in self._include_vm_locations:
+            return False
+        if self._include_vm_name_regex and not self._include_vm_name_regex.search(vm_model.get('name', '')):
+            return False
+        if vmss is None:
+            vm_size = (vm_model.get('properties', {}).get('hardwareProfile') or {}).get('vmSize')
+            if self._include_vm_sizes and (vm_size or '').lower() not in self._include_vm_sizes:
+                return False
+            if not self._prefilter_tags(vm_model.get('tags')):
+                return False
+        return True
+
+    def _prefilter_vmss(self, vmss):
+        if self._include_vm_locations and self._normalize_location(vmss.get('location')) not in self._include_vm_locations:
+            return False
+        vm_size = (vmss.get('sku') or {}).get('name')
+        if self._include_vm_sizes and (vm_size or '').lower() not in self._include_vm_sizes:
+            return False
+        return self._prefilter_tags(vmss.get('tags'))
+
+    def _get_or_create_host(self, vm_model, vmss=None, vmss_network=None):
+        previous = self._previous_hosts.get(vm_model['id'].lower())
+        if previous and previous['fingerprint'] == AzureHost.fingerprint(vm_model):
+            # unchanged since the last snapshot; reuse its NICs and public IPs, only power state is re-fetched
+            host = AzureHost.from_snapshot(previous, self, legacy_name=self._legacy_hostnames)
+            if vm_model['properties'].get('instanceView'):
+                host._on_instanceview_response(vm_model['properties']['instanceView'])
+            else:
+                host.fetch_instanceview()
+            return host
+
+        if vmss_network is not None:
+            # uniform scale set instance; its NICs are joined from the scale set's lists once they are in
+            host = AzureHost(vm_model, self, vmss=vmss, legacy_name=self._legacy_hostnames, fetch_children=False)
+            host.load_instanceview()
+            self._pending_vmss_hosts.append((host, vmss_network))
+            return host
+
+        if '/virtualmachinescalesets/' not in vm_model['id'].lower() and self._network_fetch_mode != 'per_id':
+            # NICs are resolved once every VM page is in, when it's known which resource groups are worth listing
+            host = AzureHost(vm_model, self, vmss=vmss, legacy_name=self._legacy_hostnames, fetch_children=False)
+            host.load_instanceview()
+            self._pending_network_hosts.append(host)
+            return host
+
+        return AzureHost(vm_model, self, vmss=vmss, legacy_name=self._legacy_hostnames)
 
     def _on_vmss_page_response(self, response):
         next_link = response.get('nextLink')
@@ -357,54 +931,246 @@ class InventoryModule(BaseInventoryPlugin, Constructable):
         if next_link:
             self._enqueue_get(url=next_link, api_version=self._compute_api_version, handler=self._on_vmss_page_response)
 
-        # FUTURE: add direct VMSS filtering by tag here (performance optimization)?
         for vmss in response['value']:
-            url = '{0}/virtualMachines'.format(vmss['id'])
+            if not self._prefilter_vmss(vmss):
+                continue
+
+            if vmss.get('properties', {}).get('orchestrationMode') == 'Flexible':
+                # flexible instances are regular VMs (with their own NICs), so list them as such; the VM lists may
+                # return them as well, duplicates are skipped
+                url = '/subscriptions/{0}/providers/Microsoft.Compute/virtualMachines?$filter={1}'.format(
+                    parse_resource_id(vmss['id'])['subscription'], quote("virtualMachineScaleSet/id eq '{0}'".format(vmss['id'])))
+                if self._expand_vm_list():
+                    url += '&$expand=instanceView'
+                self._enqueue_get(url=url, api_version=self._compute_api_version, handler=self._on_vm_page_response)
+                continue
+
+            vmss_network = None
+            if self._network_fetch_mode != 'per_id':
+                # two listings per scale set instead of a NIC (and public IP) request per instance
+                vmss_network = dict(nics={}, pips={})
+                self._enqueue_index_list('{0}/networkInterfaces'.format(vmss['id']), vmss_network['nics'])
+                self._enqueue_index_list('{0}/publicIPAddresses'.format(vmss['id']), vmss_network['pips'])
+
+            # the instance list always supports instanceView expansion, so power state comes with it
+            url = '{0}/virtualMachines?$expand=instanceView'.format(vmss['id'])
             # VMSS instances look close enough to regular VMs that we can share the handler impl...
-            self._enqueue_get(url=url, api_version=self._compute_api_version, handler=self._on_vm_page_response, handler_args=dict(vmss=vmss))
+            self._enqueue_get(url=url, api_version=self._compute_api_version, handler=self._on_vm_page_response,
+                              handler_args=dict(vmss=vmss, vmss_network=vmss_network))
+
+    def _get_vms_from_resource_graph(self, resource_groups):
+        vm_filters = []
+        if resource_groups and '*' not in resource_groups:
+            vm_filters.append("| where resourceGroup in~ ({0})".format(', '.join(self._kql_string(rg) for rg in resource_groups)))
+        # push the cheap pre-filters to the server; the name regex is only checked locally since KQL regex syntax differs
+        if self._include_vm_locations:
+            vm_filters.append("| where location in~ ({0})".format(', '.join(self._kql_string(loc) for loc in self._include_vm_locations)))
+        if self._include_vm_sizes:
+            vm_filters.append("| where tostring(properties.hardwareProfile.vmSize) in~ ({0})".format(
+                ', '.join(self._kql_string(size) for size in self._include_vm_sizes)))
+        for key, value in self._include_vm_tags:
+            if value is None:
+                vm_filters.append("| where isnotempty(tags[{0}])".format(self._kql_string(key)))
+            else:
+                vm_filters.append("| where tostring(tags[{0}]) == {1}".format(self._kql_string(key), self._kql_string(value)))
+
+        vm_query = ("Resources "
+                    "| where type =~ 'microsoft.compute/virtualmachines' {0} "
+                    "| extend powerState = tostring(properties.extended.instanceView.powerState.code) "
+                    "| project id, name, type, location, tags, zones, properties, powerState").format(' '.join(vm_filters))
+        hosts = []
+        for vm in self._query_resource_graph(vm_query):
+            powerstate = vm.pop('powerState', None)
+            if not self._prefilter_vm(vm):
+                continue
+            self._seen_vm_ids.add(vm['id'].lower())
+            host = AzureHost(vm, self, vmss=self._get_flexible_vmss(vm), legacy_name=self._legacy_hostnames, fetch_children=False)
+            host._on_instanceview_response(dict(statuses=[dict(code=powerstate)] if powerstate else []))
+            hosts.append(host)
+
+        if vm_filters or self._include_vm_name_regex:
+            # only the NICs of the VMs returned, and the public IPs of those NICs
+            nic_ids = set(nic_ref['id'].lower() for host in hosts for nic_ref, is_primary in host._nic_refs())
+            nic_index = self._query_resource_graph_ids('microsoft.network/networkinterfaces', nic_ids)
+            pip_ids = set()
+            for nic in nic_index.values():
+                for ip_configuration in nic.get('properties', {}).get('ipConfigurations', []):
+                    pip_id = ((ip_configuration.get('properties') or {}).get('publicIPAddress') or {}).get('id')
+                    if pip_id:
+                        pip_ids.add(pip_id.lower())
+            pip_index = self._query_resource_graph_ids('microsoft.network/publicipaddresses', pip_ids)
+        else:
+            # every VM is returned; NICs and public IPs may live in other resource groups than the VMs using them, so
+            # list all the attached ones in two queries rather than asking for them by id
+            nic_query = ("Resources "
+                         "| where type =~ 'microsoft.network/networkinterfaces' "
+                         "| where isnotempty(properties.virtualMachine.id) "
+                         "| project id, name, properties")
+            pip_query = ("Resources "
+                         "| where type =~ 'microsoft.network/publicipaddresses' "
+                         "| where isnotempty(properties.ipConfiguration.id) "
+                         "| project id, name, properties")
+            nic_index = dict((nic['id'].lower(), nic) for nic in self._query_resource_graph(nic_query))
+            pip_index = dict((pip['id'].lower(), pip) for pip in self._query_resource_graph(pip_query))
+
+        for host in hosts:
+            # anything missing from the indexes (eg, created since the last Resource Graph update) is fetched from ARM
+            host.resolve_nics(nic_index, pip_index)
+            self._hosts.append(host)
+
+    def _query_resource_graph_ids(self, resource_type, ids):
+        '''
+        Returns a lowercased id -> model index of the given resources, asking Resource Graph for
+        RESOURCE_GRAPH_IDS_PER_QUERY of them at a time.
+        '''
+        index = {}
+        ids = sorted(ids)
+        for start in range(0, len(ids), RESOURCE_GRAPH_IDS_PER_QUERY):
+            chunk = ids[start:start + RESOURCE_GRAPH_IDS_PER_QUERY]
+            query = ("Resources "
+                     "| where type =~ {0} "
+                     "| where id in~ ({1}) "
+                     "| project id, name, properties").format(self._kql_string(resource_type),
+                                                              ', '.join(self._kql_string(resource_id) for resource_id in chunk))
+            for row in self._query_resource_graph(query):
+                index[row['id'].lower()] = row
+        return index
+
+    @staticmethod
+    def _kql_string(value):
+        return "'{0}'".format(value.replace('\\', '\\\\').replace("'", "\\'"))
+
+    def _query_resource_graph(self, query):
+        url = '/providers/Microsoft.ResourceGraph/resources'
+        query_parameters = {'api-version': self._resource_graph_api_version}
+        skip_token = None
+
+        while True:
+            options = {'$top': 1000, 'resultFormat': 'objectArray'}
+            if skip_token:
+                options['$skipToken'] = skip_token
+            body_obj = dict(subscriptions=self._subscriptions, query=query, options=options)
+            body_content = self._serializer.body(body_obj, 'object')
+
+            header = {'x-ms-client-request-id': str(uuid.uuid4())}
+            header.update(self._default_header_parameters)
+
+            # Resource Graph throttles per user; retry like the batch requests do, honoring Retry-After
+            attempt = 0
+            while True:
+                request = self._client.post(url, query_parameters)
+                resp = self._client.send(request, header, body_content, stream=False)
+                if resp.status_code not in RETRYABLE_STATUS_CODES or attempt >= self._max_fetch_retries:
+                    break
+                item = UrlAction(url=url, api_version=self._resource_graph_api_version, handler=None, handler_args=None,
+                                 error_handler=None, attempt=attempt)
+                time.sleep(self._get_retry_delay(item, resp.headers))
+                attempt += 1
+            resp.raise_for_status()
+            page = json.loads(resp.content)
+
+            for row in page.get('data', []):
+                # Resource Graph returns nulls where ARM omits the key entirely
+                yield dict((k, v) for k, v in iteritems(row) if v is not None)
+
+            skip_token = page.get('$skipToken')
+            if not skip_token:
+                break
 
     # use the undocumented /batch endpoint to bulk-send up to 500 requests in a single round-trip
     #
+    # up to batch_concurrency batches are in flight at once; requests queued by response handlers (NICs, public IPs,
+    # next pages) are picked up by whichever worker is free instead of waiting for the current batches to finish
     def _process_queue_batch(self):
+        self._batch_error = None
+        workers = [threading.Thread(target=self._batch_worker) for i in range(self._batch_concurrency)]
+        for worker in workers:
+            worker.daemon = True
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        if self._batch_error:
+            raise self._batch_error
+
+    def _batch_worker(self):
         while True:
-            batch_requests = []
-            batch_item_index = 0
-            batch_response_handlers = dict()
-            try:
-                while batch_item_index < 100:
-                    item = self._request_queue.get_nowait()
-
-                    name = str(uuid.uuid4())
-                    query_parameters = {'api-version': item.api_version}
-                    req = self._client.get(item.url, query_parameters)
-                    batch_requests.append(dict(httpMethod="GET", url=req.url, name=name))
-                    batch_response_handlers[name] = item
-                    batch_item_index += 1
-            except Empty:
-                pass
+            with self._queue_cv:
+                while True:
+                    next_retry = self._release_due_retries()
+                    if self._batch_error or not self._request_queue.empty():
+                        break
+                    if not self._batches_in_flight and next_retry is None:
+                        break
+                    self._queue_cv.wait(next_retry)
+                if self._batch_error or self._request_queue.empty():
+                    # nothing queued, pending retry or in flight that could queue more; wake the others so they exit too
+                    self._queue_cv.notify_all()
+                    return
+                batch_items = self._dequeue_batch_items()
+                self._batches_in_flight += 1
+                throttle_delay = self._throttle_until - time.time()
 
-            if not batch_requests:
-                break
+            try:
+                if throttle_delay > 0:
+                    time.sleep(throttle_delay)
+                self._run_batch(batch_items)
+            except Exception as e:
+                with self._queue_cv:
+                    self._batch_error = self._batch_error or e
+            finally:
+                with self._queue_cv:
+                    self._batches_in_flight -= 1
+                    self._queue_cv.notify_all()
+
+    def _dequeue_batch_items(self):
+        batch_items = []
+        try:
+            while len(batch_items) < 100:
+                batch_items.append(self._request_queue.get_nowait())
+        except Empty:
+            pass
+        return batch_items
+
+    def _run_batch(self, batch_items):
+        batch_requests = []
+        batch_response_handlers = dict()
+        for item in batch_items:
+            name = str(uuid.uuid4())
+            query_parameters = {'api-version': item.api_version}
+            req = self._client.get(item.url, query_parameters)
+            batch_requests.append(dict(httpMethod="GET", url=req.url, name=name))
+            batch_response_handlers[name] = item
 
+        try:
             batch_resp = self._send_batch(batch_requests)
-
-            key_name = None
-            if 'responses' in batch_resp:
-                key_name = 'responses'
-            elif 'value' in batch_resp:
-                key_name = 'value'
-            else:
-                raise AnsibleError("didn't find expected key responses/value in batch response")
-
-            for idx, r in enumerate(batch_resp[key_name]):
-                status_code = r.get('httpStatusCode')
-                returned_name = r['name']
-                result = batch_response_handlers[returned_name]
-                if status_code != 200:
-                    # FUTURE: error-tolerant operation mode (eg, permissions)
-                    raise AnsibleError("a batched request failed with status code {0}, url {1}".format(status_code, result.url))
-                # FUTURE: store/handle errors from individual handlers
-                result.handler(r['content'], **result.handler_args)
+        except CloudError as e:
+            # the /batch call itself was throttled or failed; retry every request it carried
+            if e.status_code not in RETRYABLE_STATUS_CODES:
+                raise
+            headers = e.response.headers if e.response is not None else None
+            for item in batch_items:
+                self._on_request_failure(item, e.status_code, headers)
+            return
+
+        key_name = None
+        if 'responses' in batch_resp:
+            key_name = 'responses'
+        elif 'value' in batch_resp:
+            key_name = 'value'
+        else:
+            raise AnsibleError("didn't find expected key responses/value in batch response")
+
+        for idx, r in enumerate(batch_resp[key_name]):
+            status_code = r.get('httpStatusCode')
+            returned_name = r['name']
+            result = batch_response_handlers[returned_name]
+            self._observe_rate_limit(r.get('headers'))
+            if status_code != 200:
+                self._on_request_failure(result, status_code, r.get('headers'))
+                continue
+            # FUTURE: store/handle errors from individual handlers
+            result.handler(r['content'], **result.handler_args)
 
     def _send_batch(self, batched_requests):
         url = '/batch'
@@ -419,6 +1185,7 @@ class InventoryModule(BaseInventoryPlugin, Constructable):
 
         request = self._client.post(url, query_parameters)
         initial_response = self._client.send(request, header, body_content)
+        self._observe_rate_limit(initial_response.headers)
 
         # FUTURE: configurable timeout?
         poller = ARMPolling(timeout=2)
@@ -448,6 +1215,78 @@ class InventoryModule(BaseInventoryPlugin, Constructable):
 
         return regex.sub('_', name)
 
+
+class CompiledExpression(object):
+    '''
+    A Jinja2 expression compiled once per inventory run and evaluated against each host's variables, instead of
+    rendering a new template string per host. Simple comparisons of a variable against a literal (eg,
+    C(powerstate != "running"), C(location in ['eastus'])) are evaluated directly without Jinja2.
+    '''
+
+    _lookup_regex = re.compile(r'\b(lookup|query|q)\s*\(')
+    _simple_comparison_regex = re.compile(r'^\s*(?P<path>[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*)\s+(?P<op>==|!=|not\s+in|in)\s+(?P<literal>.+?)\s*$')
+    _simple_operators = {
+        '==': lambda a, b: a == b,
+        '!=': lambda a, b: a != b,
+        'in': lambda a, b: a in b,
+        'not in': lambda a, b: a not in b,
+    }
+
+    def __init__(self, expression, environment):
+        self.expression = expression
+        self._environment = environment
+        self._simple = self._parse_simple_comparison(expression)
+        self._compiled = environment.compile_expression(expression, undefined_to_none=False)
+
+    @classmethod
+    def uses_lookup(cls, expression):
+        return bool(cls._lookup_regex.search(expression))
+
+    @classmethod
+    def _parse_simple_comparison(cls, expression):
+        match = cls._simple_comparison_regex.match(expression)
+        if not match:
+            return None
+        try:
+            literal = ast.literal_eval(match.group('literal'))
+        except (ValueError, SyntaxError):
+            return None
+        operator = ' '.join(match.group('op').split())
+        if operator in ('in', 'not in') and not isinstance(literal, (list, tuple, dict) + string_types):
+            return None
+        return match.group('path').split('.'), cls._simple_operators[operator], literal
+
+    def evaluate(self, variables, as_template=False):
+        '''
+        Evaluates the expression against variables. With as_template, the result is converted the way the templar
+        would for C({{ expression }}), so values match what Constructable._compose returned before.
+        '''
+        if self._simple:
+            path, operator, literal = self._simple
+            value = variables
+            for key in path:
+                if not isinstance(value, dict) or key not in value:
+                    # undefined somewhere along the path; let Jinja2 produce the usual error or default
+                    break
+                value = value[key]
+            else:
+                return operator(value, literal)
+
+        context = dict(self._environment.globals)
+        context.update(variables)
+        result = self._compiled(context)
+
+        if isinstance(result, Undefined):
+            # rendering an undefined value raises the same undefined variable error the templar would
+            to_text(result)
+        if as_template:
+            if result is None:
+                return ''
+            if isinstance(result, (int, float)) and not isinstance(result, bool):
+                return to_text(result)
+        return result
+
+
 # VM list (all, N resource groups): VM -> InstanceView, N NICs, N PublicIPAddress)
 # VMSS VMs (all SS, N specific SS, N resource groups?): SS -> VM -> InstanceView, N NICs, N PublicIPAddress)
 
@@ -455,15 +1294,18 @@ class InventoryModule(BaseInventoryPlugin, Constructable):
 class AzureHost(object):
     _powerstate_regex = re.compile('^PowerState/(?P<powerstate>.+)$')
 
-    def __init__(self, vm_model, inventory_client, vmss=None, legacy_name=False):
+    def __init__(self, vm_model, inventory_client, vmss=None, legacy_name=False, fetch_children=True):
         self._inventory_client = inventory_client
-        self._vm_model = vm_model
+        self._fingerprint = self.fingerprint(vm_model)
+        # only keep what hostvars reads; large fleets otherwise hold (and cache) the full models of every VM
+        self._vm_model = trim_model(vm_model, VM_MODEL_FIELDS)
         self._vmss = vmss
 
         self._instanceview = None
 
         self._powerstate = "unknown"
         self.nics = []
+        self.fetch_failed = False
 
         if legacy_name:
             self.default_inventory_hostname = vm_model['name']
@@ -473,17 +1315,80 @@ class AzureHost(object):
 
         self._hostvars = {}
 
-        inventory_client._enqueue_get(url="{0}/instanceView".format(vm_model['id']),
-                                      api_version=self._inventory_client._compute_api_version,
-                                      handler=self._on_instanceview_response)
+        if fetch_children:
+            self.load_instanceview()
+            self.fetch_nics()
+
+    @staticmethod
+    def fingerprint(vm_model):
+        # newer compute API versions return an etag; otherwise any change to the model shows up in its hash
+        if vm_model.get('etag'):
+            return vm_model['etag']
+        # an expanded instanceview changes with power state, which is re-read on every refresh anyway
+        properties = dict((k, v) for k, v in iteritems(vm_model.get('properties', {})) if k != 'instanceView')
+        return hashlib.sha1(to_bytes(json.dumps(dict(vm_model, properties=properties), sort_keys=True))).hexdigest()
+
+    @classmethod
+    def from_snapshot(cls, snapshot, inventory_client, legacy_name=False):
+        host = cls(snapshot['vm'], inventory_client, vmss=snapshot.get('vmss'), legacy_name=legacy_name, fetch_children=False)
+        host._fingerprint = snapshot['fingerprint']
+        host._powerstate = snapshot.get('powerstate', 'unknown')
+        host.nics = [AzureNic.from_snapshot(n, inventory_client) for n in snapshot.get('nics', [])]
+        return host
+
+    def to_snapshot(self):
+        return dict(
+            id=self._vm_model['id'].lower(),
+            fingerprint=self._fingerprint,
+            vm=self._vm_model,
+            vmss=dict(id=self._vmss['id'], name=self._vmss['name']) if self._vmss else None,
+            powerstate=self._powerstate,
+            nics=[n.to_snapshot() for n in self.nics],
+        )
+
+    def load_instanceview(self):
+        instanceview = self._vm_model['properties'].get('instanceView')
+        if instanceview:
+            # listed with $expand=instanceView
+            self._on_instanceview_response(instanceview)
+        else:
+            self.fetch_instanceview()
 
-        nic_refs = vm_model['properties']['networkProfile']['networkInterfaces']
+    def fetch_instanceview(self):
+        self._inventory_client._enqueue_get(url="{0}/instanceView".format(self._vm_model['id']),
+                                            api_version=self._inventory_client._compute_api_version,
+                                            handler=self._on_instanceview_response,
+                                            error_handler=self._on_fetch_error)
+
+    def _nic_refs(self):
+        nic_refs = self._vm_model['properties']['networkProfile']['networkInterfaces']
         for nic in nic_refs:
             # single-nic instances don't set primary, so figure it out...
-            is_primary = nic.get('properties', {}).get('primary', len(nic_refs) == 1)
-            inventory_client._enqueue_get(url=nic['id'], api_version=self._inventory_client._network_api_version,
-                                          handler=self._on_nic_response,
-                                          handler_args=dict(is_primary=is_primary))
+            yield nic, nic.get('properties', {}).get('primary', len(nic_refs) == 1)
+
+    def fetch_nics(self):
+        for nic, is_primary in self._nic_refs():
+            self._fetch_nic(nic['id'], is_primary)
+
+    def _fetch_nic(self, nic_id, is_primary):
+        self._inventory_client._enqueue_get(url=nic_id, api_version=self._inventory_client._get_network_api_version(nic_id),
+                                            handler=self._on_nic_response,
+                                            handler_args=dict(is_primary=is_primary),
+                                            error_handler=self._on_fetch_error)
+
+    def resolve_nics(self, nic_index, pip_index):
+        '''
+        Attach NICs and public IPs from lowercased id -> model indexes, fetching anything not found in them.
+        '''
+        for nic_ref, is_primary in self._nic_refs():
+            nic_model = nic_index.get(nic_ref['id'].lower())
+            if nic_model is None:
+                self._fetch_nic(nic_ref['id'], is_primary)
+                continue
+            nic = AzureNic(nic_model, self._inventory_client, is_primary=is_primary, fetch_children=False,
+                           error_handler=self._on_fetch_error)
+            nic.resolve_public_ips(pip_index)
+            self.nics.append(nic)
 
     @property
     def hostvars(self):
@@ -529,6 +1434,7 @@ class AzureHost(object):
             virtual_machine_size=self._vm_model['properties']['hardwareProfile']['vmSize'] if self._vm_model['properties'].get('hardwareProfile') else None,
             plan=self._vm_model['properties']['plan']['name'] if self._vm_model['properties'].get('plan') else None,
             resource_group=parse_resource_id(self._vm_model['id']).get('resource_group').lower(),
+            subscription_id=parse_resource_id(self._vm_model['id']).get('subscription'),
             default_inventory_hostname=self.default_inventory_hostname,
         )
 
@@ -588,33 +1494,75 @@ class AzureHost(object):
         return self._hostvars
 
     def _on_instanceview_response(self, vm_instanceview_model):
-        self._instanceview = vm_instanceview_model
+        self._instanceview = trim_model(vm_instanceview_model, dict(statuses=None))
         self._powerstate = next((self._powerstate_regex.match(s.get('code', '')).group('powerstate')
                                  for s in vm_instanceview_model.get('statuses', []) if self._powerstate_regex.match(s.get('code', ''))), 'unknown')
 
     def _on_nic_response(self, nic_model, is_primary=False):
-        nic = AzureNic(nic_model=nic_model, inventory_client=self._inventory_client, is_primary=is_primary)
+        nic = AzureNic(nic_model=nic_model, inventory_client=self._inventory_client, is_primary=is_primary,
+                       error_handler=self._on_fetch_error)
         self.nics.append(nic)
 
+    def _on_fetch_error(self, url, status_code):
+        # a host with a missing instanceview, NIC or public IP would yield wrong hostvars; drop it instead
+        self.fetch_failed = True
+
 
 class AzureNic(object):
-    def __init__(self, nic_model, inventory_client, is_primary=False):
-        self._nic_model = nic_model
+    def __init__(self, nic_model, inventory_client, is_primary=False, fetch_children=True, error_handler=None):
+        self._nic_model = trim_model(nic_model, NIC_MODEL_FIELDS)
         self.is_primary = is_primary
         self._inventory_client = inventory_client
+        self._error_handler = error_handler
 
         self.public_ips = {}
 
-        if nic_model.get('properties', {}).get('ipConfigurations'):
-            for ipc in nic_model['properties']['ipConfigurations']:
-                pip = ipc['properties'].get('publicIPAddress')
-                if pip:
-                    self._inventory_client._enqueue_get(url=pip['id'], api_version=self._inventory_client._network_api_version, handler=self._on_pip_response)
+        if fetch_children:
+            for pip in self._pip_refs():
+                self._fetch_pip(pip['id'])
+
+    def _pip_refs(self):
+        return self.public_ip_refs(self._nic_model)
+
+    @staticmethod
+    def public_ip_refs(nic_model):
+        for ipc in nic_model.get('properties', {}).get('ipConfigurations', []):
+            pip = ipc['properties'].get('publicIPAddress')
+            if pip:
+                yield pip
+
+    def _fetch_pip(self, pip_id):
+        self._inventory_client._enqueue_get(url=pip_id, api_version=self._inventory_client._get_network_api_version(pip_id), handler=self._on_pip_response,
+                                            handler_args=dict(pip_ref=pip_id), error_handler=self._error_handler)
+
+    def resolve_public_ips(self, pip_index):
+        for pip_ref in self._pip_refs():
+            pip_model = pip_index.get(pip_ref['id'].lower())
+            if pip_model is None:
+                self._fetch_pip(pip_ref['id'])
+                continue
+            # key by the referenced id; the indexed model's id may differ in case
+            self.public_ips[pip_ref['id']] = AzurePip(pip_model)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, inventory_client):
+        nic = cls(snapshot['nic'], inventory_client, is_primary=snapshot['primary'], fetch_children=False)
+        for pip in snapshot.get('pips', []):
+            # hostvars looks public IPs up by the id the NIC references, not the (possibly differently cased) model id
+            nic.public_ips[pip['ref']] = AzurePip(pip['model'])
+        return nic
+
+    def to_snapshot(self):
+        return dict(
+            nic=self._nic_model,
+            primary=self.is_primary,
+            pips=[dict(ref=ref, model=p._pip_model) for ref, p in iteritems(self.public_ips)],
+        )
 
-    def _on_pip_response(self, pip_model):
-        self.public_ips[pip_model['id']] = AzurePip(pip_model)
+    def _on_pip_response(self, pip_model, pip_ref=None):
+        self.public_ips[pip_ref or pip_model['id']] = AzurePip(pip_model)
 
 
 class AzurePip(object):
     def __init__(self, pip_model):
-        self._pip_model = pip_model
+        self._pip_model = trim_model(pip_model, PIP_MODEL_FIELDS)
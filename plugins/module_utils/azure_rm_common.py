@@ -12,13 +12,20 @@ import re
 import types
 import copy
 import inspect
+import contextlib
 import traceback
 import json
+import random
+import socket
+import tempfile
+import threading
 
 try:
-    from azure.graphrbac import GraphRbacManagementClient
-except Exception:
-    pass
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
 from os.path import expanduser
 
 from ansible.module_utils.basic import \
@@ -48,7 +55,23 @@ AZURE_COMMON_ARGS = dict(
     cloud_environment=dict(type='str', default='AzureCloud'),
     cert_validation_mode=dict(type='str', choices=['validate', 'ignore']),
     api_profile=dict(type='str', default='latest'),
-    adfs_authority_url=dict(type='str', default=None)
+    adfs_authority_url=dict(type='str', default=None),
+    token_cache=dict(type='bool', default=False, fallback=(env_fallback, ['ANSIBLE_AZURE_TOKEN_CACHE'])),
+    auth_cache_path=dict(type='path', default='~/.ansible/azure_rm_auth_cache.json',
+                         fallback=(env_fallback, ['ANSIBLE_AZURE_AUTH_CACHE_PATH'])),
+    metadata_cache_ttl=dict(type='int', default=3600, fallback=(env_fallback, ['ANSIBLE_AZURE_METADATA_CACHE_TTL'])),
+    catalog_cache_ttl=dict(type='int', default=0, fallback=(env_fallback, ['ANSIBLE_AZURE_CATALOG_CACHE_TTL'])),
+    max_retries=dict(type='int', default=3, fallback=(env_fallback, ['ANSIBLE_AZURE_MAX_RETRIES'])),
+    retry_backoff_factor=dict(type='float', default=0.8, fallback=(env_fallback, ['ANSIBLE_AZURE_RETRY_BACKOFF_FACTOR'])),
+    retry_max_backoff=dict(type='int', default=90, fallback=(env_fallback, ['ANSIBLE_AZURE_RETRY_MAX_BACKOFF'])),
+    rate_limit_threshold=dict(type='int', default=10, fallback=(env_fallback, ['ANSIBLE_AZURE_RATE_LIMIT_THRESHOLD'])),
+    http_keep_alive=dict(type='bool', default=True, fallback=(env_fallback, ['ANSIBLE_AZURE_HTTP_KEEP_ALIVE'])),
+    http_pool_size=dict(type='int', default=10, fallback=(env_fallback, ['ANSIBLE_AZURE_HTTP_POOL_SIZE'])),
+    http_connect_timeout=dict(type='float', default=100, fallback=(env_fallback, ['ANSIBLE_AZURE_HTTP_CONNECT_TIMEOUT'])),
+    http_read_timeout=dict(type='float', default=100, fallback=(env_fallback, ['ANSIBLE_AZURE_HTTP_READ_TIMEOUT'])),
+    http_proxy=dict(type='str', fallback=(env_fallback, ['ANSIBLE_AZURE_HTTP_PROXY'])),
+    profiling=dict(type='bool', default=False, fallback=(env_fallback, ['ANSIBLE_AZURE_PROFILING'])),
+    profiling_path=dict(type='path', fallback=(env_fallback, ['ANSIBLE_AZURE_PROFILING_PATH']))
 )
 
 AZURE_CREDENTIAL_ENV_MAPPING = dict(
@@ -181,6 +204,9 @@ VSCODEEXT_USER_AGENT_KEY = 'VSCODEEXT_USER_AGENT'
 CIDR_PATTERN = re.compile(r"(([0-9]|[1-9][0-9]|1[0-9]{2}|2[0-4][0-9]|25[0-5])\.){3}([0-9]|[1-9][0-9]|1"
                           r"[0-9]{2}|2[0-4][0-9]|25[0-5])(/([0-9]|[1-2][0-9]|3[0-2]))")
 
+# cached AAD tokens are only used while they are valid for at least this many seconds more
+TOKEN_CACHE_MARGIN = 300
+
 AZURE_SUCCESS_STATE = "Succeeded"
 AZURE_FAILED_STATE = "Failed"
 
@@ -215,6 +241,60 @@ except ImportError:
     HAS_MSRESTAZURE_EXC = traceback.format_exc()
     HAS_MSRESTAZURE = False
 
+try:
+    from importlib.util import find_spec
+except ImportError:
+    from pkgutil import find_loader as find_spec
+
+# SDK packages behind the clients and models of AzureRMModuleBase. Importing all of them costs far more than a typical
+# task spends talking to Azure, so each is only imported when a module first uses the matching property; here they
+# are just located, so HAS_AZURE still reports a missing one up front.
+AZURE_SDK_PACKAGES = [
+    'adal',
+    'azure.graphrbac',
+    'azure.mgmt.automation',
+    'azure.mgmt.compute',
+    'azure.mgmt.containerinstance',
+    'azure.mgmt.containerregistry',
+    'azure.mgmt.containerservice',
+    'azure.mgmt.dns',
+    'azure.mgmt.iothub',
+    'azure.mgmt.loganalytics',
+    'azure.mgmt.marketplaceordering',
+    'azure.mgmt.monitor',
+    'azure.mgmt.network',
+    'azure.mgmt.privatedns',
+    'azure.mgmt.rdbms',
+    'azure.mgmt.resource',
+    'azure.mgmt.servicebus',
+    'azure.mgmt.sql',
+    'azure.mgmt.storage',
+    'azure.mgmt.trafficmanager',
+    'azure.mgmt.web',
+    'azure.storage.blob',
+]
+
+
+def has_package(name):
+    try:
+        return find_spec(name) is not None
+    except ImportError:
+        # a parent package is missing
+        return False
+
+
+def import_sdk(module_name, name=None):
+    '''
+    Import an SDK module, or a name from it, on first use.
+
+    :param module_name: dotted module name, eg azure.mgmt.network
+    :param name: optional attribute of the module to return instead of the module itself
+    :return: module or attribute
+    '''
+    module = importlib.import_module(module_name)
+    return getattr(module, name) if name else module
+
+
 try:
     from enum import Enum
     from msrestazure.azure_active_directory import AADTokenCredentials
@@ -223,47 +303,13 @@ try:
     from msrestazure.tools import parse_resource_id, resource_id, is_valid_resource_id
     from msrestazure import azure_cloud
     from azure.common.credentials import ServicePrincipalCredentials, UserPassCredentials
-    from azure.mgmt.monitor.version import VERSION as monitor_client_version
-    from azure.mgmt.network.version import VERSION as network_client_version
-    from azure.mgmt.storage.version import VERSION as storage_client_version
-    from azure.mgmt.compute.version import VERSION as compute_client_version
-    from azure.mgmt.resource.version import VERSION as resource_client_version
-    from azure.mgmt.dns.version import VERSION as dns_client_version
-    from azure.mgmt.web.version import VERSION as web_client_version
-    from azure.mgmt.network import NetworkManagementClient
-    from azure.mgmt.resource.resources import ResourceManagementClient
-    from azure.mgmt.resource.subscriptions import SubscriptionClient
-    from azure.mgmt.storage import StorageManagementClient
-    from azure.mgmt.compute import ComputeManagementClient
-    from azure.mgmt.dns import DnsManagementClient
-    from azure.mgmt.privatedns import PrivateDnsManagementClient
-    import azure.mgmt.privatedns.models as PrivateDnsModels
-    from azure.mgmt.monitor import MonitorManagementClient
-    from azure.mgmt.web import WebSiteManagementClient
-    from azure.mgmt.containerservice import ContainerServiceClient
-    from azure.mgmt.marketplaceordering import MarketplaceOrderingAgreements
-    from azure.mgmt.trafficmanager import TrafficManagerManagementClient
-    from azure.storage.cloudstorageaccount import CloudStorageAccount
-    from azure.storage.blob import PageBlobService, BlockBlobService
-    from adal.authentication_context import AuthenticationContext
-    from azure.mgmt.sql import SqlManagementClient
-    from azure.mgmt.servicebus import ServiceBusManagementClient
-    import azure.mgmt.servicebus.models as ServicebusModel
-    from azure.mgmt.rdbms.postgresql import PostgreSQLManagementClient
-    from azure.mgmt.rdbms.mysql import MySQLManagementClient
-    from azure.mgmt.rdbms.mariadb import MariaDBManagementClient
-    from azure.mgmt.containerregistry import ContainerRegistryManagementClient
-    from azure.mgmt.containerinstance import ContainerInstanceManagementClient
-    from azure.mgmt.loganalytics import LogAnalyticsManagementClient
-    import azure.mgmt.loganalytics.models as LogAnalyticsModels
-    from azure.mgmt.automation import AutomationClient
-    import azure.mgmt.automation.models as AutomationModel
-    from azure.mgmt.iothub import IotHubClient
-    from azure.mgmt.iothub import models as IoTHubModels
     from msrest.service_client import ServiceClient
     from msrestazure import AzureConfiguration
     from msrest.authentication import Authentication
-    from azure.mgmt.resource.locks import ManagementLockClient
+    import requests
+    missing_sdk_packages = [package for package in AZURE_SDK_PACKAGES if not has_package(package)]
+    if missing_sdk_packages:
+        raise ImportError("No module named {0}".format(', '.join(missing_sdk_packages)))
 except ImportError as exc:
     Authentication = object
     HAS_AZURE_EXC = traceback.format_exc()
@@ -272,7 +318,7 @@ except ImportError as exc:
 from base64 import b64encode, b64decode
 from hashlib import sha256
 from hmac import HMAC
-from time import time
+from time import time, sleep, mktime, strptime
 
 try:
     from urllib import (urlencode, quote_plus)
@@ -355,6 +401,220 @@ AZURE_PKG_VERSIONS = {
 
 AZURE_MIN_RELEASE = '2.0.0'
 
+# seconds wait_for polls before giving up, unless told otherwise
+AZURE_WAIT_TIMEOUT = 1800
+
+# tasks run_parallel runs at the same time, unless told otherwise
+AZURE_PARALLEL_TASKS = 8
+
+# serializers for serialize_obj, keyed by the enum modules their class map was built from
+_SERIALIZERS = {}
+
+
+class AzureRMClientRegistry(object):
+    '''
+    Per-process cache of the management clients built by get_mgmt_svc_client, and of the per-type work done before
+    building one: the constructor's argspec and the installed package version check.
+
+    Clients are keyed by type, base URL, API version or profile, credentials, subscription and certificate
+    validation mode, so a client is only shared between callers that would have built an identical one.
+    '''
+
+    def __init__(self):
+        self.clients = {}
+        self.argspecs = {}
+        self.checked_types = set()
+
+    def get_argspec(self, client_type):
+        if client_type not in self.argspecs:
+            self.argspecs[client_type] = inspect.getargspec(client_type.__init__)
+        return self.argspecs[client_type]
+
+    def invalidate(self, client_type=None):
+        '''
+        Forget the constructed clients, all of them or only those of client_type, so that the next request for
+        one builds it anew.
+        '''
+        if client_type is None:
+            self.clients.clear()
+            return
+        for key in [key for key in self.clients if key[0] is client_type]:
+            del self.clients[key]
+
+
+_CLIENT_REGISTRY = AzureRMClientRegistry()
+
+# throttled requests are retried too, after the delay given by their Retry-After header
+AZURE_RETRY_STATUS_CODES = [408, 429, 500, 502, 503, 504]
+AZURE_RATE_LIMIT_HEADERS = ['x-ms-ratelimit-remaining-subscription-reads',
+                            'x-ms-ratelimit-remaining-subscription-writes',
+                            'x-ms-ratelimit-remaining-subscription-deletes']
+
+
+class AzureRMRetryPolicy(object):
+    '''
+    Retry and backoff settings applied to the configuration of every client a module creates.
+
+    Failed connections and the status codes in AZURE_RETRY_STATUS_CODES are retried with exponential backoff, waiting
+    for Retry-After instead when the response has one. Once the remaining ARM request quota reported by a response
+    drops below rate_limit_threshold, the next request is delayed in proportion, so parallel runs slow down before
+    ARM starts throttling them.
+    '''
+
+    def __init__(self, max_retries=3, backoff_factor=0.8, max_backoff=90, rate_limit_threshold=10):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.rate_limit_threshold = rate_limit_threshold
+
+    def apply(self, config):
+        config.retry_policy.retries = self.max_retries
+        config.retry_policy.backoff_factor = self.backoff_factor
+        config.retry_policy.max_backoff = self.max_backoff
+        retry = config.retry_policy.policy
+        retry.status_forcelist = AZURE_RETRY_STATUS_CODES
+        retry.respect_retry_after_header = True
+        # hand the last response back once retries are exhausted, so callers raise a CloudError with its message
+        retry.raise_on_status = False
+        if self.rate_limit_threshold > 0 and self.rate_limit_hook not in config.hooks:
+            config.hooks.append(self.rate_limit_hook)
+        return config
+
+    def rate_limit_hook(self, response, *args, **kwargs):
+        remaining = [int(response.headers[header]) for header in AZURE_RATE_LIMIT_HEADERS
+                     if (response.headers.get(header) or '').isdigit()]
+        if remaining and min(remaining) < self.rate_limit_threshold:
+            sleep(min(self.max_backoff, self.backoff_factor * (self.rate_limit_threshold - min(remaining))))
+
+
+class AzureRMSessionPool(object):
+    '''
+    Connection settings applied to the configuration of every client a module creates.
+
+    msrest closes a client's requests session after each request unless keep_alive is set, so every request paid
+    for a new TCP connection and TLS handshake, and separate clients never shared a connection. With keep_alive,
+    all clients talking to the same endpoint send through one pooled session from the thread that applied this
+    configuration, which is where modules make their requests.
+
+    msrest keeps the session of a client per thread, so requests a client makes from other threads go through a
+    session of their own for that thread; keep_alive still keeps it open between the requests of that thread.
+    '''
+
+    def __init__(self, keep_alive=True, pool_size=10, connect_timeout=100, read_timeout=100, proxy=None):
+        self.keep_alive = keep_alive
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.proxy = proxy
+        self._sessions = {}
+
+    def get_session(self, url):
+        '''
+        Return the pooled session for the endpoint (scheme and host) of url.
+        '''
+        parsed = urlparse.urlparse(url)
+        key = (parsed.scheme, parsed.netloc)
+        if key not in self._sessions:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._sessions[key] = session
+        return self._sessions[key]
+
+    def apply(self, config):
+        config.connection.timeout = (self.connect_timeout, self.read_timeout)
+        if self.proxy:
+            config.proxies.add('http', self.proxy)
+            config.proxies.add('https', self.proxy)
+        config.keep_alive = self.keep_alive
+        # the requests sender of a client's pipeline; not part of the msrest API, so only share when it's there
+        sender = getattr(getattr(getattr(config, 'pipeline', None), '_sender', None), 'driver', None)
+        if self.keep_alive and config.base_url and hasattr(sender, 'session'):
+            sender.session = self.get_session(config.base_url)
+        return config
+
+
+class AzureRMTimings(object):
+    '''
+    Opt-in record of where a module run spends its time: every HTTP request sent by its clients, and the time spent in
+    phases such as authentication, client construction and serialization.
+    '''
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time()
+        self.phases = {}
+        self.requests = []
+
+    @contextlib.contextmanager
+    def measure(self, phase):
+        started = time()
+        try:
+            yield
+        finally:
+            self.record(phase, time() - started)
+
+    def record(self, phase, seconds):
+        if not self.enabled:
+            return
+        totals = self.phases.setdefault(phase, dict(count=0, seconds=0.0))
+        totals['count'] += 1
+        totals['seconds'] += seconds
+
+    def apply(self, config):
+        if self.enabled and self.response_hook not in config.hooks:
+            config.hooks.append(self.response_hook)
+        return config
+
+    def response_hook(self, response, *args, **kwargs):
+        retries = getattr(getattr(response.raw, 'retries', None), 'history', None) or []
+        self.requests.append(dict(method=response.request.method,
+                                  url=self.url_template(response.request.url),
+                                  status=response.status_code,
+                                  seconds=round(response.elapsed.total_seconds(), 3),
+                                  retries=len(retries),
+                                  request_id=response.headers.get('x-ms-request-id')))
+
+    @staticmethod
+    def url_template(url):
+        '''
+        Strip a request URL down to its operation, e.g. /subscriptions/{subscriptions}/resourceGroups/{resourceGroups}
+        /providers/Microsoft.Compute/virtualMachines/{virtualMachines}?api-version=2019-07-01, so that requests to
+        different resources of a kind can be aggregated.
+        '''
+        parsed = urlparse.urlparse(url)
+        segments = parsed.path.strip('/').split('/')
+        template = []
+        index = 0
+        while index < len(segments):
+            template.append(segments[index])
+            if segments[index].lower() == 'providers' and index + 1 < len(segments):
+                # resource provider namespace
+                template.append(segments[index + 1])
+            elif index + 1 < len(segments):
+                template.append('{' + segments[index] + '}')
+            index += 2
+        query = [(key, value) for key, value in urlparse.parse_qsl(parsed.query) if key == 'api-version']
+        return '/' + '/'.join(template) + ('?' + urlencode(query) if query else '')
+
+    def summary(self):
+        return dict(seconds=round(time() - self.started, 3),
+                    phases=dict((phase, dict(count=totals['count'], seconds=round(totals['seconds'], 3)))
+                                for phase, totals in self.phases.items()),
+                    requests=self.requests)
+
+    def write(self, path, module_name):
+        '''
+        Append the summary as a line of JSON to path, so that the runs of a whole playbook can be aggregated.
+        '''
+        entry = dict(module=module_name, time=time(), **self.summary())
+        try:
+            with open(os.path.expanduser(path), 'a') as log_file:
+                log_file.write(json.dumps(entry) + '\n')
+        except (IOError, OSError):
+            pass
+
 
 class AzureRMModuleBase(object):
     def __init__(self, derived_arg_spec, bypass_checks=False, no_log=False,
@@ -425,21 +685,48 @@ class AzureRMModuleBase(object):
         self.check_mode = self.module.check_mode
         self.api_profile = self.module.params.get('api_profile')
         self.facts_module = facts_module
+        self.retry_policy = AzureRMRetryPolicy(max_retries=self.module.params.get('max_retries'),
+                                               backoff_factor=self.module.params.get('retry_backoff_factor'),
+                                               max_backoff=self.module.params.get('retry_max_backoff'),
+                                               rate_limit_threshold=self.module.params.get('rate_limit_threshold'))
+        self.session_pool = AzureRMSessionPool(keep_alive=self.module.params.get('http_keep_alive'),
+                                               pool_size=self.module.params.get('http_pool_size'),
+                                               connect_timeout=self.module.params.get('http_connect_timeout'),
+                                               read_timeout=self.module.params.get('http_read_timeout'),
+                                               proxy=self.module.params.get('http_proxy'))
+        self.timings = AzureRMTimings(enabled=self.module.params.get('profiling') or bool(self.module.params.get('profiling_path')))
         # self.debug = self.module.params.get('debug')
 
         # delegate auth to AzureRMAuth class (shared with all plugin types)
-        self.azure_auth = AzureRMAuth(fail_impl=self.fail, is_ad_resource=is_ad_resource, **self.module.params)
+        with self.timings.measure('auth'):
+            self.azure_auth = AzureRMAuth(fail_impl=self.fail, is_ad_resource=is_ad_resource, **self.module.params)
 
         # common parameter validation
         if self.module.params.get('tags'):
             self.validate_tags(self.module.params['tags'])
 
         if not skip_exec:
-            res = self.exec_module(**self.module.params)
-            self.module.exit_json(**res)
+            with self.timings.measure('exec_module'):
+                res = self.exec_module(**self.module.params)
+            self.module.exit_json(**self.add_timings(res))
+
+    def add_timings(self, result):
+        '''
+        Add the azure_timings summary to a module result when profiling, and log it to profiling_path if set.
+        '''
+        timings = getattr(self, 'timings', None)
+        if not timings or not timings.enabled:
+            return result
+        result['azure_timings'] = timings.summary()
+        if self.module.params.get('profiling_path'):
+            timings.write(self.module.params['profiling_path'], self.module._name)
+        return result
 
     def check_client_version(self, client_type):
         # Ensure Azure modules are at least 2.0.0rc5.
+        if client_type in _CLIENT_REGISTRY.checked_types:
+            return
+        _CLIENT_REGISTRY.checked_types.add(client_type)
         package_version = AZURE_PKG_VERSIONS.get(client_type.__name__, None)
         if package_version is not None:
             client_name = package_version.get('package_name')
@@ -468,7 +755,7 @@ class AzureRMModuleBase(object):
         :param kwargs: Any key=value pairs
         :return: None
         '''
-        self.module.fail_json(msg=msg, **kwargs)
+        self.module.fail_json(msg=msg, **self.add_timings(kwargs))
 
     def deprecate(self, msg, version=None):
         self.module.deprecate(msg, version)
@@ -585,18 +872,37 @@ class AzureRMModuleBase(object):
         :param enum_modules: List of module names to build enum dependencies from.
         :return: serialized result
         '''
-        enum_modules = [] if enum_modules is None else enum_modules
+        with self.timings.measure('serialization'):
+            return self._get_serializer(enum_modules).body(obj, class_name, keep_readonly=True)
+
+    def serialize_objs(self, objs, class_name, enum_modules=None):
+        '''
+        Return JSON representations of a list of Azure objects of the same class.
 
-        dependencies = dict()
-        if enum_modules:
-            for module_name in enum_modules:
+        :param objs: iterable of Azure objects
+        :param class_name: Name of the objects' class
+        :param enum_modules: List of module names to build enum dependencies from.
+        :return: list of serialized results
+        '''
+        with self.timings.measure('serialization'):
+            serializer = self._get_serializer(enum_modules)
+            return [serializer.body(obj, class_name, keep_readonly=True) for obj in objs or []]
+
+    def _get_serializer(self, enum_modules=None):
+        # scanning the enum modules for classes is far slower than serializing one object, so do it once per process
+        key = tuple(enum_modules or [])
+        serializer = _SERIALIZERS.get(key)
+        if serializer is None:
+            dependencies = dict()
+            for module_name in key:
                 mod = importlib.import_module(module_name)
                 for mod_class_name, mod_class_obj in inspect.getmembers(mod, predicate=inspect.isclass):
                     dependencies[mod_class_name] = mod_class_obj
-            self.log("dependencies: ")
-            self.log(str(dependencies))
-        serializer = Serializer(classes=dependencies)
-        return serializer.body(obj, class_name, keep_readonly=True)
+            if dependencies:
+                self.log("dependencies: ")
+                self.log(str(dependencies))
+            serializer = _SERIALIZERS[key] = Serializer(classes=dependencies)
+        return serializer
 
     def get_poller_result(self, poller, wait=5):
         '''
@@ -615,6 +921,131 @@ class AzureRMModuleBase(object):
             self.log(str(exc))
             raise
 
+    def wait_for(self, get_state, predicate, timeout=AZURE_WAIT_TIMEOUT, delay=2, max_delay=30, description='the resource'):
+        '''
+        Poll until a resource reaches the wanted state, e.g. is gone after a delete.
+
+        The delay between polls doubles from delay up to max_delay seconds, with jitter so that parallel tasks don't
+        poll in lockstep.
+
+        :param get_state: callable returning the current state, e.g. the module's get method
+        :param predicate: callable taking a state and returning True once it is the wanted one
+        :param timeout: seconds after which the module fails
+        :param description: what is being waited for, used in the failure message
+        :return the first state matching predicate
+        '''
+        deadline = time() + timeout
+        state = get_state()
+        while not predicate(state):
+            remaining = deadline - time()
+            if remaining <= 0:
+                self.fail("Timed out after {0} seconds waiting for {1}".format(timeout, description))
+            wait = min(remaining, random.uniform(delay / 2.0, delay))
+            self.log("Waiting {0:.1f} sec for {1}".format(wait, description))
+            sleep(wait)
+            delay = min(max_delay, delay * 2)
+            state = get_state()
+        return state
+
+    def run_parallel(self, tasks, concurrency=AZURE_PARALLEL_TASKS):
+        '''
+        Run independent calls, e.g. waiting on several delete pollers, on up to concurrency threads and wait for all
+        of them. A failing task doesn't stop the others, so the caller can report every failure at once.
+
+        Tasks must raise rather than call fail(), which would exit from a worker thread.
+
+        :param tasks: iterable of (description, callable) pairs, consumed as the workers get to them, so it can be a
+                      generator of any length
+        :param concurrency: maximum number of tasks running at the same time
+        :return: list of (description, exception) pairs for the tasks that raised, in task order
+        '''
+        errors = []
+        pending = enumerate(tasks)
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                with lock:
+                    try:
+                        index, (description, task) = next(pending)
+                    except StopIteration:
+                        return
+                try:
+                    task()
+                except Exception as exc:
+                    self.log("Error in {0} - {1}".format(description, str(exc)))
+                    errors.append((index, description, exc))
+
+        threads = [threading.Thread(target=worker) for dummy in range(max(concurrency, 1))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return [(description, exc) for index, description, exc in sorted(errors, key=lambda error: error[0])]
+
+    def get_cached_catalog(self, key, fetch, refresh=False):
+        '''
+        Return a catalog that rarely changes, such as the VM sizes of a location, from auth_cache_path if another
+        invocation fetched it within catalog_cache_ttl, so that deploying many VMs in a loop lists it only once. With
+        catalog_cache_ttl 0 (the default), the catalog is always fetched and nothing is cached.
+
+        Lookups that miss in a cached catalog should call again with refresh, in case it changed since. Entries added
+        to or removed from the catalog since it was cached go unnoticed otherwise, until the cache expires.
+
+        :param key: identifies the catalog within the subscription
+        :param fetch: callable returning the catalog, which must be JSON serializable
+        :param refresh: fetch the catalog even if it is cached
+        :return: the catalog, and whether it came from the cache
+        '''
+        ttl = self.module.params.get('catalog_cache_ttl') or 0
+        if ttl <= 0:
+            return fetch(), False
+
+        cache_key = 'catalog:{0}:{1}'.format(self.subscription_id, key)
+        if not refresh:
+            catalog = self.azure_auth._auth_cache.get(cache_key)
+            if catalog is not None:
+                return catalog, True
+        catalog = fetch()
+        self.azure_auth._auth_cache.set(cache_key, catalog, time() + ttl)
+        return catalog, False
+
+    def list_image_versions(self, location, publisher, offer, sku, refresh=False):
+        '''
+        Names of the versions of a marketplace image, in the order the service lists them (the latest last), and
+        whether they came from the cache, see get_cached_catalog.
+        '''
+        def fetch():
+            images = self.compute_client.virtual_machine_images.list(location, publisher, offer, sku)
+            return [image.name for image in images or []]
+        key = 'image_versions:{0}:{1}:{2}:{3}'.format(normalize_location_name(location), publisher, offer, sku).lower()
+        return self.get_cached_catalog(key, fetch, refresh)
+
+    def list_vm_sizes(self, location, refresh=False):
+        '''
+        Names of the virtual machine sizes available in a location, and whether they came from the cache.
+        '''
+        def fetch():
+            return [size.name for size in self.compute_client.virtual_machine_sizes.list(location)]
+        return self.get_cached_catalog('vm_sizes:{0}'.format(normalize_location_name(location)), fetch, refresh)
+
+    def get_custom_images(self, resource_group=None, refresh=False):
+        '''
+        Ids of the custom images of a resource group, or of the whole subscription, by image name, and whether they came
+        from the cache. Where names are repeated across resource groups, the first image listed wins.
+        '''
+        def fetch():
+            if resource_group:
+                images = self.compute_client.images.list_by_resource_group(resource_group)
+            else:
+                images = self.compute_client.images.list()
+            image_ids = dict()
+            for image in images:
+                image_ids.setdefault(image.name, image.id)
+            return image_ids
+        return self.get_cached_catalog('custom_images:{0}'.format((resource_group or '').lower()), fetch, refresh)
+
     def check_provisioning_state(self, azure_object, requested_state='present'):
         '''
         Check an Azure object's provisioning state. If something did not complete the provisioning
@@ -662,15 +1093,14 @@ class AzureRMModuleBase(object):
         try:
             self.log('Create blob service')
             if storage_blob_type == 'page':
-                return PageBlobService(endpoint_suffix=self._cloud_environment.suffixes.storage_endpoint,
-                                       account_name=storage_account_name,
-                                       account_key=account_keys.keys[0].value)
+                blob_service = import_sdk('azure.storage.blob', 'PageBlobService')
             elif storage_blob_type == 'block':
-                return BlockBlobService(endpoint_suffix=self._cloud_environment.suffixes.storage_endpoint,
-                                        account_name=storage_account_name,
-                                        account_key=account_keys.keys[0].value)
+                blob_service = import_sdk('azure.storage.blob', 'BlockBlobService')
             else:
                 raise Exception("Invalid storage blob type defined.")
+            return blob_service(endpoint_suffix=self._cloud_environment.suffixes.storage_endpoint,
+                                account_name=storage_account_name,
+                                account_key=account_keys.keys[0].value)
         except Exception as exc:
             self.fail("Error creating blob service client for storage account {0} - {1}".format(storage_account_name,
                                                                                                 str(exc)))
@@ -840,20 +1270,30 @@ class AzureRMModuleBase(object):
     def get_graphrbac_client(self, tenant_id):
         cred = self.azure_auth.azure_credentials
         base_url = self.azure_auth._cloud_environment.endpoints.active_directory_graph_resource_id
-        client = GraphRbacManagementClient(cred, tenant_id, base_url)
+        client = import_sdk('azure.graphrbac', 'GraphRbacManagementClient')(cred, tenant_id, base_url)
+        client.config = self.configure_client(client.config)
 
         return client
 
     def get_mgmt_svc_client(self, client_type, base_url=None, api_version=None, suppress_subscription_id=False):
         self.log('Getting management service client {0}'.format(client_type.__name__))
-        self.check_client_version(client_type)
-
-        client_argspec = inspect.getargspec(client_type.__init__)
 
         if not base_url:
             # most things are resource_manager, don't make everyone specify
             base_url = self.azure_auth._cloud_environment.endpoints.resource_manager
 
+        # cached clients hold their credentials, so the id can't be reused by other credentials while they are cached
+        client_key = (client_type, base_url, api_version, self.api_profile, id(self.azure_auth.azure_credentials),
+                      None if suppress_subscription_id else self.azure_auth.subscription_id, self.azure_auth._cert_validation_mode)
+        client = _CLIENT_REGISTRY.clients.get(client_key)
+        if client is not None:
+            return client
+
+        started = time()
+        self.check_client_version(client_type)
+
+        client_argspec = _CLIENT_REGISTRY.get_argspec(client_type)
+
         # Some management clients do not take a subscription ID as parameters.
         if suppress_subscription_id:
             client_kwargs = dict(credentials=self.azure_auth.azure_credentials, base_url=base_url)
@@ -893,12 +1333,37 @@ class AzureRMModuleBase(object):
             client.models = types.MethodType(_ansible_get_models, client)
 
         client.config = self.add_user_agent(client.config)
+        client.config = self.configure_client(client.config)
 
         if self.azure_auth._cert_validation_mode == 'ignore':
             client.config.session_configuration_callback = self._validation_ignore_callback
 
+        _CLIENT_REGISTRY.clients[client_key] = client
+        self.timings.record('client_construction', time() - started)
         return client
 
+    def configure_client(self, config):
+        '''
+        Apply the module's retry policy, shared connection pool and profiling hooks to a client's configuration.
+
+        :param config: configuration of a client built by the module
+        :return: the configuration
+        '''
+        config = self.retry_policy.apply(config)
+        config = self.session_pool.apply(config)
+        return self.timings.apply(config)
+
+    def invalidate_clients(self, client_type=None):
+        '''
+        Drop cached management clients, all of them or only those of client_type, including the ones held by the
+        client properties, e.g. after changing credentials or API versions.
+        '''
+        _CLIENT_REGISTRY.invalidate(client_type)
+        for attr, value in list(vars(self).items()):
+            if attr.startswith('_') and attr.endswith('_client') and value is not None and \
+                    (client_type is None or isinstance(value, client_type)):
+                setattr(self, attr, None)
+
     def add_user_agent(self, config):
         # Add user agent for Ansible
         config.add_user_agent(ANSIBLE_USER_AGENT)
@@ -933,7 +1398,9 @@ class AzureRMModuleBase(object):
         config = AzureConfiguration(base_url='https://{0}'.format(url))
         config.credentials = AzureSASAuthentication(token=self.generate_sas_token(**kwags))
         config = self.add_user_agent(config)
-        return ServiceClient(creds=config.credentials, config=config)
+        client = ServiceClient(creds=config.credentials, config=config)
+        client.config = self.configure_client(client.config)
+        return client
 
     # passthru methods to AzureAuth instance for backcompat
     @property
@@ -952,20 +1419,20 @@ class AzureRMModuleBase(object):
     def storage_client(self):
         self.log('Getting storage client...')
         if not self._storage_client:
-            self._storage_client = self.get_mgmt_svc_client(StorageManagementClient,
+            self._storage_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.storage', 'StorageManagementClient'),
                                                             base_url=self._cloud_environment.endpoints.resource_manager,
                                                             api_version='2019-06-01')
         return self._storage_client
 
     @property
     def storage_models(self):
-        return StorageManagementClient.models("2019-06-01")
+        return import_sdk('azure.mgmt.storage', 'StorageManagementClient').models("2019-06-01")
 
     @property
     def subscription_client(self):
         self.log('Getting subscription client...')
         if not self._subscription_client:
-            self._subscription_client = self.get_mgmt_svc_client(SubscriptionClient,
+            self._subscription_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.resource.subscriptions', 'SubscriptionClient'),
                                                                  base_url=self._cloud_environment.endpoints.resource_manager,
                                                                  suppress_subscription_id=True,
                                                                  api_version='2019-11-01')
@@ -973,13 +1440,13 @@ class AzureRMModuleBase(object):
 
     @property
     def subscription_models(self):
-        return SubscriptionClient.models("2019-11-01")
+        return import_sdk('azure.mgmt.resource.subscriptions', 'SubscriptionClient').models("2019-11-01")
 
     @property
     def network_client(self):
         self.log('Getting network client')
         if not self._network_client:
-            self._network_client = self.get_mgmt_svc_client(NetworkManagementClient,
+            self._network_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.network', 'NetworkManagementClient'),
                                                             base_url=self._cloud_environment.endpoints.resource_manager,
                                                             api_version='2019-06-01')
         return self._network_client
@@ -987,13 +1454,13 @@ class AzureRMModuleBase(object):
     @property
     def network_models(self):
         self.log("Getting network models...")
-        return NetworkManagementClient.models("2019-06-01")
+        return import_sdk('azure.mgmt.network', 'NetworkManagementClient').models("2019-06-01")
 
     @property
     def rm_client(self):
         self.log('Getting resource manager client')
         if not self._resource_client:
-            self._resource_client = self.get_mgmt_svc_client(ResourceManagementClient,
+            self._resource_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.resource.resources', 'ResourceManagementClient'),
                                                              base_url=self._cloud_environment.endpoints.resource_manager,
                                                              api_version='2017-05-10')
         return self._resource_client
@@ -1001,13 +1468,13 @@ class AzureRMModuleBase(object):
     @property
     def rm_models(self):
         self.log("Getting resource manager models")
-        return ResourceManagementClient.models("2017-05-10")
+        return import_sdk('azure.mgmt.resource.resources', 'ResourceManagementClient').models("2017-05-10")
 
     @property
     def compute_client(self):
         self.log('Getting compute client')
         if not self._compute_client:
-            self._compute_client = self.get_mgmt_svc_client(ComputeManagementClient,
+            self._compute_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.compute', 'ComputeManagementClient'),
                                                             base_url=self._cloud_environment.endpoints.resource_manager,
                                                             api_version='2019-07-01')
         return self._compute_client
@@ -1015,13 +1482,13 @@ class AzureRMModuleBase(object):
     @property
     def compute_models(self):
         self.log("Getting compute models")
-        return ComputeManagementClient.models("2019-07-01")
+        return import_sdk('azure.mgmt.compute', 'ComputeManagementClient').models("2019-07-01")
 
     @property
     def dns_client(self):
         self.log('Getting dns client')
         if not self._dns_client:
-            self._dns_client = self.get_mgmt_svc_client(DnsManagementClient,
+            self._dns_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.dns', 'DnsManagementClient'),
                                                         base_url=self._cloud_environment.endpoints.resource_manager,
                                                         api_version='2018-05-01')
         return self._dns_client
@@ -1029,27 +1496,27 @@ class AzureRMModuleBase(object):
     @property
     def dns_models(self):
         self.log("Getting dns models...")
-        return DnsManagementClient.models('2018-05-01')
+        return import_sdk('azure.mgmt.dns', 'DnsManagementClient').models('2018-05-01')
 
     @property
     def private_dns_client(self):
         self.log('Getting private dns client')
         if not self._private_dns_client:
             self._private_dns_client = self.get_mgmt_svc_client(
-                PrivateDnsManagementClient,
+                import_sdk('azure.mgmt.privatedns', 'PrivateDnsManagementClient'),
                 base_url=self._cloud_environment.endpoints.resource_manager)
         return self._private_dns_client
 
     @property
     def private_dns_models(self):
         self.log('Getting private dns models')
-        return PrivateDnsModels
+        return import_sdk('azure.mgmt.privatedns.models')
 
     @property
     def web_client(self):
         self.log('Getting web client')
         if not self._web_client:
-            self._web_client = self.get_mgmt_svc_client(WebSiteManagementClient,
+            self._web_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.web', 'WebSiteManagementClient'),
                                                         base_url=self._cloud_environment.endpoints.resource_manager,
                                                         api_version='2018-02-01')
         return self._web_client
@@ -1058,7 +1525,7 @@ class AzureRMModuleBase(object):
     def containerservice_client(self):
         self.log('Getting container service client')
         if not self._containerservice_client:
-            self._containerservice_client = self.get_mgmt_svc_client(ContainerServiceClient,
+            self._containerservice_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.containerservice', 'ContainerServiceClient'),
                                                                      base_url=self._cloud_environment.endpoints.resource_manager,
                                                                      api_version='2017-07-01')
         return self._containerservice_client
@@ -1066,13 +1533,13 @@ class AzureRMModuleBase(object):
     @property
     def managedcluster_models(self):
         self.log("Getting container service models")
-        return ContainerServiceClient.models('2019-04-01')
+        return import_sdk('azure.mgmt.containerservice', 'ContainerServiceClient').models('2019-04-01')
 
     @property
     def managedcluster_client(self):
         self.log('Getting container service client')
         if not self._managedcluster_client:
-            self._managedcluster_client = self.get_mgmt_svc_client(ContainerServiceClient,
+            self._managedcluster_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.containerservice', 'ContainerServiceClient'),
                                                                    base_url=self._cloud_environment.endpoints.resource_manager,
                                                                    api_version='2019-04-01')
         return self._managedcluster_client
@@ -1081,7 +1548,7 @@ class AzureRMModuleBase(object):
     def sql_client(self):
         self.log('Getting SQL client')
         if not self._sql_client:
-            self._sql_client = self.get_mgmt_svc_client(SqlManagementClient,
+            self._sql_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.sql', 'SqlManagementClient'),
                                                         base_url=self._cloud_environment.endpoints.resource_manager)
         return self._sql_client
 
@@ -1089,7 +1556,7 @@ class AzureRMModuleBase(object):
     def postgresql_client(self):
         self.log('Getting PostgreSQL client')
         if not self._postgresql_client:
-            self._postgresql_client = self.get_mgmt_svc_client(PostgreSQLManagementClient,
+            self._postgresql_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.rdbms.postgresql', 'PostgreSQLManagementClient'),
                                                                base_url=self._cloud_environment.endpoints.resource_manager)
         return self._postgresql_client
 
@@ -1097,7 +1564,7 @@ class AzureRMModuleBase(object):
     def mysql_client(self):
         self.log('Getting MySQL client')
         if not self._mysql_client:
-            self._mysql_client = self.get_mgmt_svc_client(MySQLManagementClient,
+            self._mysql_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.rdbms.mysql', 'MySQLManagementClient'),
                                                           base_url=self._cloud_environment.endpoints.resource_manager)
         return self._mysql_client
 
@@ -1105,7 +1572,7 @@ class AzureRMModuleBase(object):
     def mariadb_client(self):
         self.log('Getting MariaDB client')
         if not self._mariadb_client:
-            self._mariadb_client = self.get_mgmt_svc_client(MariaDBManagementClient,
+            self._mariadb_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.rdbms.mariadb', 'MariaDBManagementClient'),
                                                             base_url=self._cloud_environment.endpoints.resource_manager)
         return self._mariadb_client
 
@@ -1113,7 +1580,7 @@ class AzureRMModuleBase(object):
     def sql_client(self):
         self.log('Getting SQL client')
         if not self._sql_client:
-            self._sql_client = self.get_mgmt_svc_client(SqlManagementClient,
+            self._sql_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.sql', 'SqlManagementClient'),
                                                         base_url=self._cloud_environment.endpoints.resource_manager)
         return self._sql_client
 
@@ -1121,7 +1588,7 @@ class AzureRMModuleBase(object):
     def containerregistry_client(self):
         self.log('Getting container registry mgmt client')
         if not self._containerregistry_client:
-            self._containerregistry_client = self.get_mgmt_svc_client(ContainerRegistryManagementClient,
+            self._containerregistry_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.containerregistry', 'ContainerRegistryManagementClient'),
                                                                       base_url=self._cloud_environment.endpoints.resource_manager,
                                                                       api_version='2017-10-01')
 
@@ -1131,7 +1598,7 @@ class AzureRMModuleBase(object):
     def containerinstance_client(self):
         self.log('Getting container instance mgmt client')
         if not self._containerinstance_client:
-            self._containerinstance_client = self.get_mgmt_svc_client(ContainerInstanceManagementClient,
+            self._containerinstance_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.containerinstance', 'ContainerInstanceManagementClient'),
                                                                       base_url=self._cloud_environment.endpoints.resource_manager,
                                                                       api_version='2018-06-01')
 
@@ -1141,7 +1608,7 @@ class AzureRMModuleBase(object):
     def marketplace_client(self):
         self.log('Getting marketplace agreement client')
         if not self._marketplace_client:
-            self._marketplace_client = self.get_mgmt_svc_client(MarketplaceOrderingAgreements,
+            self._marketplace_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.marketplaceordering', 'MarketplaceOrderingAgreements'),
                                                                 base_url=self._cloud_environment.endpoints.resource_manager)
         return self._marketplace_client
 
@@ -1149,7 +1616,7 @@ class AzureRMModuleBase(object):
     def traffic_manager_management_client(self):
         self.log('Getting traffic manager client')
         if not self._traffic_manager_management_client:
-            self._traffic_manager_management_client = self.get_mgmt_svc_client(TrafficManagerManagementClient,
+            self._traffic_manager_management_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.trafficmanager', 'TrafficManagerManagementClient'),
                                                                                base_url=self._cloud_environment.endpoints.resource_manager)
         return self._traffic_manager_management_client
 
@@ -1157,7 +1624,7 @@ class AzureRMModuleBase(object):
     def monitor_client(self):
         self.log('Getting monitor client')
         if not self._monitor_client:
-            self._monitor_client = self.get_mgmt_svc_client(MonitorManagementClient,
+            self._monitor_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.monitor', 'MonitorManagementClient'),
                                                             base_url=self._cloud_environment.endpoints.resource_manager)
         return self._monitor_client
 
@@ -1165,68 +1632,68 @@ class AzureRMModuleBase(object):
     def log_analytics_client(self):
         self.log('Getting log analytics client')
         if not self._log_analytics_client:
-            self._log_analytics_client = self.get_mgmt_svc_client(LogAnalyticsManagementClient,
+            self._log_analytics_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.loganalytics', 'LogAnalyticsManagementClient'),
                                                                   base_url=self._cloud_environment.endpoints.resource_manager)
         return self._log_analytics_client
 
     @property
     def log_analytics_models(self):
         self.log('Getting log analytics models')
-        return LogAnalyticsModels
+        return import_sdk('azure.mgmt.loganalytics.models')
 
     @property
     def servicebus_client(self):
         self.log('Getting servicebus client')
         if not self._servicebus_client:
-            self._servicebus_client = self.get_mgmt_svc_client(ServiceBusManagementClient,
+            self._servicebus_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.servicebus', 'ServiceBusManagementClient'),
                                                                base_url=self._cloud_environment.endpoints.resource_manager)
         return self._servicebus_client
 
     @property
     def servicebus_models(self):
-        return ServicebusModel
+        return import_sdk('azure.mgmt.servicebus.models')
 
     @property
     def automation_client(self):
         self.log('Getting automation client')
         if not self._automation_client:
-            self._automation_client = self.get_mgmt_svc_client(AutomationClient,
+            self._automation_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.automation', 'AutomationClient'),
                                                                base_url=self._cloud_environment.endpoints.resource_manager)
         return self._automation_client
 
     @property
     def automation_models(self):
-        return AutomationModel
+        return import_sdk('azure.mgmt.automation.models')
 
     @property
     def IoThub_client(self):
         self.log('Getting iothub client')
         if not self._IoThub_client:
-            self._IoThub_client = self.get_mgmt_svc_client(IotHubClient,
+            self._IoThub_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.iothub', 'IotHubClient'),
                                                            base_url=self._cloud_environment.endpoints.resource_manager)
         return self._IoThub_client
 
     @property
     def IoThub_models(self):
-        return IoTHubModels
+        return import_sdk('azure.mgmt.iothub.models')
 
     @property
     def automation_client(self):
         self.log('Getting automation client')
         if not self._automation_client:
-            self._automation_client = self.get_mgmt_svc_client(AutomationClient,
+            self._automation_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.automation', 'AutomationClient'),
                                                                base_url=self._cloud_environment.endpoints.resource_manager)
         return self._automation_client
 
     @property
     def automation_models(self):
-        return AutomationModel
+        return import_sdk('azure.mgmt.automation.models')
 
     @property
     def lock_client(self):
         self.log('Getting lock client')
         if not self._lock_client:
-            self._lock_client = self.get_mgmt_svc_client(ManagementLockClient,
+            self._lock_client = self.get_mgmt_svc_client(import_sdk('azure.mgmt.resource.locks', 'ManagementLockClient'),
                                                          base_url=self._cloud_environment.endpoints.resource_manager,
                                                          api_version='2016-09-01')
         return self._lock_client
@@ -1234,7 +1701,7 @@ class AzureRMModuleBase(object):
     @property
     def lock_models(self):
         self.log("Getting lock models")
-        return ManagementLockClient.models('2016-09-01')
+        return import_sdk('azure.mgmt.resource.locks', 'ManagementLockClient').models('2016-09-01')
 
 
 class AzureSASAuthentication(Authentication):
@@ -1253,6 +1720,98 @@ class AzureSASAuthentication(Authentication):
         return session
 
 
+class AzureRMFileCache(object):
+    '''
+    JSON file of expiring entries, shared by all modules and inventory runs of the same user.
+
+    The file is created readable by its owner only, and ignored if it is readable by anyone else. Failing to read or
+    write it just means nothing is cached.
+
+    :param path: path of the cache file
+    '''
+    def __init__(self, path):
+        self.path = expanduser(path)
+
+    def _read(self):
+        try:
+            if os.stat(self.path).st_mode & 0o077:
+                return {}
+            with open(self.path) as cache_file:
+                entries = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def get(self, key):
+        entry = self._read().get(key)
+        if not isinstance(entry, dict) or entry.get('expires_on', 0) <= time():
+            return None
+        return entry.get('value')
+
+    @contextlib.contextmanager
+    def _locked(self):
+        '''
+        Hold an exclusive lock on a sibling lock file, so that concurrent writers (eg, parallel forks) merge their
+        entries instead of overwriting each other's. Without fcntl, writers are not serialized and may lose updates.
+        '''
+        if not HAS_FCNTL:
+            yield
+            return
+        lock_fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(lock_fd)
+
+    def set(self, key, value, expires_on):
+        directory = os.path.dirname(self.path)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory, 0o700)
+            with self._locked():
+                now = time()
+                entries = dict((k, v) for k, v in self._read().items() if isinstance(v, dict) and v.get('expires_on', 0) > now)
+                entries[key] = dict(value=value, expires_on=expires_on)
+
+                # mkstemp creates the file 0600; renaming it over the old one keeps readers, which don't lock, from seeing
+                # partial writes
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.azure_rm_cache')
+                try:
+                    with os.fdopen(fd, 'w') as cache_file:
+                        json.dump(entries, cache_file)
+                    os.rename(tmp_path, self.path)
+                except Exception:
+                    os.remove(tmp_path)
+                    raise
+        except (IOError, OSError):
+            pass
+
+
+class AzureRMCachedTokenCredentials(Authentication):
+    '''
+    Signs requests with an AAD token from the token cache. The actual credentials, and with them a fresh token, are
+    only obtained once that token is close to expiry.
+
+    :param token: dict with access_token, token_type and expires_on (epoch seconds)
+    :param get_credentials: callable returning the credentials to use from then on
+    '''
+    def __init__(self, token, get_credentials):
+        self.token = token
+        self._get_credentials = get_credentials
+        self._credentials = None
+
+    def signed_session(self, session=None):
+        if self._credentials is None and self.token['expires_on'] - TOKEN_CACHE_MARGIN <= time():
+            self._credentials = self._get_credentials()
+        if self._credentials is not None:
+            return self._credentials.signed_session(session)
+
+        session = super(AzureRMCachedTokenCredentials, self).signed_session(session)
+        session.headers['Authorization'] = '{0} {1}'.format(self.token['token_type'], self.token['access_token'])
+        return session
+
+
 class AzureRMAuthException(Exception):
     pass
 
@@ -1263,13 +1822,17 @@ class AzureRMAuth(object):
 
     def __init__(self, auth_source=None, profile=None, subscription_id=None, client_id=None, secret=None,
                  tenant=None, ad_user=None, password=None, cloud_environment='AzureCloud', cert_validation_mode='validate',
-                 api_profile='latest', adfs_authority_url=None, fail_impl=None, is_ad_resource=False, **kwargs):
+                 api_profile='latest', adfs_authority_url=None, fail_impl=None, is_ad_resource=False, token_cache=False,
+                 auth_cache_path=None, metadata_cache_ttl=3600, **kwargs):
 
         if fail_impl:
             self._fail_impl = fail_impl
         else:
             self._fail_impl = self._default_fail_impl
         self.is_ad_resource = is_ad_resource
+        self._token_cache = token_cache
+        self._auth_cache = AzureRMFileCache(auth_cache_path or AZURE_COMMON_ARGS['auth_cache_path']['default'])
+        self._metadata_cache_ttl = metadata_cache_ttl
 
         # authenticate
         self.credentials = self._get_credentials(
@@ -1321,7 +1884,7 @@ class AzureRMAuth(object):
                 if not urlparse.urlparse(raw_cloud_env).scheme:
                     self.fail("cloud_environment must be an endpoint discovery URL or one of {0}".format([x.name for x in all_clouds]))
                 try:
-                    self._cloud_environment = azure_cloud.get_cloud_from_metadata_endpoint(raw_cloud_env)
+                    self._cloud_environment = self._get_cloud_from_metadata_endpoint(raw_cloud_env)
                 except Exception as e:
                     self.fail("cloud_environment {0} could not be resolved: {1}".format(raw_cloud_env, e.message), exception=traceback.format_exc())
 
@@ -1347,41 +1910,132 @@ class AzureRMAuth(object):
         elif self.credentials.get('client_id') is not None and \
                 self.credentials.get('secret') is not None and \
                 self.credentials.get('tenant') is not None:
-            self.azure_credentials = ServicePrincipalCredentials(client_id=self.credentials['client_id'],
-                                                                 secret=self.credentials['secret'],
-                                                                 tenant=self.credentials['tenant'],
-                                                                 cloud_environment=self._cloud_environment,
-                                                                 verify=self._cert_validation_mode == 'validate')
+            self.azure_credentials = self._get_token_cached_credentials(
+                lambda: ServicePrincipalCredentials(client_id=self.credentials['client_id'],
+                                                    secret=self.credentials['secret'],
+                                                    tenant=self.credentials['tenant'],
+                                                    cloud_environment=self._cloud_environment,
+                                                    verify=self._cert_validation_mode == 'validate'),
+                self.credentials['tenant'], self.credentials['client_id'], self.credentials['secret'])
 
         elif self.credentials.get('ad_user') is not None and \
                 self.credentials.get('password') is not None and \
                 self.credentials.get('client_id') is not None and \
                 self.credentials.get('tenant') is not None:
 
-            self.azure_credentials = self.acquire_token_with_username_password(
-                self._adfs_authority_url,
-                self._resource,
-                self.credentials['ad_user'],
-                self.credentials['password'],
-                self.credentials['client_id'],
-                self.credentials['tenant'])
+            self.azure_credentials = self._get_token_cached_credentials(
+                lambda: self.acquire_token_with_username_password(
+                    self._adfs_authority_url,
+                    self._resource,
+                    self.credentials['ad_user'],
+                    self.credentials['password'],
+                    self.credentials['client_id'],
+                    self.credentials['tenant']),
+                self.credentials['tenant'], self.credentials['client_id'], self.credentials['ad_user'], self.credentials['password'])
 
         elif self.credentials.get('ad_user') is not None and self.credentials.get('password') is not None:
             tenant = self.credentials.get('tenant')
             if not tenant:
                 tenant = 'common'  # SDK default
 
-            self.azure_credentials = UserPassCredentials(self.credentials['ad_user'],
-                                                         self.credentials['password'],
-                                                         tenant=tenant,
-                                                         cloud_environment=self._cloud_environment,
-                                                         verify=self._cert_validation_mode == 'validate')
+            self.azure_credentials = self._get_token_cached_credentials(
+                lambda: UserPassCredentials(self.credentials['ad_user'],
+                                            self.credentials['password'],
+                                            tenant=tenant,
+                                            cloud_environment=self._cloud_environment,
+                                            verify=self._cert_validation_mode == 'validate'),
+                tenant, self.credentials['ad_user'], self.credentials['password'])
         else:
             self.fail("Failed to authenticate with provided credentials. Some attributes were missing. "
                       "Credentials must include client_id, secret and tenant or ad_user and password, or "
                       "ad_user, password, client_id, tenant and adfs_authority_url(optional) for ADFS authentication, or "
                       "be logged in using AzureCLI.")
 
+    def _get_cached_metadata(self, key):
+        if self._metadata_cache_ttl <= 0:
+            return None
+        return self._auth_cache.get(key)
+
+    def _set_cached_metadata(self, key, value):
+        if self._metadata_cache_ttl > 0:
+            self._auth_cache.set(key, value, time() + self._metadata_cache_ttl)
+
+    def _get_cloud_from_metadata_endpoint(self, arm_endpoint):
+        '''
+        Resolve a cloud from its metadata discovery endpoint, reusing the endpoints resolved by an earlier invocation
+        within metadata_cache_ttl.
+        '''
+        cache_key = 'cloud:{0}'.format(arm_endpoint)
+        cached = self._get_cached_metadata(cache_key)
+        if cached:
+            cloud = azure_cloud.Cloud(cached['name'])
+            for name, value in cached['endpoints'].items():
+                setattr(cloud.endpoints, name, value)
+            for name, value in cached['suffixes'].items():
+                setattr(cloud.suffixes, name, value)
+            return cloud
+
+        cloud = azure_cloud.get_cloud_from_metadata_endpoint(arm_endpoint)
+        self._set_cached_metadata(cache_key, dict(name=cloud.name, endpoints=vars(cloud.endpoints), suffixes=vars(cloud.suffixes)))
+        return cloud
+
+    def _get_token_cached_credentials(self, get_credentials, *identity):
+        '''
+        With token_cache enabled, reuse a cached AAD token for the same identity, authority and resource while it is
+        valid for a while longer, so that only the first of many module invocations has to authenticate.
+
+        :param get_credentials: callable returning fresh credentials (authenticating against AAD)
+        :param identity: tenant, client/user and secret/password the credentials are built from; only a hash of them
+                         is stored, as the cache key
+        :return: credentials
+        '''
+        if not self._token_cache:
+            return get_credentials()
+
+        key_parts = [self._adfs_authority_url, self._resource] + [str(part) for part in identity]
+        key = 'token:' + sha256('\n'.join(key_parts).encode('utf-8')).hexdigest()
+
+        def get_and_cache_credentials():
+            credentials = get_credentials()
+            token = getattr(credentials, 'token', None) or {}
+            expires_on = self._get_token_expires_on(token)
+            if expires_on is None or not token.get('access_token'):
+                self.log('Not caching AAD token, its expiry is unknown')
+                return credentials
+            self._auth_cache.set(key, dict(access_token=token['access_token'],
+                                           token_type=token.get('token_type', 'Bearer'),
+                                           expires_on=expires_on), expires_on)
+            return credentials
+
+        token = self._auth_cache.get(key)
+        if token and token.get('expires_on', 0) - TOKEN_CACHE_MARGIN > time():
+            self.log('Using cached AAD token')
+            return AzureRMCachedTokenCredentials(token, get_and_cache_credentials)
+        return get_and_cache_credentials()
+
+    @staticmethod
+    def _get_token_expires_on(token):
+        '''
+        Return when an AAD token expires, in epoch seconds, or None if the token doesn't tell.
+
+        msrestazure converts the expiry of most tokens to epoch seconds, but tokens from ADAL (such as ADFS tokens) can
+        keep it as ADAL reports it: a local time string like '2023-01-31 12:00:00.123456', next to expires_in seconds.
+        '''
+        expires_on = token.get('expires_on')
+        try:
+            return float(expires_on)
+        except (TypeError, ValueError):
+            pass
+        try:
+            return mktime(strptime(str(expires_on).split('.')[0], '%Y-%m-%d %H:%M:%S'))
+        except (TypeError, ValueError, OverflowError):
+            pass
+        try:
+            # issued just now, as the credentials were only just obtained
+            return time() + float(token['expires_in'])
+        except (KeyError, TypeError, ValueError):
+            return None
+
     def fail(self, msg, exception=None, **kwargs):
         self._fail_impl(msg)
 
@@ -1415,15 +2069,20 @@ class AzureRMAuth(object):
     def _get_msi_credentials(self, subscription_id=None, client_id=None, **kwargs):
         credentials = MSIAuthentication(client_id=client_id)
         subscription_id = subscription_id or self._get_env('subscription_id')
+        if not subscription_id:
+            # the identity (and so its subscriptions) belongs to this machine, even if the cache file is shared
+            cache_key = 'msi_subscription:{0}:{1}'.format(socket.gethostname(), client_id or '')
+            subscription_id = self._get_cached_metadata(cache_key)
         if not subscription_id:
             try:
                 # use the first subscription of the MSI
-                subscription_client = SubscriptionClient(credentials)
+                subscription_client = import_sdk('azure.mgmt.resource.subscriptions', 'SubscriptionClient')(credentials)
                 subscription = next(subscription_client.subscriptions.list())
                 subscription_id = str(subscription.subscription_id)
             except Exception as exc:
                 self.fail("Failed to get MSI token: {0}. "
                           "Please check whether your machine enabled MSI or grant access to any subscription.".format(str(exc)))
+            self._set_cached_metadata(cache_key, subscription_id)
         return {
             'credentials': credentials,
             'subscription_id': subscription_id
@@ -1532,7 +2191,7 @@ class AzureRMAuth(object):
         if tenant is not None:
             authority_uri = authority + '/' + tenant
 
-        context = AuthenticationContext(authority_uri)
+        context = import_sdk('adal.authentication_context', 'AuthenticationContext')(authority_uri)
         token_response = context.acquire_token_with_username_password(resource, username, password, client_id)
 
         return AADTokenCredentials(token_response)
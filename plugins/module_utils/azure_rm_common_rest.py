@@ -5,6 +5,7 @@
 from __future__ import absolute_import, division, print_function
 __metaclass__ = type
 
+import threading
 
 try:
     from ansible.module_utils.ansible_release import __version__ as ANSIBLE_VERSION
@@ -27,6 +28,83 @@ except ImportError:
 ANSIBLE_USER_AGENT = 'Ansible/{0}'.format(ANSIBLE_VERSION)
 
 
+def iterate_pages(send, url, query_parameters, header_parameters, prefetch=False):
+    '''
+    Yield the parsed JSON pages of a list operation, following the nextLink of ARM lists and the x-ms-continuation
+    header of data plane lists.
+
+    :param send: callable taking url, query_parameters and header_parameters and returning the response of one page
+    :param prefetch: request the next page in the background while the caller handles the current one. The request
+        is sent before the current page is yielded, so a caller that stops early leaves one page requested for nothing,
+        and whatever that request returns or raises is dropped.
+    '''
+    request = (url, query_parameters, header_parameters)
+    fetch = None
+    while request:
+        response = fetch.result() if fetch else send(*request)
+        page = json.loads(response.text) if response.text else {}
+        request = None
+        if isinstance(page, dict) and page.get('nextLink'):
+            # nextLink carries the remaining query, including a skip token
+            next_query = dict((key, value) for key, value in query_parameters.items() if key == 'api-version')
+            request = (page['nextLink'], next_query, header_parameters)
+        elif response.headers.get('x-ms-continuation'):
+            next_headers = dict(header_parameters or {})
+            next_headers['x-ms-continuation'] = response.headers['x-ms-continuation']
+            request = (url, query_parameters, next_headers)
+        fetch = _PageFetch(send, request) if prefetch and request else None
+        yield page
+
+
+def iterate_items(pages, max_items=None):
+    '''
+    Yield the items of pages from iterate_pages, stopping after max_items. No further pages are requested after
+    max_items unless the pages are prefetched, which requests one more.
+
+    Items are the elements of a page's value list, or of a page that is a list itself. Any other page, such as a single
+    resource, is yielded as one item.
+    '''
+    if max_items is not None and max_items <= 0:
+        return
+    count = 0
+    for page in pages:
+        if isinstance(page, list):
+            items = page
+        elif isinstance(page, dict) and isinstance(page.get('value'), list):
+            items = page['value']
+        else:
+            items = [page]
+        for item in items:
+            yield item
+            count += 1
+            if max_items is not None and count >= max_items:
+                return
+
+
+class _PageFetch(threading.Thread):
+
+    def __init__(self, send, request):
+        super(_PageFetch, self).__init__()
+        self.daemon = True
+        self._send = send
+        self._request = request
+        self._response = None
+        self._error = None
+        self.start()
+
+    def run(self):
+        try:
+            self._response = self._send(*self._request)
+        except Exception as exc:
+            self._error = exc
+
+    def result(self):
+        self.join()
+        if self._error is not None:
+            raise self._error
+        return self._response
+
+
 class GenericRestClientConfiguration(AzureConfiguration):
 
     def __init__(self, credentials, subscription_id, base_url=None):
@@ -96,6 +174,28 @@ class GenericRestClient(object):
 
         return response
 
+    def query_pages(self, url, method, query_parameters, header_parameters, body=None, expected_status_codes=None, prefetch=False):
+        '''
+        Yield the parsed JSON pages of a list operation, see iterate_pages.
+        '''
+        def send(page_url, page_query_parameters, page_header_parameters):
+            return self.query(page_url, method, page_query_parameters, dict(page_header_parameters or {}), body,
+                              expected_status_codes or [200], 0, 0)
+
+        return iterate_pages(send, url, query_parameters, header_parameters, prefetch=prefetch)
+
+    def query_items(self, url, method, query_parameters, header_parameters, body=None, expected_status_codes=None,
+                    max_items=None, prefetch=False):
+        '''
+        Yield the items of a list operation across all its pages, see iterate_items.
+
+        Pages are never prefetched with max_items, which would request a page beyond the last one used.
+        '''
+        return iterate_items(self.query_pages(url, method, query_parameters, header_parameters, body=body,
+                                              expected_status_codes=expected_status_codes,
+                                              prefetch=prefetch and max_items is None),
+                             max_items=max_items)
+
     def get_poller_result(self, poller, timeout):
         try:
             poller.wait(timeout=timeout)
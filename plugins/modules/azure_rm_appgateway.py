@@ -438,7 +438,6 @@ id:
     sample: id
 '''
 
-import time
 from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase
 from copy import deepcopy
 from ansible.module_utils.common.dict_transformations import (
@@ -833,8 +832,7 @@ class AzureRMApplicationGateways(AzureRMModuleBase):
             self.delete_applicationgateway()
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_applicationgateway():
-                time.sleep(20)
+            self.wait_for(self.get_applicationgateway, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log("Application Gateway instance unchanged")
             self.results['changed'] = False
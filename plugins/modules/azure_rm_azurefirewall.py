@@ -320,7 +320,6 @@ id:
     sample: /subscriptions/xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx/resourceGroups/myResourceGroup/providers/Microsoft.Network/azureFirewalls/myAzureFirewall
 '''
 
-import time
 import json
 import re
 from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common_ext import AzureRMModuleBaseExt
@@ -642,8 +641,7 @@ class AzureRMAzureFirewalls(AzureRMModuleBaseExt):
 
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_resource():
-                time.sleep(20)
+            self.wait_for(self.get_resource, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log('AzureFirewall instance unchanged')
             self.results['changed'] = False
@@ -651,9 +649,9 @@ class AzureRMAzureFirewalls(AzureRMModuleBaseExt):
 
         if response:
             self.results["id"] = response["id"]
-            while response['properties']['provisioningState'] == 'Updating':
-                time.sleep(30)
-                response = self.get_resource()
+            if response['properties']['provisioningState'] == 'Updating':
+                response = self.wait_for(self.get_resource, lambda resource: resource['properties']['provisioningState'] != 'Updating',
+                                         description='the firewall to finish updating')
 
         return self.results
 
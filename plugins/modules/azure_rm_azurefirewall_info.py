@@ -196,8 +196,7 @@ class AzureRMAzureFirewallsInfo(AzureRMModuleBase):
         return self.format_item(results)
 
     def list(self):
-        response = None
-        results = {}
+        results = []
         # prepare url
         self.url = ('/subscriptions' +
                     '/{{ subscription_id }}' +
@@ -210,24 +209,18 @@ class AzureRMAzureFirewallsInfo(AzureRMModuleBase):
         self.url = self.url.replace('{{ resource_group }}', self.resource_group)
 
         try:
-            response = self.mgmt_client.query(self.url,
-                                              'GET',
-                                              self.query_parameters,
-                                              self.header_parameters,
-                                              None,
-                                              self.status_code,
-                                              600,
-                                              30)
-            results = json.loads(response.text)
-            # self.log('Response : {0}'.format(response))
+            results = list(self.mgmt_client.query_items(self.url,
+                                                        'GET',
+                                                        self.query_parameters,
+                                                        self.header_parameters,
+                                                        expected_status_codes=self.status_code))
         except CloudError as e:
             self.log('Could not get info for @(Model.ModuleOperationNameUpper).')
 
-        return [self.format_item(x) for x in results['value']] if results['value'] else []
+        return [self.format_item(x) for x in results]
 
     def listall(self):
-        response = None
-        results = {}
+        results = []
         # prepare url
         self.url = ('/subscriptions' +
                     '/{{ subscription_id }}' +
@@ -237,20 +230,15 @@ class AzureRMAzureFirewallsInfo(AzureRMModuleBase):
         self.url = self.url.replace('{{ subscription_id }}', self.subscription_id)
 
         try:
-            response = self.mgmt_client.query(self.url,
-                                              'GET',
-                                              self.query_parameters,
-                                              self.header_parameters,
-                                              None,
-                                              self.status_code,
-                                              600,
-                                              30)
-            results = json.loads(response.text)
-            # self.log('Response : {0}'.format(response))
+            results = list(self.mgmt_client.query_items(self.url,
+                                                        'GET',
+                                                        self.query_parameters,
+                                                        self.header_parameters,
+                                                        expected_status_codes=self.status_code))
         except CloudError as e:
             self.log('Could not get info for @(Model.ModuleOperationNameUpper).')
 
-        return [self.format_item(x) for x in results['value']] if results['value'] else []
+        return [self.format_item(x) for x in results]
 
     def format_item(self, item):
         d = {
@@ -75,7 +75,6 @@ status:
     sample: Ready
 '''
 
-import time
 from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase
 
 try:
@@ -209,8 +208,7 @@ class AzureRMReplications(AzureRMModuleBase):
             self.delete_replication()
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_replication():
-                time.sleep(20)
+            self.wait_for(self.get_replication, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log("Replication instance unchanged")
             self.results['changed'] = False
@@ -91,7 +91,6 @@ status:
     sample: enabled
 '''
 
-import time
 from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase
 
 try:
@@ -253,8 +252,7 @@ class AzureRMWebhooks(AzureRMModuleBase):
             self.delete_webhook()
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_webhook():
-                time.sleep(20)
+            self.wait_for(self.get_webhook, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log("Webhook instance unchanged")
             self.results['changed'] = False
@@ -265,7 +265,7 @@ class AzureRMRecordSetInfo(AzureRMModuleBase):
         return results
 
     def serialize_list(self, raws):
-        return [self.serialize_obj(item, AZURE_OBJECT_CLASS) for item in raws] if raws else []
+        return self.serialize_objs(raws, AZURE_OBJECT_CLASS)
 
     def curated_list(self, raws):
         return [self.record_to_dict(item) for item in raws] if raws else []
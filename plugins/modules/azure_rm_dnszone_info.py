@@ -231,7 +231,7 @@ class AzureRMDNSZoneInfo(AzureRMModuleBase):
         return results
 
     def serialize_items(self, raws):
-        return [self.serialize_obj(item, AZURE_OBJECT_CLASS) for item in raws] if raws else []
+        return self.serialize_objs(raws, AZURE_OBJECT_CLASS)
 
     def curated_items(self, raws):
         return [self.zone_to_dict(item) for item in raws] if raws else []
@@ -75,7 +75,6 @@ id:
     sample: "/subscriptions/xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx/resourceGroups/myResourceGroup/providers/Microsoft.Compute/galleries/myGallery1283"
 '''
 
-import time
 import json
 import re
 from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common_ext import AzureRMModuleBaseExt
@@ -224,8 +223,7 @@ class AzureRMGalleries(AzureRMModuleBaseExt):
 
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_resource():
-                time.sleep(20)
+            self.wait_for(self.get_resource, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log('Gallery instance unchanged')
             self.results['changed'] = False
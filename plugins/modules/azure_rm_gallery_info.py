@@ -187,8 +187,7 @@ class AzureRMGalleriesInfo(AzureRMModuleBase):
         return self.format_item(results)
 
     def listbyresourcegroup(self):
-        response = None
-        results = {}
+        results = []
         # prepare url
         self.url = ('/subscriptions' +
                     '/{{ subscription_id }}' +
@@ -201,24 +200,18 @@ class AzureRMGalleriesInfo(AzureRMModuleBase):
         self.url = self.url.replace('{{ resource_group }}', self.resource_group)
 
         try:
-            response = self.mgmt_client.query(self.url,
-                                              'GET',
-                                              self.query_parameters,
-                                              self.header_parameters,
-                                              None,
-                                              self.status_code,
-                                              600,
-                                              30)
-            results = json.loads(response.text)
-            # self.log('Response : {0}'.format(response))
+            results = list(self.mgmt_client.query_items(self.url,
+                                                        'GET',
+                                                        self.query_parameters,
+                                                        self.header_parameters,
+                                                        expected_status_codes=self.status_code))
         except CloudError as e:
             self.log('Could not get info for @(Model.ModuleOperationNameUpper).')
 
-        return [self.format_item(x) for x in results['value']] if results['value'] else []
+        return [self.format_item(x) for x in results]
 
     def list(self):
-        response = None
-        results = {}
+        results = []
         # prepare url
         self.url = ('/subscriptions' +
                     '/{{ subscription_id }}' +
@@ -228,20 +221,15 @@ class AzureRMGalleriesInfo(AzureRMModuleBase):
         self.url = self.url.replace('{{ subscription_id }}', self.subscription_id)
 
         try:
-            response = self.mgmt_client.query(self.url,
-                                              'GET',
-                                              self.query_parameters,
-                                              self.header_parameters,
-                                              None,
-                                              self.status_code,
-                                              600,
-                                              30)
-            results = json.loads(response.text)
-            # self.log('Response : {0}'.format(response))
+            results = list(self.mgmt_client.query_items(self.url,
+                                                        'GET',
+                                                        self.query_parameters,
+                                                        self.header_parameters,
+                                                        expected_status_codes=self.status_code))
         except CloudError as e:
             self.log('Could not get info for @(Model.ModuleOperationNameUpper).')
 
-        return [self.format_item(x) for x in results['value']] if results['value'] else []
+        return [self.format_item(x) for x in results]
 
     def format_item(self, item):
         d = {
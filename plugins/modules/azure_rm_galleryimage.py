@@ -201,7 +201,6 @@ id:
            ry1283/images/myImage"
 '''
 
-import time
 import json
 import re
 from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common_ext import AzureRMModuleBaseExt
@@ -460,8 +459,7 @@ class AzureRMGalleryImages(AzureRMModuleBaseExt):
 
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_resource():
-                time.sleep(20)
+            self.wait_for(self.get_resource, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log('GalleryImage instance unchanged')
             self.results['changed'] = False
@@ -221,8 +221,7 @@ class AzureRMGalleryImagesInfo(AzureRMModuleBase):
         return self.format_item(results)
 
     def listbygallery(self):
-        response = None
-        results = {}
+        results = []
         # prepare url
         self.url = ('/subscriptions' +
                     '/{{ subscription_id }}' +
@@ -238,20 +237,15 @@ class AzureRMGalleryImagesInfo(AzureRMModuleBase):
         self.url = self.url.replace('{{ gallery_name }}', self.gallery_name)
 
         try:
-            response = self.mgmt_client.query(self.url,
-                                              'GET',
-                                              self.query_parameters,
-                                              self.header_parameters,
-                                              None,
-                                              self.status_code,
-                                              600,
-                                              30)
-            results = json.loads(response.text)
-            # self.log('Response : {0}'.format(response))
+            results = list(self.mgmt_client.query_items(self.url,
+                                                        'GET',
+                                                        self.query_parameters,
+                                                        self.header_parameters,
+                                                        expected_status_codes=self.status_code))
         except CloudError as e:
             self.log('Could not get info for @(Model.ModuleOperationNameUpper).')
 
-        return [self.format_item(x) for x in results['value']] if results['value'] else []
+        return [self.format_item(x) for x in results]
 
     def format_item(self, item):
         d = {
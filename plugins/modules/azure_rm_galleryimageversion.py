@@ -257,7 +257,6 @@ id:
            ry1283/images/myImage/versions/10.1.3"
 '''
 
-import time
 import json
 from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common_ext import AzureRMModuleBaseExt
 from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common_rest import GenericRestClient
@@ -583,9 +582,10 @@ class AzureRMGalleryImageVersions(AzureRMModuleBaseExt):
         except Exception:
             response = {'text': response.text}
 
-        while response['properties']['provisioningState'] == 'Creating':
-            time.sleep(60)
-            response = self.get_resource()
+        if response['properties']['provisioningState'] == 'Creating':
+            # replicating an image version to its target regions can take a long while
+            response = self.wait_for(self.get_resource, lambda resource: resource['properties']['provisioningState'] != 'Creating',
+                                     timeout=7200, max_delay=60, description='the image version to be created')
 
         return response
 
@@ -215,8 +215,7 @@ class AzureRMGalleryImageVersionsInfo(AzureRMModuleBase):
         return self.format_item(results)
 
     def listbygalleryimage(self):
-        response = None
-        results = {}
+        results = []
         # prepare url
         self.url = ('/subscriptions' +
                     '/{{ subscription_id }}' +
@@ -235,20 +234,15 @@ class AzureRMGalleryImageVersionsInfo(AzureRMModuleBase):
         self.url = self.url.replace('{{ image_name }}', self.gallery_image_name)
 
         try:
-            response = self.mgmt_client.query(self.url,
-                                              'GET',
-                                              self.query_parameters,
-                                              self.header_parameters,
-                                              None,
-                                              self.status_code,
-                                              600,
-                                              30)
-            results = json.loads(response.text)
-            # self.log('Response : {0}'.format(response))
+            results = list(self.mgmt_client.query_items(self.url,
+                                                        'GET',
+                                                        self.query_parameters,
+                                                        self.header_parameters,
+                                                        expected_status_codes=self.status_code))
         except CloudError as e:
             self.log('Could not get info for @(Model.ModuleOperationNameUpper).')
 
-        return [self.format_item(x) for x in results['value']] if results['value'] else []
+        return [self.format_item(x) for x in results]
 
     def format_item(self, item):
         d = {
@@ -178,6 +178,7 @@ iot_devices:
 import json
 
 from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase, format_resource_id
+from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common_rest import iterate_pages, iterate_items
 from ansible.module_utils.common.dict_transformations import _snake_to_camel, _camel_to_snake
 
 try:
@@ -256,14 +257,12 @@ class AzureRMIoTDeviceFacts(AzureRMModuleBase):
     def hub_query(self):
         try:
             url = '/devices/query'
-            request = self._mgmt_client.post(url, self.query_parameters)
             query = {
                 'query': self.query
             }
-            response = self._mgmt_client.send(request=request, headers=self.header_parameters, content=query)
-            if response.status_code not in [200]:
-                raise CloudError(response)
-            return json.loads(response.text)
+            # query results are paged with x-ms-continuation
+            pages = iterate_pages(self._sender('POST', query), url, self.query_parameters, self.header_parameters)
+            return list(iterate_items(pages, max_items=self.top))
         except Exception as exc:
             self.fail('Error when running query "{0}" in IoT Hub {1}: {2}'.format(self.query, self.hub, exc.message or str(exc)))
 
@@ -293,10 +292,23 @@ class AzureRMIoTDeviceFacts(AzureRMModuleBase):
     def list_devices(self):
         try:
             url = '/devices'
-            return self._https_get(url, self.query_parameters, self.header_parameters)
+            pages = iterate_pages(self._sender('GET'), url, self.query_parameters, self.header_parameters)
+            return list(iterate_items(pages, max_items=self.top))
         except Exception as exc:
             self.fail('Error when listing IoT Hub devices in {0}: {1}'.format(self.hub, exc.message or str(exc)))
 
+    def _sender(self, method, body=None):
+        def send(url, query_parameters, header_parameters):
+            if method == 'POST':
+                request = self._mgmt_client.post(url, query_parameters)
+            else:
+                request = self._mgmt_client.get(url, query_parameters)
+            response = self._mgmt_client.send(request=request, headers=header_parameters, content=body)
+            if response.status_code not in [200]:
+                raise CloudError(response)
+            return response
+        return send
+
     def _https_get(self, url, query_parameters, header_parameters):
         request = self._mgmt_client.get(url, query_parameters)
         response = self._mgmt_client.send(request=request, headers=header_parameters, content=None)
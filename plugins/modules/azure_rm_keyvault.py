@@ -185,7 +185,6 @@ id:
 '''
 
 import collections
-import time
 from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase
 
 try:
@@ -425,8 +424,7 @@ class AzureRMVaults(AzureRMModuleBase):
             self.delete_keyvault()
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_keyvault():
-                time.sleep(20)
+            self.wait_for(self.get_keyvault, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log("Key Vault instance unchanged")
             self.results['changed'] = False
@@ -184,7 +184,9 @@ class AzureRMKeyVaultKey(AzureRMModuleBase):
         try:
             self.log("Get KeyVaultClient from MSI")
             credentials = MSIAuthentication(resource='https://vault.azure.net')
-            return KeyVaultClient(credentials)
+            client = KeyVaultClient(credentials)
+            client.config = self.configure_client(client.config)
+            return client
         except Exception:
             self.log("Get KeyVaultClient from service principal")
 
@@ -207,7 +209,9 @@ class AzureRMKeyVaultKey(AzureRMModuleBase):
             token = authcredential.token
             return token['token_type'], token['access_token']
 
-        return KeyVaultClient(KeyVaultAuthentication(auth_callback))
+        client = KeyVaultClient(KeyVaultAuthentication(auth_callback))
+        client.config = self.configure_client(client.config)
+        return client
 
     def get_key(self, name, version=''):
         ''' Gets an existing key '''
@@ -273,7 +273,9 @@ class AzureRMKeyVaultSecretInfo(AzureRMModuleBase):
         try:
             self.log("Get KeyVaultClient from MSI")
             credentials = MSIAuthentication(resource='https://vault.azure.net')
-            return KeyVaultClient(credentials)
+            client = KeyVaultClient(credentials)
+            client.config = self.configure_client(client.config)
+            return client
         except Exception:
             self.log("Get KeyVaultClient from service principal")
 
@@ -299,7 +301,9 @@ class AzureRMKeyVaultSecretInfo(AzureRMModuleBase):
             token = authcredential.token
             return token['token_type'], token['access_token']
 
-        return KeyVaultClient(KeyVaultAuthentication(auth_callback))
+        client = KeyVaultClient(KeyVaultAuthentication(auth_callback))
+        client.config = self.configure_client(client.config)
+        return client
 
     def get_secret(self):
         '''
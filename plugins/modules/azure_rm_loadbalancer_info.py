@@ -159,10 +159,8 @@ class AzureRMLoadBalancerInfo(AzureRMModuleBase):
             except AzureHttpError as exc:
                 self.fail('Failed to list all items - {0}'.format(str(exc)))
 
-        results = []
-        for item in response:
-            if self.has_tags(item.tags, self.tags):
-                results.append(self.serialize_obj(item, AZURE_OBJECT_CLASS))
+        results = self.serialize_objs([item for item in response if self.has_tags(item.tags, self.tags)],
+                                      AZURE_OBJECT_CLASS)
 
         return results
 
@@ -113,7 +113,6 @@ locks:
             sample: "This is a lock"
 '''  # NOQA
 
-import json
 import re
 from ansible.module_utils.common.dict_transformations import _camel_to_snake
 from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common_rest import GenericRestClient
@@ -168,9 +167,7 @@ class AzureRMLockInfo(AzureRMModuleBase):
         url = '/{0}/providers/Microsoft.Authorization/locks'.format(scope)
         if self.name:
             url = '{0}/{1}'.format(url, self.name)
-        locks = self.list_locks(url)
-        resp = locks.get('value') if 'value' in locks else [locks]
-        self.results['locks'] = [self.to_dict(x) for x in resp]
+        self.results['locks'] = [self.to_dict(x) for x in self.list_locks(url)]
         return self.results
 
     def to_dict(self, lock):
@@ -188,15 +185,11 @@ class AzureRMLockInfo(AzureRMModuleBase):
 
     def list_locks(self, url):
         try:
-            resp = self._mgmt_client.query(url=url,
-                                           method='GET',
-                                           query_parameters=self._query_parameters,
-                                           header_parameters=self._header_parameters,
-                                           body=None,
-                                           expected_status_codes=[200],
-                                           polling_timeout=None,
-                                           polling_interval=None)
-            return json.loads(resp.text)
+            return list(self._mgmt_client.query_items(url=url,
+                                                      method='GET',
+                                                      query_parameters=self._query_parameters,
+                                                      header_parameters=self._header_parameters,
+                                                      expected_status_codes=[200]))
         except CloudError as exc:
             self.fail('Error when finding locks {0}: {1}'.format(url, exc.message))
 
@@ -209,7 +209,6 @@ properties:
 
 '''
 
-import time
 import json
 from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common_rest import GenericRestClient
 from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common_ext import AzureRMModuleBaseExt
@@ -331,8 +330,7 @@ class AzureRMManagementGroups(AzureRMModuleBaseExt):
 
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_resource():
-                time.sleep(20)
+            self.wait_for(self.get_resource, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log('ManagementGroup instance unchanged')
             self.results['changed'] = False
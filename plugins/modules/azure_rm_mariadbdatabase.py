@@ -89,7 +89,6 @@ name:
     sample: db1
 '''
 
-import time
 
 try:
     from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase
@@ -221,8 +220,7 @@ class AzureRMMariaDbDatabase(AzureRMModuleBase):
             self.delete_mariadbdatabase()
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_mariadbdatabase():
-                time.sleep(20)
+            self.wait_for(self.get_mariadbdatabase, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log("MariaDB Database instance unchanged")
             self.results['changed'] = False
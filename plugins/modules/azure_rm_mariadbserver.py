@@ -140,7 +140,6 @@ fully_qualified_domain_name:
     sample: mariadbsrv1b6dd89593.mariadb.database.azure.com
 '''
 
-import time
 
 try:
     from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase
@@ -299,8 +298,7 @@ class AzureRMMariaDbServers(AzureRMModuleBase):
             self.delete_mariadbserver()
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_mariadbserver():
-                time.sleep(20)
+            self.wait_for(self.get_mariadbserver, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log("MariaDB Server instance unchanged")
             self.results['changed'] = False
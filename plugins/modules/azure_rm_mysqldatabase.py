@@ -87,7 +87,6 @@ name:
     sample: db1
 '''
 
-import time
 
 try:
     from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase
@@ -219,8 +218,7 @@ class AzureRMMySqlDatabase(AzureRMModuleBase):
             self.delete_mysqldatabase()
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_mysqldatabase():
-                time.sleep(20)
+            self.wait_for(self.get_mysqldatabase, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log("MySQL Database instance unchanged")
             self.results['changed'] = False
@@ -78,7 +78,6 @@ id:
              wallRules/rule1"
 '''
 
-import time
 
 try:
     from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase
@@ -194,8 +193,7 @@ class AzureRMMySqlFirewallRule(AzureRMModuleBase):
             self.delete_firewallrule()
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_firewallrule():
-                time.sleep(20)
+            self.wait_for(self.get_firewallrule, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log("MySQL firewall rule instance unchanged")
             self.results['changed'] = False
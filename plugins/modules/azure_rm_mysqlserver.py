@@ -137,7 +137,6 @@ fully_qualified_domain_name:
     sample: mysqlsrv1b6dd89593.mysql.database.azure.com
 '''
 
-import time
 
 try:
     from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase
@@ -296,8 +295,7 @@ class AzureRMMySqlServers(AzureRMModuleBase):
             self.delete_mysqlserver()
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_mysqlserver():
-                time.sleep(20)
+            self.wait_for(self.get_mysqlserver, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log("MySQL Server instance unchanged")
             self.results['changed'] = False
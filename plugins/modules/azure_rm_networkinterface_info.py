@@ -340,7 +340,7 @@ class AzureRMNetworkInterfaceInfo(AzureRMModuleBase):
             self.fail("Error listing all - {0}".format(str(exc)))
 
     def serialize_nics(self, raws):
-        return [self.serialize_obj(item, AZURE_OBJECT_CLASS) for item in raws] if raws else []
+        return self.serialize_objs(raws, AZURE_OBJECT_CLASS)
 
     def to_dict_list(self, raws):
         return [nic_to_dict(item) for item in raws] if raws else []
@@ -401,7 +401,6 @@ properties:
                     sample: Public
 '''
 
-import time
 import json
 import random
 from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common_ext import AzureRMModuleBaseExt
@@ -719,8 +718,7 @@ class AzureRMOpenShiftManagedClusters(AzureRMModuleBaseExt):
 
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_resource():
-                time.sleep(20)
+            self.wait_for(self.get_resource, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log('OpenShiftManagedCluster instance unchanged')
             self.results['changed'] = False
@@ -88,7 +88,6 @@ name:
     sample: db1
 '''
 
-import time
 
 try:
     from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase
@@ -220,8 +219,7 @@ class AzureRMPostgreSqlDatabases(AzureRMModuleBase):
             self.delete_postgresqldatabase()
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_postgresqldatabase():
-                time.sleep(20)
+            self.wait_for(self.get_postgresqldatabase, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log("PostgreSQL Database instance unchanged")
             self.results['changed'] = False
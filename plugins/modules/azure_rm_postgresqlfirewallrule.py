@@ -76,7 +76,6 @@ id:
              /firewallRules/rule1"
 '''
 
-import time
 
 try:
     from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase
@@ -192,8 +191,7 @@ class AzureRMPostgreSqlFirewallRules(AzureRMModuleBase):
             self.delete_firewallrule()
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_firewallrule():
-                time.sleep(20)
+            self.wait_for(self.get_firewallrule, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log("PostgreSQL firewall rule instance unchanged")
             self.results['changed'] = False
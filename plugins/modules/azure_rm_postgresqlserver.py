@@ -138,7 +138,6 @@ fully_qualified_domain_name:
     sample: postgresqlsrv1b6dd89593.postgresql.database.azure.com
 '''
 
-import time
 
 try:
     from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase
@@ -297,8 +296,7 @@ class AzureRMPostgreSqlServers(AzureRMModuleBase):
             self.delete_postgresqlserver()
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_postgresqlserver():
-                time.sleep(20)
+            self.wait_for(self.get_postgresqlserver, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log("PostgreSQL Server instance unchanged")
             self.results['changed'] = False
@@ -250,12 +250,10 @@ class AzureRMPublicIPInfo(AzureRMModuleBase):
         return [self.pip_to_dict(item) for item in raw]
 
     def serialize(self, raw):
-        results = []
-        for item in raw:
-            pip = self.serialize_obj(item, AZURE_OBJECT_CLASS)
+        results = self.serialize_objs(raw, AZURE_OBJECT_CLASS)
+        for item, pip in zip(raw, results):
             pip['name'] = item.name
             pip['type'] = item.type
-            results.append(pip)
         return results
 
     def filter(self, response):
@@ -402,24 +402,13 @@ class AzureRMResourceInfo(AzureRMModuleBase):
 
         header_parameters = {}
         header_parameters['Content-Type'] = 'application/json; charset=utf-8'
-        skiptoken = None
 
-        while True:
-            if skiptoken:
-                query_parameters['skiptoken'] = skiptoken
-            response = self.mgmt_client.query(self.url, "GET", query_parameters, header_parameters, None, [200, 404], 0, 0)
-            try:
-                response = json.loads(response.text)
-                if isinstance(response, dict):
-                    if response.get('value'):
-                        self.results['response'] = self.results['response'] + response['value']
-                        skiptoken = response.get('nextLink')
-                    else:
-                        self.results['response'] = self.results['response'] + [response]
-            except Exception as e:
-                self.fail('Failed to parse response: ' + str(e))
-            if not skiptoken:
-                break
+        try:
+            # lists are followed through all their pages, a single resource is returned as the only item
+            self.results['response'].extend(self.mgmt_client.query_items(self.url, "GET", query_parameters, header_parameters,
+                                                                         expected_status_codes=[200, 404], prefetch=True))
+        except ValueError as e:
+            self.fail('Failed to parse response: ' + str(e))
         return self.results
 
 
@@ -26,7 +26,7 @@ options:
         description:
             - Unique name of role assignment.
             - The role assignment name must be a GUID, sample as "3ce0cbb0-58c4-4e6d-a16d-99d86a78b3ca".
-        required: True
+            - Required unless I(assignments) is given.
     assignee_object_id:
         description:
             - The object id of assignee. This maps to the ID inside the Active Directory.
@@ -42,6 +42,34 @@ options:
             - For example, use /subscriptions/{subscription-id}/ for subscription.
             - /subscriptions/{subscription-id}/resourceGroups/{resource-group-name} for resource group.
             - /subscriptions/{subscription-id}/resourceGroups/{resource-group-name}/providers/{resource-provider}/{resource-type}/{resource-name} for resource.
+            - Defaults to the subscription.
+    assignments:
+        description:
+            - List of role assignments in I(scope) to reconcile at once, instead of a single one given by I(name).
+            - The role assignments of the scope are listed once, and only the missing ones are created (or, with I(state=absent),
+              only the existing ones deleted), which is much faster than one task per assignment.
+            - All entries are checked before any change is made. The module fails if an entry to create lacks I(assignee_object_id)
+              or I(role_definition_id), or if an existing role assignment has another assignee or role definition than the entry,
+              as role assignments are not updatable.
+            - Mutually exclusive with I(name).
+        type: list
+        elements: dict
+        suboptions:
+            name:
+                description:
+                    - Unique name of the role assignment, a GUID.
+                type: str
+                required: True
+            assignee_object_id:
+                description:
+                    - The object id of the assignee.
+                    - Required when creating the role assignment.
+                type: str
+            role_definition_id:
+                description:
+                    - The role definition id used in the role assignment.
+                    - Required when creating the role assignment.
+                type: str
     state:
         description:
             - Assert the state of the role assignment.
@@ -73,6 +101,19 @@ EXAMPLES = '''
         scope: /subscriptions/xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx
         state: absent
 
+    - name: Make sure a list of role assignments exists in a resource group
+      azure_rm_roleassignment:
+        scope: /subscriptions/xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx/resourceGroups/myResourceGroup
+        assignments:
+          - name: xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx
+            assignee_object_id: xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx
+            role_definition_id:
+              "/subscriptions/xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx/providers/Microsoft.Authorization/roleDefinitions/xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx"
+          - name: yyyyyyyy-yyyy-yyyy-yyyy-yyyyyyyyyyyy
+            assignee_object_id: yyyyyyyy-yyyy-yyyy-yyyy-yyyyyyyyyyyy
+            role_definition_id:
+              "/subscriptions/xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx/providers/Microsoft.Authorization/roleDefinitions/xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx"
+
 '''
 
 RETURN = '''
@@ -82,6 +123,20 @@ id:
     returned: always
     type: str
     sample: "/subscriptions/xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx/providers/Microsoft.Authorization/roleAssignments/xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx"
+assignments:
+    description:
+        - Role assignments of I(assignments) that exist after the task, with their id, name, type, assignee_object_id,
+          role_definition_id and scope.
+    returned: when I(assignments) is given
+    type: list
+    sample:
+        - id: "/subscriptions/xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx/providers/Microsoft.Authorization/roleAssignments/xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx"
+          name: "xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx"
+          type: "Microsoft.Authorization/roleAssignments"
+          assignee_object_id: "xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx"
+          role_definition_id:
+            "/subscriptions/xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx/providers/Microsoft.Authorization/roleDefinitions/xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx"
+          scope: "/subscriptions/xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx"
 '''
 
 try:
@@ -114,12 +169,20 @@ class AzureRMRoleAssignment(AzureRMModuleBase):
     def __init__(self):
         self.module_arg_spec = dict(
             name=dict(
-                type='str',
-                required=True
+                type='str'
             ),
             scope=dict(
                 type='str'
             ),
+            assignments=dict(
+                type='list',
+                elements='dict',
+                options=dict(
+                    name=dict(type='str', required=True),
+                    assignee_object_id=dict(type='str'),
+                    role_definition_id=dict(type='str')
+                )
+            ),
             assignee_object_id=dict(
                 type='str'
             ),
@@ -135,6 +198,7 @@ class AzureRMRoleAssignment(AzureRMModuleBase):
 
         self.name = None
         self.scope = None
+        self.assignments = None
         self.assignee_object_id = None
         self.role_definition_id = None
 
@@ -148,6 +212,8 @@ class AzureRMRoleAssignment(AzureRMModuleBase):
 
         super(AzureRMRoleAssignment, self).__init__(derived_arg_spec=self.module_arg_spec,
                                                     supports_check_mode=True,
+                                                    required_one_of=[['name', 'assignments']],
+                                                    mutually_exclusive=[['name', 'assignments']],
                                                     supports_tags=False)
 
     def exec_module(self, **kwargs):
@@ -168,6 +234,9 @@ class AzureRMRoleAssignment(AzureRMModuleBase):
         # build cope
         self.scope = self.build_scope()
 
+        if self.assignments is not None:
+            return self.reconcile_roleassignments()
+
         # get existing role assignment
         old_response = self.get_roleassignment()
 
@@ -179,6 +248,10 @@ class AzureRMRoleAssignment(AzureRMModuleBase):
             if not old_response:
                 self.log("Role assignment doesn't exist in this scope")
 
+                error = self.check_create_parameters(self.assignee_object_id, self.role_definition_id)
+                if error:
+                    self.fail("Error creating role assignment {0} - {1}".format(self.name, error))
+
                 self.results['changed'] = True
 
                 if self.check_mode:
@@ -209,24 +282,110 @@ class AzureRMRoleAssignment(AzureRMModuleBase):
 
     # build scope
     def build_scope(self):
-        subscription_scope = '/subscription/' + self.subscription_id
+        subscription_scope = '/subscriptions/' + self.subscription_id
         if self.scope is None:
             return subscription_scope
         return self.scope
 
-    def create_roleassignment(self):
+    def reconcile_roleassignments(self):
+        '''
+        Creates the missing role assignments of self.assignments, or deletes the existing ones when state is absent, from a
+        single listing of the assignments of the scope.
+
+        :return: module results
+        '''
+        existing = self.list_roleassignments_at_scope()
+
+        # check every entry before changing anything, so that a bad entry doesn't leave the list half applied
+        if self.state == 'present':
+            errors = []
+            for desired in self.assignments:
+                current = existing.get(desired['name'].lower())
+                if not current:
+                    error = self.check_create_parameters(desired['assignee_object_id'], desired['role_definition_id'])
+                else:
+                    error = self.check_not_updated(current, desired['assignee_object_id'], desired['role_definition_id'])
+                if error:
+                    errors.append("{0}: {1}".format(desired['name'], error))
+            if errors:
+                self.fail("Invalid role assignments in scope {0} - {1}".format(self.scope, '; '.join(errors)))
+
+        assignments = []
+        for desired in self.assignments:
+            current = existing.get(desired['name'].lower())
+            if self.state == 'present':
+                if not current:
+                    self.results['changed'] = True
+                    if self.check_mode:
+                        continue
+                    current = self.create_roleassignment(desired['name'], desired['assignee_object_id'], desired['role_definition_id'])
+                assignments.append(current)
+            elif current:
+                self.results['changed'] = True
+                if not self.check_mode:
+                    self.delete_roleassignment(current['id'])
+        self.results['assignments'] = assignments
+        return self.results
+
+    @staticmethod
+    def check_create_parameters(assignee_object_id, role_definition_id):
+        '''
+        :return: why a role assignment can't be created with these parameters, or None
+        '''
+        missing = [option for option, value in (('assignee_object_id', assignee_object_id), ('role_definition_id', role_definition_id))
+                   if not value]
+        if missing:
+            return "{0} {1} required to create the role assignment".format(' and '.join(missing), 'are' if len(missing) > 1 else 'is')
+        return None
+
+    @staticmethod
+    def check_not_updated(current, assignee_object_id, role_definition_id):
+        '''
+        Role assignments are not updatable, so a role assignment that exists with another assignee or role can't be
+        made to match.
+
+        :return: how the existing role assignment differs from the given parameters, or None
+        '''
+        differences = []
+        if assignee_object_id and assignee_object_id.lower() != (current['assignee_object_id'] or '').lower():
+            differences.append("assignee_object_id {0}".format(current['assignee_object_id']))
+        # compare role definitions by their GUID, the same role can be given with or without the subscription prefix
+        if role_definition_id and \
+                role_definition_id.rstrip('/').split('/')[-1].lower() != (current['role_definition_id'] or '').rstrip('/').split('/')[-1].lower():
+            differences.append("role_definition_id {0}".format(current['role_definition_id']))
+        if differences:
+            return "role assignment exists with {0}, and role assignments are not updatable".format(' and '.join(differences))
+        return None
+
+    def list_roleassignments_at_scope(self):
+        '''
+        Lists the role assignments made at the scope itself, leaving out inherited and nested ones.
+
+        :return: role assignment dictionaries by lower case name
+        '''
+        self.log("Listing role assignments in scope {0}".format(self.scope))
+        try:
+            response = self._client.role_assignments.list_for_scope(scope=self.scope, filter='atScope()')
+            return dict((assignment.name.lower(), roleassignment_to_dict(assignment)) for assignment in response
+                        if assignment.scope.rstrip('/').lower() == self.scope.rstrip('/').lower())
+        except CloudError as exc:
+            self.fail("Error listing role assignments in scope {0}: {1}".format(self.scope, str(exc)))
+
+    def create_roleassignment(self, name=None, assignee_object_id=None, role_definition_id=None):
         '''
         Creates role assignment.
 
         :return: deserialized role assignment
         '''
-        self.log("Creating role assignment {0}".format(self.name))
+        name = name or self.name
+        self.log("Creating role assignment {0}".format(name))
 
         try:
             # pylint: disable=missing-kwoa
-            parameters = RoleAssignmentCreateParameters(role_definition_id=self.role_definition_id, principal_id=self.assignee_object_id)
+            parameters = RoleAssignmentCreateParameters(role_definition_id=role_definition_id or self.role_definition_id,
+                                                        principal_id=assignee_object_id or self.assignee_object_id)
             response = self._client.role_assignments.create(scope=self.scope,
-                                                            role_assignment_name=self.name,
+                                                            role_assignment_name=name,
                                                             parameters=parameters)
 
         except CloudError as exc:
@@ -240,7 +399,7 @@ class AzureRMRoleAssignment(AzureRMModuleBase):
 
         :return: True
         '''
-        self.log("Deleting the role assignment {0}".format(self.name))
+        self.log("Deleting the role assignment {0}".format(assignment_id))
         scope = self.build_scope()
         try:
             response = self._client.role_assignments.delete_by_id(role_id=assignment_id)
@@ -258,15 +417,8 @@ class AzureRMRoleAssignment(AzureRMModuleBase):
         '''
         self.log("Checking if the role assignment {0} is present".format(self.name))
 
-        response = None
-
         try:
-            response = list(self._client.role_assignments.list())
-            if response:
-                for assignment in response:
-                    if assignment.name == self.name and assignment.scope == self.scope:
-                        return roleassignment_to_dict(assignment)
-
+            return roleassignment_to_dict(self._client.role_assignments.get(scope=self.scope, role_assignment_name=self.name))
         except CloudError as ex:
             self.log("Didn't find role assignment {0} in scope {1}".format(self.name, self.scope))
 
@@ -78,7 +78,6 @@ id:
              5/firewallRules/firewallrulecrudtest-5370"
 '''
 
-import time
 from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase
 
 try:
@@ -190,8 +189,7 @@ class AzureRMSqlFirewallRule(AzureRMModuleBase):
             self.delete_firewallrule()
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_firewallrule():
-                time.sleep(20)
+            self.wait_for(self.get_firewallrule, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log("Firewall Rule instance unchanged")
             self.results['changed'] = False
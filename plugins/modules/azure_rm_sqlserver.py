@@ -100,7 +100,6 @@ fully_qualified_domain_name:
     sample: sqlcrudtest-4645.database.windows.net
 '''
 
-import time
 from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase
 
 try:
@@ -238,8 +237,7 @@ class AzureRMSqlServer(AzureRMModuleBase):
             self.delete_sqlserver()
             # make sure instance is actually deleted, for some Azure resources, instance is hanging around
             # for some time after deletion -- this should be really fixed in Azure
-            while self.get_sqlserver():
-                time.sleep(20)
+            self.wait_for(self.get_sqlserver, lambda resource: not resource, description='the deletion to complete')
         else:
             self.log("SQL Server instance unchanged")
             self.results['changed'] = False
@@ -505,7 +505,7 @@ class AzureRMStorageAccountInfo(AzureRMModuleBase):
         return [item for item in raw if self.has_tags(item.tags, self.tags)]
 
     def serialize(self, raw):
-        return [self.serialize_obj(item, AZURE_OBJECT_CLASS) for item in raw]
+        return self.serialize_objs(raw, AZURE_OBJECT_CLASS)
 
     def format_to_dict(self, raw):
         return [self.account_obj_to_dict(item) for item in raw]
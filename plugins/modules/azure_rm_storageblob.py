@@ -26,6 +26,7 @@ description:
     - In the batch upload mode, the existing blob object will be overwritten if a blob object with the same name is to be created.
     - the module can work exclusively in three modes, when C(batch_upload_src) is set, it is working in batch upload mode;
       when C(src) is set, it is working in upload mode and when C(dst) is set, it is working in dowload mode.
+    - With I(sync=true), the upload modes only upload files whose content differs from the existing blob.
 options:
     storage_account_name:
         description:
@@ -98,6 +99,39 @@ options:
     batch_upload_dst:
         description:
             - Base directory in container when upload batch of files.
+    batch_upload_workers:
+        description:
+            - Number of files uploaded at the same time in batch upload mode.
+        type: int
+        default: 8
+    max_connections:
+        description:
+            - Number of parallel connections used to upload the blocks of a single large file.
+            - In batch upload mode this applies to each of the I(batch_upload_workers) files being uploaded.
+        type: int
+        default: 2
+    sync:
+        description:
+            - Only upload a file if there is no blob for it yet, or if the blob's size or Content-MD5 differs from the file, and
+              only report a change then.
+            - In batch upload mode, the blobs under I(batch_upload_dst) are listed once up front, instead of being looked up one by one.
+            - Uploaded blobs get the Content-MD5 of their file, so that later runs can compare them.
+            - In upload mode, a blob with different content is overwritten even without I(force).
+        type: bool
+        default: no
+    sync_delete:
+        description:
+            - With I(sync=true) in batch upload mode, also delete the blobs under I(batch_upload_dst) that have no file in I(batch_upload_src).
+            - Requires I(sync=true).
+            - Without I(batch_upload_dst), this applies to every blob of the container.
+        type: bool
+        default: no
+    sync_hash_cache:
+        description:
+            - File in which I(sync=true) keeps the MD5 hashes of the files of I(batch_upload_src), by size and modification time, so that
+              unchanged files are not read again on the next run.
+        type: path
+        default: ~/.ansible/azure_rm_storageblob_hashes.json
     state:
         description:
             - State of a container or blob.
@@ -156,6 +190,23 @@ EXAMPLES = '''
     container: foo
     blob: graylog.png
     dest: ~/tmp/images/graylog.png
+
+- name: Upload a static site, 16 files at a time
+  azure_rm_storageblob:
+    resource_group: myResourceGroup
+    storage_account_name: clh0002
+    container: '$web'
+    batch_upload_src: ./public
+    batch_upload_workers: 16
+
+- name: Upload only the changed files of a static site and delete the blobs of removed files
+  azure_rm_storageblob:
+    resource_group: myResourceGroup
+    storage_account_name: clh0002
+    container: '$web'
+    batch_upload_src: ./public
+    sync: yes
+    sync_delete: yes
 '''
 
 RETURN = '''
@@ -189,10 +240,44 @@ container:
         "name": "foo",
         "tags": {}
     }
+files:
+    description:
+        - Files of the batch upload, and with I(sync_delete=true) the blobs deleted for lack of a file, in blob name order.
+    returned: batch upload mode
+    type: complex
+    contains:
+        src:
+            description:
+                - Path of the local file.
+            type: str
+            returned: unless deleted
+            sample: /home/user/public/index.html
+        blob:
+            description:
+                - Name of the blob.
+            type: str
+            returned: always
+            sample: index.html
+        size:
+            description:
+                - Size of the file in bytes.
+            type: int
+            returned: unless deleted
+            sample: 4120
+        status:
+            description:
+                - C(uploaded), C(unchanged) with I(sync=true), C(deleted) with I(sync_delete=true), or C(failed) with the reason in I(msg).
+            type: str
+            returned: always
+            sample: uploaded
 '''
 
 import os
+import base64
+import hashlib
 import mimetypes
+import threading
+from time import time
 
 try:
     from azure.storage.blob.models import ContentSettings
@@ -201,7 +286,27 @@ except ImportError:
     # This is handled in azure_rm_common
     pass
 
-from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase
+from ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common import AzureRMModuleBase, AzureRMFileCache
+
+# content types mimetypes may not know, for batch upload
+mimetypes.add_type('application/json', '.json')
+mimetypes.add_type('application/javascript', '.js')
+mimetypes.add_type('application/wasm', '.wasm')
+
+# each sync replaces the hashes cached for its source directory with those of the files it saw; a directory that is not
+# synced again for this long is dropped from sync_hash_cache
+SYNC_HASH_CACHE_TTL = 30 * 24 * 3600
+
+
+def get_file_md5(path):
+    '''
+    Base64 encoded MD5 of a file, as in the Content-MD5 of a blob.
+    '''
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(4 * 1024 * 1024), b''):
+            md5.update(chunk)
+    return base64.b64encode(md5.digest()).decode('utf-8')
 
 
 class AzureRMStorageBlob(AzureRMModuleBase):
@@ -219,6 +324,11 @@ class AzureRMStorageBlob(AzureRMModuleBase):
             src=dict(type='str', aliases=['source']),
             batch_upload_src=dict(type='path'),
             batch_upload_dst=dict(type='path'),
+            batch_upload_workers=dict(type='int', default=8),
+            max_connections=dict(type='int', default=2),
+            sync=dict(type='bool', default=False),
+            sync_delete=dict(type='bool', default=False),
+            sync_hash_cache=dict(type='path', default='~/.ansible/azure_rm_storageblob_hashes.json'),
             state=dict(type='str', default='present', choices=['absent', 'present']),
             public_access=dict(type='str', choices=['container', 'blob']),
             content_type=dict(type='str'),
@@ -245,6 +355,12 @@ class AzureRMStorageBlob(AzureRMModuleBase):
         self.src = None
         self.batch_upload_src = None
         self.batch_upload_dst = None
+        self.batch_upload_workers = None
+        self.max_connections = None
+        self.sync = None
+        self.sync_delete = None
+        self.sync_hash_cache = None
+        self.src_md5 = None
         self.state = None
         self.tags = None
         self.public_access = None
@@ -267,6 +383,9 @@ class AzureRMStorageBlob(AzureRMModuleBase):
 
         self.results['check_mode'] = self.check_mode
 
+        if self.sync_delete and not self.sync:
+            self.fail("sync_delete requires sync=true")
+
         # add file path validation
 
         self.blob_client = self.get_blob_client(self.resource_group, self.storage_account_name, self.blob_type)
@@ -290,7 +409,13 @@ class AzureRMStorageBlob(AzureRMModuleBase):
                 # create, update or download blob
                 self.blob_obj = self.get_blob()
                 if self.src and self.src_is_valid():
-                    if self.blob_obj and not self.force:
+                    if self.sync:
+                        self.src_md5 = self.content_md5 or get_file_md5(self.src)
+                    if self.sync and self.blob_obj and \
+                            self.blob_obj['content_length'] == os.path.getsize(self.src) and \
+                            self.blob_obj['content_settings']['content_md5'] == self.src_md5:
+                        self.log("Blob {0} already has the content of {1}".format(self.blob, self.src))
+                    elif self.blob_obj and not self.force and not self.sync:
                         self.log("Cannot upload to {0}. Blob with that name already exists. "
                                  "Use the force option".format(self.blob))
                     else:
@@ -342,19 +467,15 @@ class AzureRMStorageBlob(AzureRMModuleBase):
 
             return path_sep.join(os.path.normpath(name).split(os.path.sep)).strip(path_sep)
 
-        def _guess_content_type(file_path, original):
-            if original.content_encoding or original.content_type:
-                return original
-
-            mimetypes.add_type('application/json', '.json')
-            mimetypes.add_type('application/javascript', '.js')
-            mimetypes.add_type('application/wasm', '.wasm')
-
-            content_type, v = mimetypes.guess_type(file_path)
+        def _guess_content_type(file_path, original, content_md5=None):
+            content_type = original.content_type
+            if not original.content_encoding and not original.content_type:
+                content_type, v = mimetypes.guess_type(file_path)
             return ContentSettings(content_type=content_type,
+                                   content_encoding=original.content_encoding,
                                    content_disposition=original.content_disposition,
                                    content_language=original.content_language,
-                                   content_md5=original.content_md5,
+                                   content_md5=content_md5,
                                    cache_control=original.cache_control)
 
         if not os.path.exists(self.batch_upload_src):
@@ -364,7 +485,6 @@ class AzureRMStorageBlob(AzureRMModuleBase):
             self.fail("incorrect usage: {0} is not a directory".format(self.batch_upload_src))
 
         source_dir = os.path.realpath(self.batch_upload_src)
-        source_files = list(_glob_files_locally(source_dir))
 
         content_settings = ContentSettings(content_type=self.content_type,
                                            content_encoding=self.content_encoding,
@@ -373,19 +493,102 @@ class AzureRMStorageBlob(AzureRMModuleBase):
                                            cache_control=self.cache_control,
                                            content_md5=None)
 
-        for src, blob_path in source_files:
-            if self.batch_upload_dst:
-                blob_path = _normalize_blob_file_path(self.batch_upload_dst, blob_path)
-            if not self.check_mode:
-                try:
+        files = []
+        files_lock = threading.Lock()
+
+        remote_blobs = dict()
+        cached_hashes = dict()
+        hashes = dict()
+        if self.sync:
+            # the folder part of a blob name built the same way the uploaded ones are, so a batch_upload_dst of '/' or '.'
+            # lists the whole container instead of matching nothing
+            prefix = _normalize_blob_file_path(self.batch_upload_dst, '_').rpartition('/')[0]
+            remote_blobs = self.list_blob_contents(prefix + '/' if prefix else None)
+            hash_cache = AzureRMFileCache(self.sync_hash_cache)
+            hash_cache_key = 'md5:{0}'.format(source_dir)
+            cached_hashes = hash_cache.get(hash_cache_key) or dict()
+
+        def _upload(src, blob_path):
+            file_result = dict(src=src, blob=blob_path, size=None, status='uploaded')
+            try:
+                stat = os.stat(src)
+                file_result['size'] = stat.st_size
+                content_md5 = None
+                if self.sync:
+                    cached = cached_hashes.get(src)
+                    if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime:
+                        content_md5 = cached[2]
+                    else:
+                        content_md5 = get_file_md5(src)
+                    hashes[src] = [stat.st_size, stat.st_mtime, content_md5]
+                    if remote_blobs.get(blob_path) == (stat.st_size, content_md5):
+                        file_result['status'] = 'unchanged'
+                        return
+                if not self.check_mode:
                     self.blob_client.create_blob_from_path(self.container, blob_path, src,
-                                                           metadata=self.tags, content_settings=_guess_content_type(src, content_settings))
-                except AzureHttpError as exc:
-                    self.fail("Error creating blob {0} - {1}".format(src, str(exc)))
-            self.results['actions'].append('created blob from {0}'.format(src))
+                                                           metadata=self.tags,
+                                                           content_settings=_guess_content_type(src, content_settings, content_md5),
+                                                           max_connections=self.max_connections)
+            except Exception as exc:
+                file_result.update(status='failed', msg=str(exc))
+                raise
+            finally:
+                with files_lock:
+                    files.append(file_result)
 
-        self.results['changed'] = True
+        def _upload_tasks():
+            # files are handed to the workers as the walk finds them
+            for src, blob_path in _glob_files_locally(source_dir):
+                if self.batch_upload_dst:
+                    blob_path = _normalize_blob_file_path(self.batch_upload_dst, blob_path)
+                yield src, (lambda src=src, blob_path=blob_path: _upload(src, blob_path))
+
+        errors = self.run_parallel(_upload_tasks(), self.batch_upload_workers)
+
+        if self.sync and not self.check_mode:
+            hash_cache.set(hash_cache_key, hashes, time() + SYNC_HASH_CACHE_TTL)
+
+        if self.sync and self.sync_delete:
+            local_blobs = set(file_result['blob'] for file_result in files)
+
+            def _delete(blob_path):
+                file_result = dict(blob=blob_path, status='deleted')
+                try:
+                    if not self.check_mode:
+                        self.blob_client.delete_blob(self.container, blob_path)
+                except Exception as exc:
+                    file_result.update(status='failed', msg=str(exc))
+                    raise
+                finally:
+                    with files_lock:
+                        files.append(file_result)
+
+            errors.extend(self.run_parallel([(blob_path, (lambda blob_path=blob_path: _delete(blob_path)))
+                                             for blob_path in remote_blobs if blob_path not in local_blobs],
+                                            self.batch_upload_workers))
+
+        files.sort(key=lambda file_result: file_result['blob'])
+        for file_result in files:
+            if file_result['status'] == 'uploaded':
+                self.results['actions'].append('created blob from {0}'.format(file_result['src']))
+            elif file_result['status'] == 'deleted':
+                self.results['actions'].append('deleted blob {0}:{1}'.format(self.container, file_result['blob']))
+        self.results['files'] = files
+        self.results['changed'] = any(file_result['status'] in ('uploaded', 'deleted') for file_result in files)
         self.results['container'] = self.container_obj
+        if errors:
+            self.fail("Error in batch upload of {0} - {1}".format(
+                self.batch_upload_src, '; '.join("{0}: {1}".format(description, str(exc)) for description, exc in errors)), **self.results)
+
+    def list_blob_contents(self, prefix=None):
+        '''
+        Size and Content-MD5 of the blobs of the container, by name.
+        '''
+        try:
+            return dict((blob.name, (blob.properties.content_length, blob.properties.content_settings.content_md5))
+                        for blob in self.blob_client.list_blobs(self.container, prefix=prefix))
+        except AzureHttpError as exc:
+            self.fail("Error listing blobs in {0} - {1}".format(self.container, str(exc)))
 
     def get_container(self):
         result = {}
@@ -449,20 +652,22 @@ class AzureRMStorageBlob(AzureRMModuleBase):
 
     def upload_blob(self):
         content_settings = None
+        content_md5 = self.content_md5 or self.src_md5
         if self.content_type or self.content_encoding or self.content_language or self.content_disposition or \
-                self.cache_control or self.content_md5:
+                self.cache_control or content_md5:
             content_settings = ContentSettings(
                 content_type=self.content_type,
                 content_encoding=self.content_encoding,
                 content_language=self.content_language,
                 content_disposition=self.content_disposition,
                 cache_control=self.cache_control,
-                content_md5=self.content_md5
+                content_md5=content_md5
             )
         if not self.check_mode:
             try:
                 self.blob_client.create_blob_from_path(self.container, self.blob, self.src,
-                                                       metadata=self.tags, content_settings=content_settings)
+                                                       metadata=self.tags, content_settings=content_settings,
+                                                       max_connections=self.max_connections)
             except AzureHttpError as exc:
                 self.fail("Error creating blob {0} - {1}".format(self.blob, str(exc)))
 
@@ -583,6 +788,8 @@ class AzureRMStorageBlob(AzureRMModuleBase):
         self.results['blob'] = self.blob_obj
 
     def blob_content_settings_differ(self):
+        # with sync, the blob is expected to keep the MD5 of its file
+        content_md5 = self.content_md5 or self.src_md5
         if self.content_type or self.content_encoding or self.content_language or self.content_disposition or \
                 self.cache_control or self.content_md5:
             settings = dict(
@@ -591,7 +798,7 @@ class AzureRMStorageBlob(AzureRMModuleBase):
                 content_language=self.content_language,
                 content_disposition=self.content_disposition,
                 cache_control=self.cache_control,
-                content_md5=self.content_md5
+                content_md5=content_md5
             )
             if self.blob_obj['content_settings'] != settings:
                 return True
@@ -605,7 +812,7 @@ class AzureRMStorageBlob(AzureRMModuleBase):
             content_language=self.content_language,
             content_disposition=self.content_disposition,
             cache_control=self.cache_control,
-            content_md5=self.content_md5
+            content_md5=self.content_md5 or self.src_md5
         )
         if not self.check_mode:
             try:
@@ -283,6 +283,13 @@ options:
             - Any other input will be ignored.
         type: list
         default: ['all']
+    remove_concurrency:
+        description:
+            - Maximum number of associated resources deleted at the same time when removing a VM with I(state=absent).
+            - Disks, VHDs and network interfaces are deleted together, followed by public IPs, NSGs and storage accounts.
+            - If some deletions fail, the others still go ahead and all the failures are reported at the end.
+        type: int
+        default: 8
     plan:
         description:
             - Third-party billing plan for the VM.
@@ -755,6 +762,7 @@ azure_vm:
 '''  # NOQA
 
 import base64
+import functools
 import random
 import re
 
@@ -820,6 +828,7 @@ class AzureRMVirtualMachine(AzureRMModuleBase):
             open_ports=dict(type='list'),
             network_interface_names=dict(type='list', aliases=['network_interfaces'], elements='raw'),
             remove_on_absent=dict(type='list', default=['all']),
+            remove_concurrency=dict(type='int', default=8),
             virtual_network_resource_group=dict(type='str'),
             virtual_network_name=dict(type='str', aliases=['virtual_network']),
             subnet_name=dict(type='str', aliases=['subnet']),
@@ -861,6 +870,7 @@ class AzureRMVirtualMachine(AzureRMModuleBase):
         self.os_disk_name = None
         self.network_interface_names = None
         self.remove_on_absent = set()
+        self.remove_concurrency = None
         self.tags = None
         self.force = None
         self.public_ip_allocation_method = None
@@ -989,9 +999,9 @@ class AzureRMVirtualMachine(AzureRMModuleBase):
 
             if self.image and isinstance(self.image, dict):
                 if all(key in self.image for key in ('publisher', 'offer', 'sku', 'version')):
-                    marketplace_image = self.get_marketplace_image_version()
+                    marketplace_image_version = self.get_marketplace_image_version()
                     if self.image['version'] == 'latest':
-                        self.image['version'] = marketplace_image.name
+                        self.image['version'] = marketplace_image_version
                         self.log("Using image version {0}".format(self.image['version']))
 
                     image_reference = self.compute_models.ImageReference(
@@ -1811,32 +1821,103 @@ class AzureRMVirtualMachine(AzureRMModuleBase):
         except Exception as exc:
             self.fail("Error deleting virtual machine {0} - {1}".format(self.name, str(exc)))
 
-        # TODO: parallelize nic, vhd, and public ip deletions with begin_deleting
-        # TODO: best-effort to keep deleting other linked resources if we encounter an error
+        # Everything the VM held can go at once now. Public IPs and NSGs stay attached to their network interfaces,
+        # and VHD blobs live in the storage account, so those are deleted in a second round once the first is done.
+        first_round = []
+        second_round = []
         if self.remove_on_absent.intersection(set(['all', 'virtual_storage'])):
-            self.log('Deleting VHDs')
-            self.delete_vm_storage(vhd_uris)
-            self.log('Deleting managed disks')
-            self.delete_managed_disks(managed_disk_ids)
-
-        if 'all' in self.remove_on_absent or 'all_autocreated' in self.remove_on_absent:
-            self.remove_autocreated_resources(vm.tags)
+            first_round.extend(self.delete_vhd_tasks(vhd_uris))
+            for mdi in managed_disk_ids:
+                first_round.append(self.delete_managed_disk_task(mdi))
 
         if self.remove_on_absent.intersection(set(['all', 'network_interfaces'])):
-            self.log('Deleting network interfaces')
             for nic_dict in nic_names:
-                self.delete_nic(nic_dict['resource_group'], nic_dict['name'])
+                first_round.append(self.delete_nic_task(nic_dict['resource_group'], nic_dict['name']))
 
         if self.remove_on_absent.intersection(set(['all', 'public_ips'])):
-            self.log('Deleting public IPs')
             for pip_dict in pip_names:
-                self.delete_pip(pip_dict['resource_group'], pip_dict['name'])
-
-        if 'all' in self.remove_on_absent or 'all_autocreated' in self.remove_on_absent:
-            self.remove_autocreated_resources(vm.tags)
-
+                second_round.append(self.delete_pip_task(pip_dict['resource_group'], pip_dict['name']))
+
+        if ('all' in self.remove_on_absent or 'all_autocreated' in self.remove_on_absent) and vm.tags:
+            if vm.tags.get('_own_nic_'):
+                first_round.append(self.delete_nic_task(self.resource_group, vm.tags['_own_nic_']))
+            if vm.tags.get('_own_pip_'):
+                second_round.append(self.delete_pip_task(self.resource_group, vm.tags['_own_pip_']))
+            if vm.tags.get('_own_nsg_'):
+                second_round.append(self.delete_nsg_task(self.resource_group, vm.tags['_own_nsg_']))
+            if vm.tags.get('_own_sa_'):
+                second_round.append(self.delete_storage_account_task(self.resource_group, vm.tags['_own_sa_']))
+
+        deleted = set()
+
+        def delete_and_record(key, task):
+            task()
+            deleted.add(key)
+
+        errors = []
+        for tasks in (first_round, second_round):
+            # auto-created resources may also be among the attached ones
+            unique_tasks = []
+            seen = set()
+            for key, description, task in tasks:
+                if key not in seen:
+                    seen.add(key)
+                    unique_tasks.append((key, description, task))
+            errors.extend(self.run_parallel([(description, functools.partial(delete_and_record, key, task))
+                                             for key, description, task in unique_tasks], self.remove_concurrency))
+            # only what was actually deleted, in task order
+            self.results['actions'].extend("Deleted {0}".format(description) for key, description, task in unique_tasks
+                                           if key in deleted)
+
+        if errors:
+            self.fail("Error deleting resources of virtual machine {0} - {1}".format(
+                self.name, '; '.join("{0}: {1}".format(description, str(exc)) for description, exc in errors)))
         return True
 
+    def delete_nic_task(self, resource_group, name):
+        def task():
+            self.get_poller_result(self.network_client.network_interfaces.delete(resource_group, name))
+        return (('network_interface', resource_group.lower(), name.lower()), "network interface {0}".format(name), task)
+
+    def delete_pip_task(self, resource_group, name):
+        def task():
+            self.get_poller_result(self.network_client.public_ip_addresses.delete(resource_group, name))
+        return (('public_ip', resource_group.lower(), name.lower()), "public IP {0}".format(name), task)
+
+    def delete_nsg_task(self, resource_group, name):
+        def task():
+            self.get_poller_result(self.network_client.network_security_groups.delete(resource_group, name))
+        return (('nsg', resource_group.lower(), name.lower()), "NSG {0}".format(name), task)
+
+    def delete_storage_account_task(self, resource_group, name):
+        def task():
+            self.storage_client.storage_accounts.delete(resource_group, name)
+        return (('storage_account', name.lower()), "storage account {0}".format(name), task)
+
+    def delete_managed_disk_task(self, managed_disk_id):
+        def task():
+            self.get_poller_result(self.rm_client.resources.delete_by_id(managed_disk_id, '2017-03-30'))
+        return (('managed_disk', managed_disk_id.lower()), "managed disk {0}".format(managed_disk_id), task)
+
+    def delete_vhd_tasks(self, vhd_uris):
+        # blob clients are set up here rather than in the tasks, as getting one may fail() the module
+        blob_clients = dict()
+        tasks = []
+        for uri in vhd_uris:
+            self.log("Extracting info from blob uri '{0}'".format(uri))
+            try:
+                blob_parts = extract_names_from_blob_uri(uri, self._cloud_environment.suffixes.storage_endpoint)
+            except Exception as exc:
+                self.fail("Error parsing blob URI {0}".format(str(exc)))
+            storage_account_name = blob_parts['accountname']
+            if storage_account_name not in blob_clients:
+                blob_clients[storage_account_name] = self.get_blob_client(self.resource_group, storage_account_name)
+            tasks.append((('blob', storage_account_name, blob_parts['containername'], blob_parts['blobname']),
+                          "blob {0}:{1}".format(blob_parts['containername'], blob_parts['blobname']),
+                          functools.partial(blob_clients[storage_account_name].delete_blob,
+                                            blob_parts['containername'], blob_parts['blobname'])))
+        return tasks
+
     def get_network_interface(self, resource_group, name):
         try:
             nic = self.network_client.network_interfaces.get(resource_group, name)
@@ -1875,15 +1956,6 @@ class AzureRMVirtualMachine(AzureRMModuleBase):
             self.fail("Error deleting {0} - {1}".format(name, str(exc)))
         return True
 
-    def delete_managed_disks(self, managed_disk_ids):
-        for mdi in managed_disk_ids:
-            try:
-                poller = self.rm_client.resources.delete_by_id(mdi, '2017-03-30')
-                self.get_poller_result(poller)
-            except Exception as exc:
-                self.fail("Error deleting managed disk {0} - {1}".format(mdi, str(exc)))
-        return True
-
     def delete_storage_account(self, resource_group, name):
         self.log("Delete storage account {0}".format(name))
         self.results['actions'].append("Deleted storage account {0}".format(name))
@@ -1893,45 +1965,30 @@ class AzureRMVirtualMachine(AzureRMModuleBase):
             self.fail("Error deleting storage account {0} - {1}".format(name, str(exc)))
         return True
 
-    def delete_vm_storage(self, vhd_uris):
-        # FUTURE: figure out a cloud_env indepdendent way to delete these
-        for uri in vhd_uris:
-            self.log("Extracting info from blob uri '{0}'".format(uri))
-            try:
-                blob_parts = extract_names_from_blob_uri(uri, self._cloud_environment.suffixes.storage_endpoint)
-            except Exception as exc:
-                self.fail("Error parsing blob URI {0}".format(str(exc)))
-            storage_account_name = blob_parts['accountname']
-            container_name = blob_parts['containername']
-            blob_name = blob_parts['blobname']
-
-            blob_client = self.get_blob_client(self.resource_group, storage_account_name)
-
-            self.log("Delete blob {0}:{1}".format(container_name, blob_name))
-            self.results['actions'].append("Deleted blob {0}:{1}".format(container_name, blob_name))
+    def get_marketplace_image_version(self):
+        '''
+        Name of the image version to use, resolving 'latest'.
+        '''
+        # a cached list may predate the latest version, so only specific versions are looked up in it
+        for refresh in (self.image['version'] == 'latest', True):
             try:
-                blob_client.delete_blob(container_name, blob_name)
+                versions, cached = self.list_image_versions(self.location,
+                                                            self.image['publisher'],
+                                                            self.image['offer'],
+                                                            self.image['sku'],
+                                                            refresh=refresh)
             except Exception as exc:
-                self.fail("Error deleting blob {0}:{1} - {2}".format(container_name, blob_name, str(exc)))
-        return True
-
-    def get_marketplace_image_version(self):
-        try:
-            versions = self.compute_client.virtual_machine_images.list(self.location,
-                                                                       self.image['publisher'],
-                                                                       self.image['offer'],
-                                                                       self.image['sku'])
-        except Exception as exc:
-            self.fail("Error fetching image {0} {1} {2} - {3}".format(self.image['publisher'],
-                                                                      self.image['offer'],
-                                                                      self.image['sku'],
-                                                                      str(exc)))
-        if versions and len(versions) > 0:
+                self.fail("Error fetching image {0} {1} {2} - {3}".format(self.image['publisher'],
+                                                                          self.image['offer'],
+                                                                          self.image['sku'],
+                                                                          str(exc)))
             if self.image['version'] == 'latest':
-                return versions[len(versions) - 1]
-            for version in versions:
-                if version.name == self.image['version']:
-                    return version
+                if versions:
+                    return versions[-1]
+            elif self.image['version'] in versions:
+                return self.image['version']
+            if not cached:
+                break
 
         self.fail("Error could not find image {0} {1} {2} {3}".format(self.image['publisher'],
                                                                       self.image['offer'],
@@ -1940,18 +1997,16 @@ class AzureRMVirtualMachine(AzureRMModuleBase):
         return None
 
     def get_custom_image_reference(self, name, resource_group=None):
-        try:
-            if resource_group:
-                vm_images = self.compute_client.images.list_by_resource_group(resource_group)
-            else:
-                vm_images = self.compute_client.images.list()
-        except Exception as exc:
-            self.fail("Error fetching custom images from subscription - {0}".format(str(exc)))
-
-        for vm_image in vm_images:
-            if vm_image.name == name:
-                self.log("Using custom image id {0}".format(vm_image.id))
-                return self.compute_models.ImageReference(id=vm_image.id)
+        for refresh in (False, True):
+            try:
+                vm_images, cached = self.get_custom_images(resource_group, refresh=refresh)
+            except Exception as exc:
+                self.fail("Error fetching custom images from subscription - {0}".format(str(exc)))
+            if name in vm_images:
+                self.log("Using custom image id {0}".format(vm_images[name]))
+                return self.compute_models.ImageReference(id=vm_images[name])
+            if not cached:
+                break
 
         self.fail("Error could not find image with name {0}".format(name))
         return None
@@ -1985,13 +2040,15 @@ class AzureRMVirtualMachine(AzureRMModuleBase):
 
         :return: boolean
         '''
-        try:
-            sizes = self.compute_client.virtual_machine_sizes.list(self.location)
-        except Exception as exc:
-            self.fail("Error retrieving available machine sizes - {0}".format(str(exc)))
-        for size in sizes:
-            if size.name == self.vm_size:
+        for refresh in (False, True):
+            try:
+                sizes, cached = self.list_vm_sizes(self.location, refresh=refresh)
+            except Exception as exc:
+                self.fail("Error retrieving available machine sizes - {0}".format(str(exc)))
+            if self.vm_size in sizes:
                 return True
+            if not cached:
+                break
         return False
 
     def create_default_storage_account(self, vm_dict=None):
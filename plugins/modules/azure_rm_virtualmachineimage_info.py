@@ -211,9 +211,7 @@ class AzureRMVirtualMachineImageInfo(AzureRMModuleBase):
             self.fail("Failed to list images: {0}".format(str(exc)))
 
         if response:
-            for item in response:
-                results.append(self.serialize_obj(item, 'VirtualMachineImageResource',
-                                                  enum_modules=AZURE_ENUM_MODULES))
+            results = self.serialize_objs(response, 'VirtualMachineImageResource', enum_modules=AZURE_ENUM_MODULES)
         return results
 
     def list_offers(self):
@@ -228,9 +226,7 @@ class AzureRMVirtualMachineImageInfo(AzureRMModuleBase):
             self.fail("Failed to list offers: {0}".format(str(exc)))
 
         if response:
-            for item in response:
-                results.append(self.serialize_obj(item, 'VirtualMachineImageResource',
-                                                  enum_modules=AZURE_ENUM_MODULES))
+            results = self.serialize_objs(response, 'VirtualMachineImageResource', enum_modules=AZURE_ENUM_MODULES)
         return results
 
     def list_publishers(self):
@@ -244,9 +240,7 @@ class AzureRMVirtualMachineImageInfo(AzureRMModuleBase):
             self.fail("Failed to list publishers: {0}".format(str(exc)))
 
         if response:
-            for item in response:
-                results.append(self.serialize_obj(item, 'VirtualMachineImageResource',
-                                                  enum_modules=AZURE_ENUM_MODULES))
+            results = self.serialize_objs(response, 'VirtualMachineImageResource', enum_modules=AZURE_ENUM_MODULES)
         return results
 
 
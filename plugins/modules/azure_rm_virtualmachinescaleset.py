@@ -643,9 +643,9 @@ class AzureRMVirtualMachineScaleSet(AzureRMModuleBase):
 
             if self.image and isinstance(self.image, dict):
                 if all(key in self.image for key in ('publisher', 'offer', 'sku', 'version')):
-                    marketplace_image = self.get_marketplace_image_version()
+                    marketplace_image_version = self.get_marketplace_image_version()
                     if self.image['version'] == 'latest':
-                        self.image['version'] = marketplace_image.name
+                        self.image['version'] = marketplace_image_version
                         self.log("Using image version {0}".format(self.image['version']))
 
                     image_reference = self.compute_models.ImageReference(
@@ -1127,43 +1127,50 @@ class AzureRMVirtualMachineScaleSet(AzureRMModuleBase):
         return True
 
     def get_marketplace_image_version(self):
-        try:
-            versions = self.compute_client.virtual_machine_images.list(self.location,
-                                                                       self.image['publisher'],
-                                                                       self.image['offer'],
-                                                                       self.image['sku'])
-        except CloudError as exc:
-            self.fail("Error fetching image {0} {1} {2} - {3}".format(self.image['publisher'],
-                                                                      self.image['offer'],
-                                                                      self.image['sku'],
-                                                                      str(exc)))
-        if versions and len(versions) > 0:
+        '''
+        Name of the image version to use, resolving 'latest'.
+        '''
+        # a cached list may predate the latest version, so only specific versions are looked up in it
+        for refresh in (self.image['version'] == 'latest', True):
+            try:
+                versions, cached = self.list_image_versions(self.location,
+                                                            self.image['publisher'],
+                                                            self.image['offer'],
+                                                            self.image['sku'],
+                                                            refresh=refresh)
+            except CloudError as exc:
+                self.fail("Error fetching image {0} {1} {2} - {3}".format(self.image['publisher'],
+                                                                          self.image['offer'],
+                                                                          self.image['sku'],
+                                                                          str(exc)))
             if self.image['version'] == 'latest':
-                return versions[len(versions) - 1]
-            for version in versions:
-                if version.name == self.image['version']:
-                    return version
+                if versions:
+                    return versions[-1]
+            elif self.image['version'] in versions:
+                return self.image['version']
+            if not cached:
+                break
 
         self.fail("Error could not find image {0} {1} {2} {3}".format(self.image['publisher'],
                                                                       self.image['offer'],
                                                                       self.image['sku'],
                                                                       self.image['version']))
+        return None
 
     def get_custom_image_reference(self, name, resource_group=None):
-        try:
-            if resource_group:
-                vm_images = self.compute_client.images.list_by_resource_group(resource_group)
-            else:
-                vm_images = self.compute_client.images.list()
-        except Exception as exc:
-            self.fail("Error fetching custom images from subscription - {0}".format(str(exc)))
-
-        for vm_image in vm_images:
-            if vm_image.name == name:
-                self.log("Using custom image id {0}".format(vm_image.id))
-                return self.compute_models.ImageReference(id=vm_image.id)
+        for refresh in (False, True):
+            try:
+                vm_images, cached = self.get_custom_images(resource_group, refresh=refresh)
+            except Exception as exc:
+                self.fail("Error fetching custom images from subscription - {0}".format(str(exc)))
+            if name in vm_images:
+                self.log("Using custom image id {0}".format(vm_images[name]))
+                return self.compute_models.ImageReference(id=vm_images[name])
+            if not cached:
+                break
 
         self.fail("Error could not find image with name {0}".format(name))
+        return None
 
     def create_or_update_vmss(self, params):
         try:
@@ -1178,13 +1185,15 @@ class AzureRMVirtualMachineScaleSet(AzureRMModuleBase):
 
         :return: boolean
         '''
-        try:
-            sizes = self.compute_client.virtual_machine_sizes.list(self.location)
-        except CloudError as exc:
-            self.fail("Error retrieving available machine sizes - {0}".format(str(exc)))
-        for size in sizes:
-            if size.name == self.vm_size:
+        for refresh in (False, True):
+            try:
+                sizes, cached = self.list_vm_sizes(self.location, refresh=refresh)
+            except CloudError as exc:
+                self.fail("Error retrieving available machine sizes - {0}".format(str(exc)))
+            if self.vm_size in sizes:
                 return True
+            if not cached:
+                break
         return False
 
     def parse_nsg(self):
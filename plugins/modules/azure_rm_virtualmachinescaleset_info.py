@@ -418,10 +418,8 @@ class AzureRMVirtualMachineScaleSetInfo(AzureRMModuleBase):
         except CloudError as exc:
             self.fail('Failed to list all items - {0}'.format(str(exc)))
 
-        results = []
-        for item in response:
-            if self.has_tags(item.tags, self.tags):
-                results.append(self.serialize_obj(item, AZURE_OBJECT_CLASS, enum_modules=AZURE_ENUM_MODULES))
+        results = self.serialize_objs([item for item in response if self.has_tags(item.tags, self.tags)],
+                                      AZURE_OBJECT_CLASS, enum_modules=AZURE_ENUM_MODULES)
 
         return results
 
@@ -296,7 +296,7 @@ class AzureRMNetworkInterfaceInfo(AzureRMModuleBase):
 
     def serialize(self, raws):
         self.log("Serialize all items")
-        return [self.serialize_obj(item, AZURE_OBJECT_CLASS) for item in raws] if raws else []
+        return self.serialize_objs(raws, AZURE_OBJECT_CLASS)
 
     def curated(self, raws):
         self.log("Format all items")
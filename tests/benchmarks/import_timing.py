@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""
+Compare the time to load azure_rm_common with the SDK imported on first use against importing it up front.
+
+Every module imports azure_rm_common, so its load time is paid on each module invocation.
+
+The eager path loads azure_rm_common plus every SDK package it imported at load time before the imports were moved
+into the client and model properties; the lazy path loads azure_rm_common alone, as a module that doesn't touch a client
+does now. Each measurement runs in a fresh interpreter, so nothing is served from an already warm sys.modules.
+
+Needs ansible and the packages of requirements-azure.txt installed for the interpreter being measured. Not run by CI.
+
+usage: python tests/benchmarks/import_timing.py [--runs N] [--python PATH]
+"""
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+COMMON = 'ansible_collections.azure.azcollection.plugins.module_utils.azure_rm_common'
+
+# the imports azure_rm_common ran at load time before they were deferred to first use
+EAGER_IMPORTS = [
+    'azure.graphrbac',
+    'azure.mgmt.network',
+    'azure.mgmt.resource.resources',
+    'azure.mgmt.resource.subscriptions',
+    'azure.mgmt.resource.locks',
+    'azure.mgmt.storage',
+    'azure.mgmt.compute',
+    'azure.mgmt.dns',
+    'azure.mgmt.privatedns',
+    'azure.mgmt.privatedns.models',
+    'azure.mgmt.monitor',
+    'azure.mgmt.web',
+    'azure.mgmt.containerservice',
+    'azure.mgmt.marketplaceordering',
+    'azure.mgmt.trafficmanager',
+    'azure.storage.cloudstorageaccount',
+    'azure.storage.blob',
+    'adal.authentication_context',
+    'azure.mgmt.sql',
+    'azure.mgmt.servicebus',
+    'azure.mgmt.servicebus.models',
+    'azure.mgmt.rdbms.postgresql',
+    'azure.mgmt.rdbms.mysql',
+    'azure.mgmt.rdbms.mariadb',
+    'azure.mgmt.containerregistry',
+    'azure.mgmt.containerinstance',
+    'azure.mgmt.loganalytics',
+    'azure.mgmt.loganalytics.models',
+    'azure.mgmt.automation',
+    'azure.mgmt.automation.models',
+    'azure.mgmt.iothub',
+    'azure.mgmt.iothub.models',
+]
+
+TIMER = '''
+import importlib, time
+start = time.time()
+for name in {0!r}:
+    importlib.import_module(name)
+print(time.time() - start)
+'''
+
+
+def collection_path():
+    '''
+    Return a path containing ansible_collections/azure/azcollection for this checkout, linking one up in a temporary
+    directory if the checkout doesn't live in such a tree.
+    '''
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+    parents = root.split(os.sep)
+    if parents[-3:-1] == ['ansible_collections', 'azure']:
+        return os.sep.join(parents[:-3]), None
+
+    tmp = tempfile.mkdtemp()
+    os.makedirs(os.path.join(tmp, 'ansible_collections', 'azure'))
+    os.symlink(root, os.path.join(tmp, 'ansible_collections', 'azure', 'azcollection'))
+    return tmp, tmp
+
+
+def time_imports(python, path, modules, runs):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([path, os.environ.get('PYTHONPATH', '')]))
+    samples = []
+    for dummy in range(runs):
+        output = subprocess.check_output([python, '-c', TIMER.format(modules)], env=env)
+        samples.append(float(output.decode().strip().splitlines()[-1]))
+    return sorted(samples)[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per measurement, the median is reported')
+    parser.add_argument('--python', default=sys.executable, help='interpreter to measure')
+    args = parser.parse_args()
+
+    path, cleanup = collection_path()
+    try:
+        lazy = time_imports(args.python, path, [COMMON], args.runs)
+        eager = time_imports(args.python, path, [COMMON] + EAGER_IMPORTS, args.runs)
+    finally:
+        if cleanup:
+            shutil.rmtree(cleanup)
+
+    print('python {0}, median of {1} runs'.format(subprocess.check_output(
+        [args.python, '-c', 'import platform; print(platform.python_version())']).decode().strip(), args.runs))
+    print('azure_rm_common, SDK imported on demand:  {0:8.1f} ms'.format(lazy * 1000))
+    print('azure_rm_common, SDK imported up front:   {0:8.1f} ms'.format(eager * 1000))
+    print('saved per module invocation:              {0:8.1f} ms'.format((eager - lazy) * 1000))
+
+
+if __name__ == '__main__':
+    main()
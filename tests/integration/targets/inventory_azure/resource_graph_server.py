@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# Copyright (c) 2023 Ansible Project
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Local stand-in for Azure Resource Graph, used to test the inventory plugin's resource_graph fetch engine without any
+# Azure resources. The VM query is served in two pages linked by a $skipToken, and the first NIC query is throttled.
+#
+# usage: resource_graph_server.py STATE_DIR
+#
+# Seeds STATE_DIR/auth_cache.json with the cloud endpoints and an AAD token for the credentials in
+# templates/resource_graph.yml, so the plugin never talks to Azure, then writes the listening port to STATE_DIR/port.
+# GET /stats returns how many queries of each kind were served.
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import os
+import sys
+import time
+from hashlib import sha256
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+SUBSCRIPTION_ID = '00000000-0000-0000-0000-000000000000'
+TENANT = '11111111-1111-1111-1111-111111111111'
+CLIENT_ID = '22222222-2222-2222-2222-222222222222'
+SECRET = 'resource-graph-test-secret'
+ACCESS_TOKEN = 'resource-graph-test-token'
+AUTHORITY = 'https://login.example.invalid'
+RESOURCE = 'https://management.example.invalid/'
+
+RG = '/subscriptions/{0}/resourceGroups/rg-inventory-test'.format(SUBSCRIPTION_ID)
+
+
+def vm(name, location, vm_size, nic_name, power_state):
+    return dict(
+        id='{0}/providers/Microsoft.Compute/virtualMachines/{1}'.format(RG, name),
+        name=name,
+        type='microsoft.compute/virtualmachines',
+        location=location,
+        tags=dict(role=name),
+        zones=None,
+        powerState='PowerState/{0}'.format(power_state),
+        properties=dict(
+            vmId='{0}-0000-0000-0000-000000000000'.format(name),
+            provisioningState='Succeeded',
+            hardwareProfile=dict(vmSize=vm_size),
+            osProfile=dict(computerName=name, linuxConfiguration=dict(disablePasswordAuthentication=True)),
+            storageProfile=dict(
+                imageReference=dict(publisher='Canonical', offer='UbuntuServer', sku='18.04-LTS', version='latest'),
+                osDisk=dict(name='{0}-osdisk'.format(name), osType='Linux'),
+            ),
+            networkProfile=dict(networkInterfaces=[
+                dict(id='{0}/providers/Microsoft.Network/networkInterfaces/{1}'.format(RG, nic_name)),
+            ]),
+        ),
+    )
+
+
+def nic(name, vm_name, private_ip, pip_name=None):
+    ip_configuration = dict(primary=True, privateIPAddress=private_ip)
+    if pip_name:
+        ip_configuration['publicIPAddress'] = dict(id='{0}/providers/Microsoft.Network/publicIPAddresses/{1}'.format(RG, pip_name))
+    return dict(
+        id='{0}/providers/Microsoft.Network/networkInterfaces/{1}'.format(RG, name),
+        name=name,
+        properties=dict(
+            macAddress='00-0D-3A-00-00-01',
+            primary=True,
+            virtualMachine=dict(id='{0}/providers/Microsoft.Compute/virtualMachines/{1}'.format(RG, vm_name)),
+            ipConfigurations=[dict(name='ipconfig1', properties=ip_configuration)],
+        ),
+    )
+
+
+def pip(name, nic_name, ip_address, fqdn):
+    # Resource Graph lowercases resource group names in ids; the NIC references the public IP with the original case
+    return dict(
+        id='{0}/providers/Microsoft.Network/publicIPAddresses/{1}'.format(RG.lower(), name),
+        name=name,
+        properties=dict(
+            ipAddress=ip_address,
+            dnsSettings=dict(fqdn=fqdn),
+            ipConfiguration=dict(id='{0}/providers/Microsoft.Network/networkInterfaces/{1}/ipConfigurations/ipconfig1'.format(RG, nic_name)),
+        ),
+    )
+
+
+VM_PAGES = [
+    [vm('rgvm1', 'eastus', 'Standard_B1ms', 'rgvm1-nic', 'running')],
+    [vm('rgvm2', 'westus2', 'Standard_D2s_v3', 'rgvm2-nic', 'deallocated')],
+]
+NICS = [
+    nic('rgvm1-nic', 'rgvm1', '10.0.0.4', pip_name='rgvm1-ip'),
+    nic('rgvm2-nic', 'rgvm2', '10.0.0.5'),
+]
+PIPS = [
+    pip('rgvm1-ip', 'rgvm1-nic', '20.1.2.3', 'rgvm1.eastus.cloudapp.azure.com'),
+]
+
+stats = dict(vm_pages=0, nic_queries=0, pip_queries=0, throttled=0, unauthorized=0)
+
+
+class ResourceGraphHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status, body, headers=None):
+        content = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send_json(200, stats)
+        else:
+            self._send_json(404, dict(error=dict(code='NotFound', message=self.path)))
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8'))
+        if not self.path.startswith('/providers/Microsoft.ResourceGraph/resources?'):
+            self._send_json(404, dict(error=dict(code='NotFound', message=self.path)))
+            return
+        if self.headers.get('Authorization') != 'Bearer {0}'.format(ACCESS_TOKEN):
+            stats['unauthorized'] += 1
+            self._send_json(401, dict(error=dict(code='AuthenticationFailed', message='unexpected token')))
+            return
+        if body.get('subscriptions') != [SUBSCRIPTION_ID]:
+            self._send_json(400, dict(error=dict(code='BadRequest', message='unexpected subscriptions')))
+            return
+
+        query = body['query'].lower()
+        skip_token = body.get('options', {}).get('$skipToken')
+        if 'microsoft.compute/virtualmachines' in query:
+            page = int(skip_token or 0)
+            stats['vm_pages'] += 1
+            result = dict(data=VM_PAGES[page])
+            if page + 1 < len(VM_PAGES):
+                result['$skipToken'] = str(page + 1)
+        elif 'microsoft.network/networkinterfaces' in query:
+            stats['nic_queries'] += 1
+            if stats['nic_queries'] == 1:
+                stats['throttled'] += 1
+                self._send_json(429, dict(error=dict(code='RateLimiting', message='throttled')), headers={'Retry-After': '1'})
+                return
+            result = dict(data=NICS)
+        elif 'microsoft.network/publicipaddresses' in query:
+            stats['pip_queries'] += 1
+            result = dict(data=PIPS)
+        else:
+            self._send_json(400, dict(error=dict(code='BadRequest', message='unexpected query: {0}'.format(query))))
+            return
+
+        result.update(count=len(result['data']), resultTruncated='false')
+        self._send_json(200, result)
+
+    def log_message(self, format, *args):
+        sys.stderr.write('resource_graph_server: {0}\n'.format(format % args))
+
+
+def write_file(path, content):
+    # written under a temporary name first, so nothing sees the file half-written
+    fd = os.open(path + '.tmp', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(content)
+    os.rename(path + '.tmp', path)
+
+
+def main():
+    state_dir = sys.argv[1]
+    server = HTTPServer(('127.0.0.1', 0), ResourceGraphHandler)
+    endpoint = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+
+    # the entries AzureRMAuth looks for with token_cache enabled: resolved cloud endpoints and a cached AAD token
+    expires_on = time.time() + 86400
+    token_key = 'token:' + sha256('\n'.join([AUTHORITY, RESOURCE, TENANT, CLIENT_ID, SECRET]).encode('utf-8')).hexdigest()
+    auth_cache = {
+        'cloud:{0}'.format(endpoint): dict(value=dict(
+            name='ResourceGraphTest',
+            endpoints=dict(resource_manager=endpoint, management=RESOURCE, active_directory=AUTHORITY,
+                           active_directory_resource_id=RESOURCE),
+            suffixes=dict(),
+        ), expires_on=expires_on),
+        token_key: dict(value=dict(access_token=ACCESS_TOKEN, token_type='Bearer', expires_on=expires_on), expires_on=expires_on),
+    }
+    write_file(os.path.join(state_dir, 'auth_cache.json'), json.dumps(auth_cache))
+    write_file(os.path.join(state_dir, 'port'), str(server.server_address[1]))
+
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
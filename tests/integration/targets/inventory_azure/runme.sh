@@ -13,5 +13,19 @@ ansible-playbook playbooks/test_inventory.yml "$@"
 
 #ansible-inventory -i test.azure_rm.yml --list -vvv --playbook-dir=./
 
+# test the resource_graph fetch engine against a local stand-in, which also seeds the cached token it expects
+rg_dir=$(mktemp -d)
+"${ANSIBLE_TEST_PYTHON_INTERPRETER:-python}" resource_graph_server.py "${rg_dir}" &
+rg_pid=$!
+trap 'kill "${rg_pid}"; rm -rf "${rg_dir}"' EXIT
+for _ in $(seq 50); do
+    [ -f "${rg_dir}/port" ] && break
+    sleep 0.1
+done
+rg_vars="resource_graph_endpoint=http://127.0.0.1:$(cat "${rg_dir}/port") auth_cache_path=${rg_dir}/auth_cache.json"
+
+ansible-playbook playbooks/create_inventory_config.yml -e template=resource_graph.yml -e "${rg_vars}" "$@"
+ansible-playbook playbooks/test_resource_graph.yml -e "${rg_vars}" "$@"
+
 # cleanup inventory config
 ansible-playbook playbooks/empty_inventory_config.yml "$@"
\ No newline at end of file